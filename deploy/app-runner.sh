@@ -2,11 +2,13 @@
 
 THE_HOST=${HOST:="0.0.0.0"}
 THE_PORT=${PORT:="9092"}
+# More than one worker requires SWIFT_UPLOAD_RUNNER_SESSION_STORE=redis
+THE_WORKERS=${WORKERS:="1"}
 
 echo "Start swift-upload-runner backend"
 
 gunicorn swift_browser_ui.upload.server:servinit \
     --bind $THE_HOST:$THE_PORT \
     --worker-class aiohttp.GunicornUVLoopWebWorker \
-    --workers 1 \
+    --workers $THE_WORKERS \
     --graceful-timeout 60 --timeout 120
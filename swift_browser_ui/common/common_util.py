@@ -5,6 +5,8 @@ import os
 import random
 
 import aiohttp.web
+import redis.asyncio as redis
+from redis.asyncio.sentinel import Sentinel
 
 
 async def read_in_keys(app: aiohttp.web.Application) -> None:
@@ -18,3 +20,33 @@ async def read_in_keys(app: aiohttp.web.Application) -> None:
 async def sleep_random() -> None:
     """Sleep a random time."""
     return await asyncio.sleep(random.randint(2, 5))  # nosec  # noqa: S311
+
+
+async def get_redis_client() -> redis.Redis:
+    """Initialize and return a Python Redis client."""
+    sentinel_url = str(os.environ.get("SWIFT_UI_REDIS_SENTINEL_HOST", ""))
+    sentinel_port = str(os.environ.get("SWIFT_UI_REDIS_SENTINEL_PORT", ""))
+    sentinel_master = os.environ.get("SWIFT_UI_REDIS_SENTINEL_MASTER", "mymaster")
+
+    redis_user = str(os.environ.get("SWIFT_UI_REDIS_USER", ""))
+    redis_password = str(os.environ.get("SWIFT_UI_REDIS_PASSWORD", ""))
+
+    if sentinel_url and sentinel_port:
+        # Auth is forwarded to redis so no need for auth on sentinel
+        sentinel = Sentinel([(str(sentinel_url), int(sentinel_port))])
+
+        redis_client = sentinel.master_for(
+            service_name=sentinel_master,
+            redis_class=redis.Redis,
+            password=redis_password,
+            username=redis_user,
+        )
+    else:
+        redis_port = str(os.environ.get("SWIFT_UI_REDIS_PORT", ""))
+        redis_host = str(os.environ.get("SWIFT_UI_REDIS_HOST", "localhost"))
+
+        redis_creds = ""
+        if redis_user and redis_password:
+            redis_creds = f"{redis_user}:{redis_password}@"
+        redis_client = redis.from_url(f"redis://{redis_creds}{redis_host}:{redis_port}")
+    return redis_client
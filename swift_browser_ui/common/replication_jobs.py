@@ -0,0 +1,283 @@
+"""Registry of replication jobs shared by the UI and the upload runner."""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import secrets
+import time
+import typing
+
+import aiohttp.web
+import redis.asyncio as redis
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(os.environ.get("LOG_LEVEL", "INFO"))
+
+# Seconds the state of a replication job is kept after it was last updated
+JOB_TTL = int(os.environ.get("SWIFT_UI_REPLICATION_JOB_TTL", 604800))
+# Seconds between saving the progress of a running replication job
+JOB_CHECKPOINT_INTERVAL = int(
+    os.environ.get("SWIFT_UI_REPLICATION_JOB_CHECKPOINT_INTERVAL", 10)
+)
+# Failed objects listed in the state of a job, the rest are only counted
+JOB_MAX_FAILURES = 100
+JOB_PREFIX = "swift-ui:replication-job:"
+JOB_KEY_PREFIX = "swift-ui:replication-job-key:"
+JOB_LOCK_PREFIX = "swift-ui:replication-job-lock:"
+
+# Called with the listing marker to continue from
+Replicate = typing.Callable[[str], typing.Awaitable[typing.Any]]
+# Returns the marker, copied objects, copied bytes, skipped unchanged objects
+# and failures of the run
+Progress = typing.Callable[[], typing.Dict[str, typing.Any]]
+
+
+class ReplicationJobStore:
+    """Replication job store in the memory of a single process."""
+
+    def __init__(self, ttl: int = JOB_TTL) -> None:
+        """."""
+        self.ttl = ttl
+        self.jobs: typing.Dict[str, str] = {}
+        self.keys: typing.Dict[str, str] = {}
+        # Lock expiry times of the jobs running in this process
+        self.locks: typing.Dict[str, float] = {}
+
+    async def a_get_job(self, job_id: str) -> typing.Dict[str, typing.Any] | None:
+        """Return the state of a job, if it exists."""
+        job = self.jobs.get(job_id)
+        return json.loads(job) if job is not None else None
+
+    async def a_find_job(self, key: str) -> typing.Dict[str, typing.Any] | None:
+        """Return the latest job replicating the same containers."""
+        job_id = self.keys.get(key)
+        return await self.a_get_job(job_id) if job_id is not None else None
+
+    async def a_put_job(self, job: typing.Dict[str, typing.Any]) -> None:
+        """Store the state of a job."""
+        self.jobs[job["id"]] = json.dumps(job)
+        self.keys[job["key"]] = job["id"]
+        # Forget the jobs not updated within the TTL
+        expired = time.time() - self.ttl
+        for job_id, stored in list(self.jobs.items()):
+            if json.loads(stored)["updated"] < expired:
+                del self.jobs[job_id]
+        self.keys = {
+            key: job_id for key, job_id in self.keys.items() if job_id in self.jobs
+        }
+
+    async def a_lock_job(self, job_id: str, ttl: int) -> bool:
+        """Lock a job for running, unless it's already running."""
+        if await self.a_is_locked(job_id):
+            return False
+        await self.a_refresh_lock(job_id, ttl)
+        return True
+
+    async def a_refresh_lock(self, job_id: str, ttl: int) -> None:
+        """Extend the lock of a running job."""
+        self.locks[job_id] = time.monotonic() + ttl
+
+    async def a_unlock_job(self, job_id: str) -> None:
+        """Release the lock of a job."""
+        self.locks.pop(job_id, None)
+
+    async def a_is_locked(self, job_id: str) -> bool:
+        """Check if a job is being run."""
+        return self.locks.get(job_id, 0.0) > time.monotonic()
+
+    async def a_close(self) -> None:
+        """Close the store."""
+        return
+
+
+class RedisReplicationJobStore(ReplicationJobStore):
+    """Replication job store shared between processes in Redis."""
+
+    def __init__(self, client: redis.Redis, ttl: int = JOB_TTL) -> None:
+        """."""
+        super().__init__(ttl)
+        self.client = client
+
+    async def a_get_job(self, job_id: str) -> typing.Dict[str, typing.Any] | None:
+        """Return the state of a job, if it exists."""
+        job = await self.client.get(f"{JOB_PREFIX}{job_id}")
+        return json.loads(job) if job is not None else None
+
+    async def a_find_job(self, key: str) -> typing.Dict[str, typing.Any] | None:
+        """Return the latest job replicating the same containers."""
+        job_id = await self.client.get(f"{JOB_KEY_PREFIX}{key}")
+        if job_id is None:
+            return None
+        # Clients created with decode_responses return strings
+        return await self.a_get_job(
+            job_id.decode() if isinstance(job_id, bytes) else job_id
+        )
+
+    async def a_put_job(self, job: typing.Dict[str, typing.Any]) -> None:
+        """Store the state of a job."""
+        await self.client.set(f"{JOB_PREFIX}{job['id']}", json.dumps(job), ex=self.ttl)
+        await self.client.set(f"{JOB_KEY_PREFIX}{job['key']}", job["id"], ex=self.ttl)
+
+    async def a_lock_job(self, job_id: str, ttl: int) -> bool:
+        """Lock a job for running, unless it's already running."""
+        return bool(
+            await self.client.set(f"{JOB_LOCK_PREFIX}{job_id}", "1", nx=True, ex=ttl)
+        )
+
+    async def a_refresh_lock(self, job_id: str, ttl: int) -> None:
+        """Extend the lock of a running job."""
+        await self.client.set(f"{JOB_LOCK_PREFIX}{job_id}", "1", ex=ttl)
+
+    async def a_unlock_job(self, job_id: str) -> None:
+        """Release the lock of a job."""
+        await self.client.delete(f"{JOB_LOCK_PREFIX}{job_id}")
+
+    async def a_is_locked(self, job_id: str) -> bool:
+        """Check if a job is being run."""
+        return bool(await self.client.exists(f"{JOB_LOCK_PREFIX}{job_id}"))
+
+    async def a_close(self) -> None:
+        """Close the store."""
+        await self.client.aclose()
+
+
+class ReplicationJobs:
+    """Replication jobs run by this process, checkpointed into a job store."""
+
+    def __init__(
+        self,
+        store: ReplicationJobStore,
+        checkpoint_interval: int = JOB_CHECKPOINT_INTERVAL,
+    ) -> None:
+        """."""
+        self.store = store
+        self.checkpoint_interval = checkpoint_interval
+        # A job whose process stops checkpointing it is considered interrupted
+        self.lock_ttl = max(3 * checkpoint_interval, 1)
+        self.tasks: typing.Dict[str, asyncio.Task] = {}
+
+    async def a_find_unfinished_job(
+        self, key: str
+    ) -> typing.Dict[str, typing.Any] | None:
+        """Return the job replicating the same containers, if it didn't finish."""
+        job = await self.store.a_find_job(key)
+        if job is None or job["status"] == "finished":
+            return None
+        return job
+
+    async def a_is_running(self, job: typing.Dict[str, typing.Any]) -> bool:
+        """Check if a job is being run by any process."""
+        return await self.store.a_is_locked(job["id"])
+
+    async def a_start(
+        self,
+        key: str,
+        params: typing.Dict[str, str],
+        replicate: Replicate,
+        progress: Progress,
+        job: typing.Dict[str, typing.Any] | None = None,
+    ) -> typing.Dict[str, typing.Any]:
+        """Start a new replication job, or resume an unfinished one."""
+        now = time.time()
+        if job is None:
+            job = {
+                "id": secrets.token_hex(16),
+                "key": key,
+                **params,
+                "status": "running",
+                "marker": "",
+                "copied": 0,
+                "bytes": 0,
+                "skipped": 0,
+                "failed": 0,
+                "failures": {},
+                "error": "",
+                "resumed": 0,
+                "created": now,
+            }
+        else:
+            job = dict(job, status="running", error="", resumed=job["resumed"] + 1)
+        job["updated"] = now
+
+        if not await self.store.a_lock_job(job["id"], self.lock_ttl):
+            raise aiohttp.web.HTTPConflict(reason="Replication job is already running")
+        await self.store.a_put_job(job)
+        self.tasks[job["id"]] = asyncio.create_task(self.a_run(job, replicate, progress))
+        LOGGER.info(f"Started replication job {job['id']} from marker {job['marker']!r}")
+        return job
+
+    def get_state(
+        self, job: typing.Dict[str, typing.Any], progress: Progress
+    ) -> typing.Dict[str, typing.Any]:
+        """Return the state of a job with the progress of the current run."""
+        current = progress()
+        failures = {**job["failures"], **current["failures"]}
+        return dict(
+            job,
+            marker=current["marker"] or job["marker"],
+            copied=job["copied"] + current["copied"],
+            bytes=job["bytes"] + current["bytes"],
+            skipped=job.get("skipped", 0) + current.get("skipped", 0),
+            failed=job["failed"] + len(current["failures"]),
+            failures=dict(itertools.islice(failures.items(), JOB_MAX_FAILURES)),
+            updated=time.time(),
+        )
+
+    async def a_checkpoint(
+        self, job: typing.Dict[str, typing.Any], progress: Progress
+    ) -> None:
+        """Save the progress of a running job periodically."""
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            try:
+                await self.store.a_put_job(self.get_state(job, progress))
+                await self.store.a_refresh_lock(job["id"], self.lock_ttl)
+            except Exception as e:
+                LOGGER.error(f"Failed to checkpoint replication job {job['id']}: {e}")
+
+    async def a_run(
+        self,
+        job: typing.Dict[str, typing.Any],
+        replicate: Replicate,
+        progress: Progress,
+    ) -> None:
+        """Run a replication job and save its final state."""
+        checkpoints = asyncio.create_task(self.a_checkpoint(job, progress))
+        status, error = "finished", ""
+        try:
+            await replicate(job["marker"])
+        except asyncio.CancelledError:
+            status = "interrupted"
+            raise
+        except Exception as e:
+            status = "failed"
+            error = str(e.reason if isinstance(e, aiohttp.web.HTTPException) else e)
+            LOGGER.error(f"Replication job {job['id']} failed: {error}")
+        finally:
+            checkpoints.cancel()
+            await asyncio.gather(checkpoints, return_exceptions=True)
+            await self.store.a_put_job(
+                dict(self.get_state(job, progress), status=status, error=error)
+            )
+            await self.store.a_unlock_job(job["id"])
+            self.tasks.pop(job["id"], None)
+            LOGGER.info(f"Replication job {job['id']} {status}.")
+
+    async def a_get_job(self, job_id: str) -> typing.Dict[str, typing.Any]:
+        """Return the state of a job as reported to the user."""
+        job = await self.store.a_get_job(job_id)
+        if job is None:
+            raise aiohttp.web.HTTPNotFound(reason="Replication job not found")
+        if job["status"] == "running" and not await self.store.a_is_locked(job_id):
+            # The process running the job stopped without saving its state
+            job["status"] = "interrupted"
+        return job
+
+    async def a_close(self) -> None:
+        """Interrupt the jobs running in this process, saving their state."""
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
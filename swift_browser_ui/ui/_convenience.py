@@ -14,9 +14,7 @@ import aiohttp
 import aiohttp.web
 import aiohttp_session
 import certifi
-import redis.asyncio as redis
 from ldap3 import Connection, Server, Tls
-from redis.asyncio.sentinel import Sentinel
 
 import swift_browser_ui.common.signature
 from swift_browser_ui.ui.settings import setd
@@ -181,36 +179,6 @@ async def open_upload_runner_session(
         return ret
 
 
-async def get_redis_client() -> redis.Redis:
-    """Initialize and return a Python Redis client."""
-    sentinel_url = str(os.environ.get("SWIFT_UI_REDIS_SENTINEL_HOST", ""))
-    sentinel_port = str(os.environ.get("SWIFT_UI_REDIS_SENTINEL_PORT", ""))
-    sentinel_master = os.environ.get("SWIFT_UI_REDIS_SENTINEL_MASTER", "mymaster")
-
-    redis_user = str(os.environ.get("SWIFT_UI_REDIS_USER", ""))
-    redis_password = str(os.environ.get("SWIFT_UI_REDIS_PASSWORD", ""))
-
-    if sentinel_url and sentinel_port:
-        # Auth is forwarded to redis so no need for auth on sentinel
-        sentinel = Sentinel([(str(sentinel_url), int(sentinel_port))])
-
-        redis_client = sentinel.master_for(
-            service_name=sentinel_master,
-            redis_class=redis.Redis,
-            password=redis_password,
-            username=redis_user,
-        )
-    else:
-        redis_port = str(os.environ.get("SWIFT_UI_REDIS_PORT", ""))
-        redis_host = str(os.environ.get("SWIFT_UI_REDIS_HOST", "localhost"))
-
-        redis_creds = ""
-        if redis_user and redis_password:
-            redis_creds = f"{redis_user}:{redis_password}@"
-        redis_client = redis.from_url(f"redis://{redis_creds}{redis_host}:{redis_port}")
-    return redis_client
-
-
 async def ldap_get_project_titles(projects: dict[str, dict]) -> dict[str, str]:
     """Fetch and return titles for given list of projects."""
     address = str(os.environ.get("LDAP_SERVER_HOST", ""))
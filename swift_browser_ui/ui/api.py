@@ -7,12 +7,12 @@ import time
 import typing
 from datetime import datetime
 
-import aioboto3
 import aiohttp.web
 import aiohttp_session
 import botocore.exceptions
 import certifi
 
+from swift_browser_ui.common.replication_jobs import ReplicationJobs
 from swift_browser_ui.common.vault_client import VaultClient
 from swift_browser_ui.ui._convenience import (
     ldap_get_project_titles,
@@ -20,8 +20,9 @@ from swift_browser_ui.ui._convenience import (
     sign,
 )
 from swift_browser_ui.ui.replicate import ObjectReplicator
+from swift_browser_ui.ui.s3_clients import S3_CLIENTS, S3ClientPool
 from swift_browser_ui.ui.settings import setd
-from swift_browser_ui.upload.common import VAULT_CLIENT
+from swift_browser_ui.upload.common import REPLICATION_JOBS, VAULT_CLIENT
 
 ssl_context = ssl.create_default_context()
 ssl_context.load_verify_locations(certifi.where())
@@ -128,17 +129,8 @@ async def aws_list_buckets(
     )
 
     creds = await _get_ec2_credentials(session, client, project)
-    s3session = aioboto3.Session(
-        aws_access_key_id=creds["access"],
-        aws_secret_access_key=creds["secret"],
-    )
-
-    async with s3session.client(
-        "s3",
-        region_name="us-east-1",
-        endpoint_url=setd["s3api_endpoint"],
-        verify=setd["check_certificate"],
-    ) as s3_client:
+    s3_clients: S3ClientPool = request.app[S3_CLIENTS]
+    async with s3_clients.client(creds["access"], creds["secret"]) as s3_client:
         try:
             bucket_page = await s3_client.list_buckets(
                 MaxBuckets=max_buckets, ContinuationToken=continuation_token
@@ -185,17 +177,8 @@ async def aws_create_bucket(
     )
 
     creds = await _get_ec2_credentials(session, client, project)
-    s3session = aioboto3.Session(
-        aws_access_key_id=creds["access"],
-        aws_secret_access_key=creds["secret"],
-    )
-
-    async with s3session.client(
-        "s3",
-        region_name="us-east-1",
-        endpoint_url=setd["s3api_endpoint"],
-        verify=setd["check_certificate"],
-    ) as s3_client:
+    s3_clients: S3ClientPool = request.app[S3_CLIENTS]
+    async with s3_clients.client(creds["access"], creds["secret"]) as s3_client:
         try:
             await s3_client.create_bucket(Bucket=bucket)
         except botocore.exceptions.ClientError as e:
@@ -209,83 +192,77 @@ async def aws_create_bucket(
                     text="Could not create requested bucket."
                 )
 
-    # Add CORS entries for the newly created bucket to allow access via browser
-    await _update_bucket_cors(logger, s3session, bucket)
+        # Add CORS entries for the newly created bucket to allow access via browser
+        await _update_bucket_cors(logger, s3_client, bucket)
 
     return aiohttp.web.Response(status=204, body="")
 
 
 async def _update_bucket_cors(
     logger,
-    s3session: aioboto3.Session,
+    s3_client: typing.Any,
     bucket: str,
 ):
     """Update single bucket cors entry."""
-    async with s3session.client(
-        "s3",
-        region_name="us-east-1",
-        endpoint_url=setd["s3api_endpoint"],
-        verify=setd["check_certificate"],
-    ) as s3_client:
-        # Fetch the existing bucket CORS information
-        cors_list = []
-        try:
-            cors_response = await s3_client.get_bucket_cors(Bucket=bucket)
-            cors_list = cors_response.get("CORSRules", [])
-        except botocore.exceptions.ClientError as e:
-            error_code = e.response["Error"]["Code"]
-            if error_code == 404 or error_code == "NoSuchCORSConfiguration":
-                # 404 means there's no existing CORS
-                logger.debug(f"No existing CORS in {bucket}, creating from scratch.")
-                pass
-            elif error_code == 400:
-                raise aiohttp.web.HTTPClientError
-            else:
-                raise aiohttp.web.HTTPInternalServerError
-        except botocore.exceptions.ParamValidationError:
-            # We don't need to care about the bucket name validation errors for old buckets.
+    # Fetch the existing bucket CORS information
+    cors_list = []
+    try:
+        cors_response = await s3_client.get_bucket_cors(Bucket=bucket)
+        cors_list = cors_response.get("CORSRules", [])
+    except botocore.exceptions.ClientError as e:
+        error_code = e.response["Error"]["Code"]
+        if error_code == 404 or error_code == "NoSuchCORSConfiguration":
+            # 404 means there's no existing CORS
+            logger.debug(f"No existing CORS in {bucket}, creating from scratch.")
+            pass
+        elif error_code == 400:
+            raise aiohttp.web.HTTPClientError
+        else:
+            raise aiohttp.web.HTTPInternalServerError
+    except botocore.exceptions.ParamValidationError:
+        # We don't need to care about the bucket name validation errors for old buckets.
+        return
+
+    # Skip immediately if the required CORS entry already exists
+    for cors in cors_list:
+        if setd["web_app_cors_origin"] in cors["AllowedOrigins"]:
             return
 
-        # Skip immediately if the required CORS entry already exists
-        for cors in cors_list:
-            if setd["web_app_cors_origin"] in cors["AllowedOrigins"]:
-                return
-
-        # Append the SD Connect UI to the CORS listing
-        try:
-            cors_list.append(
-                {
-                    "AllowedHeaders": [
-                        "*",
-                    ],
-                    "AllowedMethods": [
-                        "PUT",
-                        "GET",
-                        "DELETE",
-                        "POST",
-                        "HEAD",
-                    ],
-                    "AllowedOrigins": [
-                        setd["web_app_cors_origin"],
-                        f"{setd['web_app_cors_origin']}/",
-                    ],
-                    "ExposeHeaders": [
-                        "*",
-                    ],
-                    "MaxAgeSeconds": 3600,
-                }
-            )
-            await s3_client.put_bucket_cors(
-                Bucket=bucket,
-                CORSConfiguration={
-                    "CORSRules": cors_list,
-                },
-            )
-        except botocore.exceptions.ClientError as e:
-            error_code = e.response["Error"]["Code"]
-            raise aiohttp.web.HTTPInternalServerError(
-                text=f"Could not add the CORS entry to bucket {bucket}, status {error_code}"
-            )
+    # Append the SD Connect UI to the CORS listing
+    try:
+        cors_list.append(
+            {
+                "AllowedHeaders": [
+                    "*",
+                ],
+                "AllowedMethods": [
+                    "PUT",
+                    "GET",
+                    "DELETE",
+                    "POST",
+                    "HEAD",
+                ],
+                "AllowedOrigins": [
+                    setd["web_app_cors_origin"],
+                    f"{setd['web_app_cors_origin']}/",
+                ],
+                "ExposeHeaders": [
+                    "*",
+                ],
+                "MaxAgeSeconds": 3600,
+            }
+        )
+        await s3_client.put_bucket_cors(
+            Bucket=bucket,
+            CORSConfiguration={
+                "CORSRules": cors_list,
+            },
+        )
+    except botocore.exceptions.ClientError as e:
+        error_code = e.response["Error"]["Code"]
+        raise aiohttp.web.HTTPInternalServerError(
+            text=f"Could not add the CORS entry to bucket {bucket}, status {error_code}"
+        )
 
 
 async def aws_head_bucket(
@@ -304,17 +281,8 @@ async def aws_head_bucket(
     )
 
     creds = await _get_ec2_credentials(session, client, project)
-    s3session = aioboto3.Session(
-        aws_access_key_id=creds["access"],
-        aws_secret_access_key=creds["secret"],
-    )
-
-    async with s3session.client(
-        "s3",
-        region_name="us-east-1",
-        endpoint_url=setd["s3api_endpoint"],
-        verify=setd["check_certificate"],
-    ) as s3_client:
+    s3_clients: S3ClientPool = request.app[S3_CLIENTS]
+    async with s3_clients.client(creds["access"], creds["secret"]) as s3_client:
         try:
             await s3_client.head_bucket(Bucket=bucket)
             return aiohttp.web.Response(status=200)
@@ -339,12 +307,9 @@ async def aws_update_bucket_cors(
     )
 
     creds = await _get_ec2_credentials(session, client, project)
-    s3session = aioboto3.Session(
-        aws_access_key_id=creds["access"],
-        aws_secret_access_key=creds["secret"],
-    )
-
-    await _update_bucket_cors(logger, s3session, bucket)
+    s3_clients: S3ClientPool = request.app[S3_CLIENTS]
+    async with s3_clients.client(creds["access"], creds["secret"]) as s3_client:
+        await _update_bucket_cors(logger, s3_client, bucket)
 
     return aiohttp.web.Response(status=204, body="")
 
@@ -366,23 +331,14 @@ async def aws_bulk_update_bucket_cors(
     )
 
     creds = await _get_ec2_credentials(session, client, project)
-    s3session = aioboto3.Session(
-        aws_access_key_id=creds["access"],
-        aws_secret_access_key=creds["secret"],
-    )
-
-    async with s3session.client(
-        "s3",
-        region_name="us-east-1",
-        endpoint_url=setd["s3api_endpoint"],
-        verify=setd["check_certificate"],
-    ) as s3_client:
+    s3_clients: S3ClientPool = request.app[S3_CLIENTS]
+    async with s3_clients.client(creds["access"], creds["secret"]) as s3_client:
         # If we got a list of buckets, just use that instead of paging
         # through the whole project
         if buckets:
             for bucket in buckets:
                 try:
-                    await _update_bucket_cors(logger, s3session, bucket)
+                    await _update_bucket_cors(logger, s3_client, bucket)
                 except Exception as e:
                     request.app["Log"].error(
                         f"Failed to bulk add CORS to bucket {bucket} for reason {e}",
@@ -402,7 +358,7 @@ async def aws_bulk_update_bucket_cors(
                 # Immediately apply new cors to the bucket
                 for aws_bucket in bucket_page["Buckets"]:
                     try:
-                        await _update_bucket_cors(logger, s3session, aws_bucket["Name"])
+                        await _update_bucket_cors(logger, s3_client, aws_bucket["Name"])
                     except Exception as e:
                         request.app["Log"].error(
                             f"Failed to bulk add CORS to bucket {bucket} for reason {e}",
@@ -541,20 +497,16 @@ async def replicate_bucket(
         f"{request.remote}, sess: {session} :: {time.ctime()}"
     )
 
-    creds = await _get_ec2_credentials(session, client, project)
+    jobs: ReplicationJobs = request.app[REPLICATION_JOBS]
+    key = f"s3/{project}/{bucket}/{source_project}/{source_bucket}"
+    job = await jobs.a_find_unfinished_job(key)
+    if job is not None and await jobs.a_is_running(job):
+        return aiohttp.web.json_response({"job": job["id"]}, status=202)
 
-    s3session = aioboto3.Session(
-        aws_access_key_id=creds["access"],
-        aws_secret_access_key=creds["secret"],
-    )
-
-    async with s3session.client(
-        "s3",
-        region_name="us-east-1",
-        endpoint_url=setd["s3api_endpoint"],
-        verify=setd["check_certificate"],
-    ) as s3_client:
+    creds = await _get_ec2_credentials(session, client, project)
+    s3_clients: S3ClientPool = request.app[S3_CLIENTS]
 
+    async with s3_clients.client(creds["access"], creds["secret"]) as s3_client:
         replicator = ObjectReplicator(
             s3_client,
             vault_client,
@@ -570,13 +522,45 @@ async def replicate_bucket(
             ),
         )
 
-    # Create destination bucket
-    await replicator.create_destination_bucket()
-    # Add CORS entries for the newly created bucket to allow access via browser
-    await _update_bucket_cors(logger, s3session, bucket)
+        if job is None:
+            # Create destination bucket
+            await replicator.create_destination_bucket()
+            # Add CORS entries for the newly created bucket to allow access via browser
+            await _update_bucket_cors(logger, s3_client, bucket)
+        else:
+            logger.info(f"Resuming replication job {job['id']} to {bucket}.")
+
+    async def replicate(start_after: str) -> None:
+        # Keep a client from the pool open for as long as the job runs
+        async with s3_clients.client(creds["access"], creds["secret"]) as s3_client:
+            replicator.s3client = s3_client
+            await replicator.replicate_objects(start_after)
+
+    job = await jobs.a_start(
+        key,
+        {
+            "project": project,
+            "container": bucket,
+            "source_project": source_project,
+            "source_container": source_bucket,
+        },
+        replicate,
+        replicator.get_progress,
+        job,
+    )
+    return aiohttp.web.json_response({"job": job["id"]}, status=202)
+
 
-    asyncio.create_task(replicator.replicate_objects())
-    return aiohttp.web.HTTPAccepted(text="Replication started")
+async def get_replication_job(
+    request: aiohttp.web.Request,
+) -> aiohttp.web.Response:
+    """Return the state of a bucket replication job."""
+    session = await aiohttp_session.get_session(request)
+    job = await request.app[REPLICATION_JOBS].a_get_job(request.match_info["job"])
+    if job["project"] not in session["projects"]:
+        raise aiohttp.web.HTTPForbidden(reason="Replication job of another project")
+    del job["key"]
+    return aiohttp.web.json_response(job)
 
 
 async def get_upload_session(
@@ -8,7 +8,7 @@ from aiohttp.client_exceptions import ServerDisconnectedError
 from redis import ConnectionError
 
 import swift_browser_ui.common.signature
-from swift_browser_ui.ui._convenience import get_redis_client
+from swift_browser_ui.common.common_util import get_redis_client
 from swift_browser_ui.ui.settings import setd
 
 
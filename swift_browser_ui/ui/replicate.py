@@ -1,6 +1,8 @@
 """Container and object replication handlers using aiohttp."""
 
+import asyncio
 import base64
+import collections
 import logging
 import math
 import os
@@ -21,6 +23,25 @@ SINGLE_COPY_SIZE = 100 * 1024 * 1024
 DEFAULT_PART_SIZE = 50 * 1024 * 1024
 # See limits https://docs.aws.amazon.com/AmazonS3/latest/userguide/qfacts.html
 MAX_PART_COUNT = 10000
+MAX_PART_SIZE = 5 * 1024 * 1024 * 1024
+# Large objects are copied in parts larger than the default, so that they
+# take about this many part copies
+TARGET_PART_COUNT = 1000
+# Amount of parts of a single object copied at the same time
+REPLICATE_PART_CONCURRENCY = int(os.environ.get("SWIFT_UI_REPLICATE_PART_CONCURRENCY", 8))
+# Amount of objects copied at the same time by a bucket replication job
+REPLICATE_CONCURRENCY = int(os.environ.get("SWIFT_UI_REPLICATE_CONCURRENCY", 16))
+# Listed objects waiting to be copied, a page of a list_objects_v2 listing,
+# so that the next page is listed while the previous one is copied
+REPLICATE_LISTING_QUEUE = 1000
+
+
+def get_part_size(size: int) -> int:
+    """Choose the part size for a multipart copy of an object."""
+    part_size = max(DEFAULT_PART_SIZE, math.ceil(size / TARGET_PART_COUNT))
+    # Round up to whole MiB
+    part_size = math.ceil(part_size / (1024 * 1024)) * 1024 * 1024
+    return max(min(part_size, MAX_PART_SIZE), math.ceil(size / MAX_PART_COUNT))
 
 
 class ObjectReplicator:
@@ -36,6 +57,8 @@ class ObjectReplicator:
         source_bucket: str,
         project_name: str = "",
         source_project_name: str = "",
+        concurrency: int = REPLICATE_CONCURRENCY,
+        part_concurrency: int = REPLICATE_PART_CONCURRENCY,
     ) -> None:
         """."""
         self.s3client = s3client
@@ -46,11 +69,24 @@ class ObjectReplicator:
         self.source_bucket = source_bucket
         self.project_name = project_name
         self.source_project_name = source_project_name
+        self.concurrency = max(concurrency, 1)
+        self.part_concurrency = max(part_concurrency, 1)
 
         # Create a temporary key name for the replicator
         # Doesn't need to be guaranteed to be unique
         self._key_name = str(uuid.UUID(bytes=secrets.token_bytes(16)))
 
+        # Objects that couldn't be copied, with the reason of the failure
+        self.failures: dict[str, str] = {}
+        self.copied = 0
+        self.copied_bytes = 0
+        # Listed objects not yet handled, in listing order, each with the
+        # object listed before it, and the last object before which every
+        # listed object has been handled
+        self.pending: collections.OrderedDict[str, str] = collections.OrderedDict()
+        self.last_listed = ""
+        self.marker = ""
+
     async def create_destination_bucket(self) -> None:
         """Create destination bucket required for copying."""
         # Destination bucket should not already exist
@@ -77,6 +113,55 @@ class ObjectReplicator:
                     text="Cannot create destination bucket"
                 )
 
+    async def _copy_part(
+        self, key: str, upload_id: str, part_number: int, first: int, last: int
+    ) -> dict[str, Any]:
+        """Copy a byte range of an object as a part of a multipart upload."""
+        part = await self.s3client.upload_part_copy(
+            Bucket=self.bucket,
+            Key=key,
+            CopySource={"Bucket": self.source_bucket, "Key": key},
+            CopySourceRange=f"bytes={first}-{last}",
+            PartNumber=part_number,
+            UploadId=upload_id,
+        )
+        return {"ETag": part["CopyPartResult"]["ETag"], "PartNumber": part_number}
+
+    async def _copy_parts(
+        self, key: str, upload_id: str, size: int
+    ) -> list[dict[str, Any]]:
+        """Copy the parts of an object within a sliding window.
+
+        Returns the parts in order, the first failure cancels the rest.
+        """
+        part_size = get_part_size(size)
+        tasks: list[asyncio.Task] = []
+        window: set[asyncio.Task] = set()
+        try:
+            for part_number, first in enumerate(range(0, size, part_size), 1):
+                if len(window) >= self.part_concurrency:
+                    done, window = await asyncio.wait(
+                        window, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        task.result()
+                task = asyncio.create_task(
+                    self._copy_part(
+                        key,
+                        upload_id,
+                        part_number,
+                        first,
+                        min(first + part_size, size) - 1,
+                    )
+                )
+                tasks.append(task)
+                window.add(task)
+            return list(await asyncio.gather(*tasks))
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
     async def _multipart_copy(self, obj):
         """Make a multipart copy of an object."""
         size = obj["Size"]
@@ -86,32 +171,8 @@ class ObjectReplicator:
             )
         )["UploadId"]
 
-        part_size = DEFAULT_PART_SIZE
-        if size > part_size * MAX_PART_COUNT:
-            part_size = math.ceil(size / MAX_PART_COUNT)
-        parts = []
-        part_number = 1
-        byte_position = 0
-
         try:
-            while byte_position < size:
-                last_byte = min(byte_position + part_size - 1, size - 1)
-
-                part = await self.s3client.upload_part_copy(
-                    Bucket=self.bucket,
-                    Key=obj["Key"],
-                    CopySource={"Bucket": self.source_bucket, "Key": obj["Key"]},
-                    CopySourceRange=f"bytes={byte_position}-{last_byte}",
-                    PartNumber=part_number,
-                    UploadId=upload_id,
-                )
-
-                parts.append(
-                    {"ETag": part["CopyPartResult"]["ETag"], "PartNumber": part_number}
-                )
-
-                byte_position += part_size
-                part_number += 1
+            parts = await self._copy_parts(obj["Key"], upload_id, size)
 
             await self.s3client.complete_multipart_upload(
                 Bucket=self.bucket,
@@ -130,19 +191,13 @@ class ObjectReplicator:
         key = obj["Key"]
 
         if obj["Size"] <= SINGLE_COPY_SIZE:
-            try:
-                await self.s3client.copy_object(
-                    CopySource={"Bucket": self.source_bucket, "Key": key},
-                    Bucket=self.bucket,
-                    Key=key,
-                )
-            except Exception as e:
-                LOGGER.exception(f"Failed to copy {key}: {e}")
+            await self.s3client.copy_object(
+                CopySource={"Bucket": self.source_bucket, "Key": key},
+                Bucket=self.bucket,
+                Key=key,
+            )
         else:
-            try:
-                await self._multipart_copy(obj)
-            except Exception as e:
-                LOGGER.exception(f"Failed to multipart-copy {key}: {e}")
+            await self._multipart_copy(obj)
 
         if ".c4gh" in key and self.project_name:
             LOGGER.debug(f"Copying the header for encrypted object {key}")
@@ -157,19 +212,73 @@ class ObjectReplicator:
             if header:
                 await self.vault.put_header(self.project_name, self.bucket, key, header)
 
-    async def replicate_objects(self) -> None:
-        """Copy all bucket objects."""
+    async def _replicate_objects(self, queue: asyncio.Queue) -> None:
+        """Copy queued objects until the listing ends, recording the failures."""
+        while True:
+            obj = await queue.get()
+            if obj is None:
+                return
+            key = obj["Key"]
+            try:
+                await self._replicate_object(obj)
+            except Exception as e:
+                LOGGER.exception(f"Failed to copy {key}: {e}")
+                self.failures[key] = str(e)
+            else:
+                self.copied += 1
+                self.copied_bytes += obj["Size"]
+            self._mark_handled(key)
+
+    def _mark_handled(self, key: str) -> None:
+        """Advance the marker past the objects handled in listing order."""
+        # Handled objects are forgotten right away, so a slow object only
+        # holds back the marker and not the memory of the objects after it
+        self.pending.pop(key, None)
+        self.marker = next(iter(self.pending.values()), self.last_listed)
+
+    async def replicate_objects(self, start_after: str = "") -> None:
+        """Copy all bucket objects, or the ones after start_after."""
         await self.check_public_key()
+        # Objects are copied while the rest of the bucket is being listed
+        queue: asyncio.Queue = asyncio.Queue(REPLICATE_LISTING_QUEUE)
+        workers = [
+            asyncio.create_task(self._replicate_objects(queue))
+            for _ in range(0, self.concurrency)
+        ]
         try:
             paginator = self.s3client.get_paginator("list_objects_v2")
+            params = {"Bucket": self.source_bucket}
+            if start_after:
+                params["StartAfter"] = start_after
 
-            async for page in paginator.paginate(Bucket=self.source_bucket):
+            async for page in paginator.paginate(**params):
                 for obj in page.get("Contents", []):
-                    await self._replicate_object(obj)
-            LOGGER.info(f"Replication task for {self.source_bucket} finished")
+                    self.pending[obj["Key"]] = self.last_listed
+                    self.last_listed = obj["Key"]
+                    await queue.put(obj)
+            # Each worker stops at the end of the listing
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+            LOGGER.info(
+                f"Replication task for {self.source_bucket} finished, copied "
+                f"{self.copied} objects, {len(self.failures)} failed"
+            )
         finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
             await self.remove_public_key()
 
+    def get_progress(self) -> dict[str, Any]:
+        """Return the progress of the bucket replication."""
+        return {
+            "marker": self.marker,
+            "copied": self.copied,
+            "bytes": self.copied_bytes,
+            "failures": self.failures,
+        }
+
     async def check_public_key(self) -> None:
         """Check that the source project public key is whitelisted."""
         if self.project_name:
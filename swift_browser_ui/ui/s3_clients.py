@@ -0,0 +1,150 @@
+"""Pool of S3 clients shared by the S3 API handlers."""
+
+import collections
+import contextlib
+import logging
+import os
+import time
+import typing
+
+import aioboto3
+import botocore.config
+
+from swift_browser_ui.ui.replicate import (
+    REPLICATE_CONCURRENCY,
+    REPLICATE_PART_CONCURRENCY,
+)
+from swift_browser_ui.ui.settings import setd
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(os.environ.get("LOG_LEVEL", "INFO"))
+
+S3_CLIENTS = "s3_clients"
+# Amount of S3 clients kept open, one per set of project credentials
+S3_CLIENT_POOL_SIZE = int(os.environ.get("SWIFT_UI_S3_CLIENT_POOL_SIZE", 64))
+# Seconds an unused S3 client is kept open
+S3_CLIENT_IDLE_TIMEOUT = int(os.environ.get("SWIFT_UI_S3_CLIENT_IDLE_TIMEOUT", 300))
+
+
+class PooledS3Client:
+    """An open S3 client and its use in the pool."""
+
+    def __init__(self, client: typing.Any, stack: contextlib.AsyncExitStack) -> None:
+        """."""
+        self.client = client
+        self.stack = stack
+        self.users: int = 0
+        self.used: float = time.monotonic()
+
+
+class S3ClientPool:
+    """S3 clients kept open between requests, keyed by their credentials.
+
+    Reusing a client skips loading the botocore service models and keeps
+    its connections to the S3 endpoint open. Idle clients are closed when a
+    new client is opened. Clients in use are never closed, so the pool can
+    temporarily exceed its size.
+    """
+
+    def __init__(
+        self,
+        size: int = S3_CLIENT_POOL_SIZE,
+        idle_timeout: int = S3_CLIENT_IDLE_TIMEOUT,
+    ) -> None:
+        """."""
+        self.size = max(size, 1)
+        self.idle_timeout = idle_timeout
+        # New clients share the service models loaded by a single session
+        self.session = aioboto3.Session()
+        # Clients in the order they were last used, least recent first
+        self.clients: typing.OrderedDict[typing.Tuple[str, str], PooledS3Client] = (
+            collections.OrderedDict()
+        )
+        self.hits: int = 0
+        self.misses: int = 0
+
+    async def a_open_client(self, access: str, secret: str) -> PooledS3Client:
+        """Open a new S3 client with the given credentials."""
+        stack = contextlib.AsyncExitStack()
+        client = await stack.enter_async_context(
+            self.session.client(
+                "s3",
+                aws_access_key_id=access,
+                aws_secret_access_key=secret,
+                region_name="us-east-1",
+                endpoint_url=setd["s3api_endpoint"],
+                verify=setd["check_certificate"],
+                # Every concurrent replication copy needs a connection of its
+                # own, with room for the parts of a large object
+                config=botocore.config.Config(
+                    max_pool_connections=REPLICATE_CONCURRENCY
+                    + REPLICATE_PART_CONCURRENCY
+                ),
+            )
+        )
+        return PooledS3Client(client, stack)
+
+    async def a_acquire(self, access: str, secret: str) -> PooledS3Client:
+        """Return an open S3 client for the credentials, marked as in use."""
+        key = (access, secret)
+        pooled = self.clients.get(key)
+        if pooled is not None:
+            self.hits += 1
+            pooled.users += 1
+            self.clients.move_to_end(key)
+            return pooled
+
+        self.misses += 1
+        await self.a_evict()
+        opened = await self.a_open_client(access, secret)
+        # Another request may have opened a client in the meantime
+        pooled = self.clients.setdefault(key, opened)
+        # Mark the client as used before awaiting, so it can't be evicted
+        pooled.users += 1
+        self.clients.move_to_end(key)
+        if pooled is not opened:
+            await opened.stack.aclose()
+        return pooled
+
+    def release(self, pooled: PooledS3Client) -> None:
+        """Mark an S3 client as no longer used by a request."""
+        pooled.users -= 1
+        pooled.used = time.monotonic()
+
+    @contextlib.asynccontextmanager
+    async def client(self, access: str, secret: str) -> typing.AsyncIterator[typing.Any]:
+        """Use an S3 client from the pool."""
+        pooled = await self.a_acquire(access, secret)
+        try:
+            yield pooled.client
+        finally:
+            self.release(pooled)
+
+    async def a_evict(self) -> None:
+        """Close idle clients, and the least recently used ones over the size."""
+        now = time.monotonic()
+        # Leave room for a new client
+        over = len(self.clients) - self.size + 1
+        for key, pooled in list(self.clients.items()):
+            if pooled.users:
+                continue
+            if over > 0 or now - pooled.used > self.idle_timeout:
+                del self.clients[key]
+                over -= 1
+                LOGGER.debug(f"Closing pooled S3 client for access key {key[0]}.")
+                await pooled.stack.aclose()
+
+    async def a_close(self) -> None:
+        """Close all clients."""
+        clients = list(self.clients.values())
+        self.clients.clear()
+        for pooled in clients:
+            await pooled.stack.aclose()
+
+    def get_stats(self) -> typing.Dict[str, int]:
+        """Return the amount of open clients and their reuse."""
+        return {
+            "clients": len(self.clients),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
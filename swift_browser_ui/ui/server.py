@@ -17,8 +17,12 @@ import uvloop
 from idpyoidc.client.rp_handler import RPHandler
 
 import swift_browser_ui.ui.middlewares
+from swift_browser_ui.common.common_util import get_redis_client
+from swift_browser_ui.common.replication_jobs import (
+    RedisReplicationJobStore,
+    ReplicationJobs,
+)
 from swift_browser_ui.common.vault_client import VaultClient
-from swift_browser_ui.ui._convenience import get_redis_client
 from swift_browser_ui.ui.api import (
     aws_bulk_update_bucket_cors,
     aws_create_bucket,
@@ -28,6 +32,7 @@ from swift_browser_ui.ui.api import (
     close_upload_session,
     get_crypted_upload_session,
     get_os_user,
+    get_replication_job,
     get_upload_session,
     keystone_gen_ec2,
     os_list_projects,
@@ -72,6 +77,7 @@ from swift_browser_ui.ui.login import (
     sso_query_end,
 )
 from swift_browser_ui.ui.misc_handlers import handle_bounce_direct_access_request
+from swift_browser_ui.ui.s3_clients import S3_CLIENTS, S3ClientPool
 from swift_browser_ui.ui.settings import setd
 from swift_browser_ui.ui.signature import (
     handle_ext_token_create,
@@ -79,7 +85,7 @@ from swift_browser_ui.ui.signature import (
     handle_ext_token_remove,
     handle_signature_request,
 )
-from swift_browser_ui.upload.common import VAULT_CLIENT
+from swift_browser_ui.upload.common import REPLICATION_JOBS, VAULT_CLIENT
 
 # temporarily ignore typecheck from mypy until
 # this issue is fixed https://github.com/MagicStack/uvloop/issues/575
@@ -96,6 +102,7 @@ async def open_client_to_app(app: aiohttp.web.Application) -> None:
         api_client = aiohttp.ClientSession()
     app["api_client"] = api_client
     app[VAULT_CLIENT] = VaultClient(api_client)
+    app[S3_CLIENTS] = S3ClientPool()
 
 
 async def kill_dload_client(app: aiohttp.web.Application) -> None:
@@ -103,6 +110,16 @@ async def kill_dload_client(app: aiohttp.web.Application) -> None:
     await app["api_client"].close()
 
 
+async def close_replication_jobs(app: aiohttp.web.Application) -> None:
+    """Interrupt the running replication jobs, saving their state."""
+    await app[REPLICATION_JOBS].a_close()
+
+
+async def close_s3_clients(app: aiohttp.web.Application) -> None:
+    """Close the pooled S3 clients."""
+    await app[S3_CLIENTS].a_close()
+
+
 async def servinit(
     inject_middleware: typing.List[typing.Any] | None = None,
 ) -> aiohttp.web.Application:
@@ -131,6 +148,8 @@ async def servinit(
         redis_client,
         cookie_name="SWIFT_UI_SESSION",
     )
+    # Replication jobs are tracked in the same Redis as the sessions
+    app[REPLICATION_JOBS] = ReplicationJobs(RedisReplicationJobStore(redis_client))
     app["seckey"] = base64.urlsafe_b64decode(cryptography.fernet.Fernet.generate_key())
     aiohttp_session.setup(
         app,
@@ -278,6 +297,7 @@ async def servinit(
     app.add_routes(
         [
             aiohttp.web.post("/replicate/{project}/{bucket}", replicate_bucket),
+            aiohttp.web.get("/replicate/jobs/{job}", get_replication_job),
         ]
     )
 
@@ -304,6 +324,8 @@ async def servinit(
     app.on_startup.append(open_client_to_app)
 
     # Add graceful shutdown handler
+    app.on_shutdown.append(close_replication_jobs)
+    app.on_shutdown.append(close_s3_clients)
     app.on_shutdown.append(kill_dload_client)
 
     return app
@@ -11,14 +11,25 @@ import aiohttp.web
 import msgpack
 
 import swift_browser_ui.upload.cryptupload as cryptupload
+from swift_browser_ui.common.replication_jobs import ReplicationJobs
 from swift_browser_ui.common.vault_client import VaultClient
 from swift_browser_ui.upload.common import (
+    REPLICATION_JOBS,
+    SESSION_REAPER,
+    SESSION_STORE,
+    UPLOAD_BUDGET,
+    UPLOAD_METRICS,
+    UPLOAD_SESSIONS,
     VAULT_CLIENT,
     generate_download_url,
     get_download_host,
     get_session_id,
 )
-from swift_browser_ui.upload.replicate import ObjectReplicationProxy
+from swift_browser_ui.upload.replicate import (
+    REPLICATE_CONCURRENCY,
+    ObjectReplicationProxy,
+)
+from swift_browser_ui.upload.sessions import SessionReaper
 
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(os.environ.get("LOG_LEVEL", "INFO"))
@@ -28,7 +39,7 @@ CRYPTUPLOAD_Q_DEPTH = int(os.environ.get("SWIFTUI_UPLOAD_RUNNER_Q_DEPTH", 96))
 
 async def handle_get_object(request: aiohttp.web.Request) -> aiohttp.web.Response:
     """Handle a request for getting object content."""
-    session = request.app[get_session_id(request)]
+    session = await request.app[SESSION_STORE].a_get_session(get_session_id(request))
 
     project = request.match_info["project"]
     container = request.match_info["container"]
@@ -74,7 +85,7 @@ async def handle_replicate_container(
     request: aiohttp.web.Request,
 ) -> aiohttp.web.Response:
     """Handle request to replicating a container from a source."""
-    session = get_session_id(request)
+    session = await request.app[SESSION_STORE].a_get_session(get_session_id(request))
 
     project = request.match_info["project"]
     container = request.match_info["container"]
@@ -82,8 +93,13 @@ async def handle_replicate_container(
     source_project = request.query["from_project"]
     source_container = request.query["from_container"]
 
+    try:
+        concurrency = int(request.query.get("concurrency", REPLICATE_CONCURRENCY))
+    except ValueError:
+        raise aiohttp.web.HTTPBadRequest(reason="Concurrency must be an integer.")
+
     replicator = ObjectReplicationProxy(
-        request.app[session],
+        session,
         request.app["client"],
         request.app[VAULT_CLIENT],
         project,
@@ -96,20 +112,56 @@ async def handle_replicate_container(
             if "from_project_name" in request.query
             else ""
         ),
+        concurrency,
+        incremental="incremental" in request.query,
     )
 
-    # Ensure that both containers exist
-    await replicator.a_ensure_container()
-    await replicator.a_ensure_container(segmented=True)
+    jobs: ReplicationJobs = request.app[REPLICATION_JOBS]
+    key = f"swift/{project}/{container}/{source_project}/{source_container}"
+    job = await jobs.a_find_unfinished_job(key)
+    if job is not None and await jobs.a_is_running(job):
+        return aiohttp.web.json_response({"job": job["id"]}, status=202)
+
+    if job is None:
+        # Ensure that both containers exist, an incremental copy can update
+        # an earlier one
+        await replicator.a_ensure_container(exist_ok=replicator.incremental)
+        await replicator.a_ensure_container(
+            segmented=True, exist_ok=replicator.incremental
+        )
+    else:
+        LOGGER.info(f"Resuming replication job {job['id']} to {container}.")
 
-    asyncio.ensure_future(replicator.a_copy_from_container())
+    job = await jobs.a_start(
+        key,
+        {
+            "project": project,
+            "container": container,
+            "source_project": source_project,
+            "source_container": source_container,
+        },
+        replicator.a_copy_from_container,
+        replicator.get_progress,
+        job,
+    )
+    return aiohttp.web.json_response({"job": job["id"]}, status=202)
 
-    return aiohttp.web.Response(status=202)
+
+async def handle_get_replication_job(
+    request: aiohttp.web.Request,
+) -> aiohttp.web.Response:
+    """Handle a request for the state of a container replication job."""
+    session = await request.app[SESSION_STORE].a_get_session(get_session_id(request))
+    job = await request.app[REPLICATION_JOBS].a_get_job(request.match_info["job"])
+    if job["project"] != session["project"]:
+        raise aiohttp.web.HTTPForbidden(reason="Replication job of another project")
+    del job["key"]
+    return aiohttp.web.json_response(job)
 
 
 async def handle_replicate_object(request: aiohttp.web.Request) -> aiohttp.web.Response:
     """Handle a request to replicating an object from a source."""
-    session = get_session_id(request)
+    session = await request.app[SESSION_STORE].a_get_session(get_session_id(request))
 
     project = request.match_info["project"]
     container = request.match_info["container"]
@@ -119,7 +171,7 @@ async def handle_replicate_object(request: aiohttp.web.Request) -> aiohttp.web.R
     source_object = request.query["from_object"]
 
     replicator = ObjectReplicationProxy(
-        request.app[session],
+        session,
         request.app["client"],
         request.app[VAULT_CLIENT],
         project,
@@ -214,26 +266,51 @@ async def handle_upload_ws(
     request: aiohttp.web.Request,
 ) -> aiohttp.web.WebSocketResponse:
     """Handle parallel file upload data via a websocket."""
-    upload_session: cryptupload.UploadSession = cryptupload.get_encrypted_upload_session(
-        request
+    upload_session: cryptupload.UploadSession = (
+        await cryptupload.get_encrypted_upload_session(request)
     )
 
-    ws = aiohttp.web.WebSocketResponse()
+    # Clients offering the v2 subprotocol can send chunks as binary frames
+    ws = aiohttp.web.WebSocketResponse(protocols=(cryptupload.UPLOAD_PROTOCOL_V2,))
     await ws.prepare(request)
 
     upload_session.set_ws(ws)
 
-    LOGGER.info(f"Upload session websocket opened for {request.url.path}")
+    LOGGER.info(
+        f"Upload session websocket opened for {request.url.path} "
+        f"with protocol {ws.ws_protocol or 'msgpack'}"
+    )
 
-    async for msg in ws:
-        if msg.type == "close":
-            await upload_session.handle_close()
-            LOGGER.info(f"Closing the websocket for {request.url.path}")
-            await ws.close()
+    # Upload metrics are pushed to the client only if enabled
+    push_metrics = asyncio.create_task(upload_session.push_metrics(ws))
+
+    # Set when the client closes the websocket itself instead of losing it
+    client_closed = False
+    while True:
+        msg = await ws.receive()
+        if msg.type == aiohttp.web.WSMsgType.CLOSE:
+            LOGGER.info(f"Client closed the websocket for {request.url.path}")
+            client_closed = True
+            break
+        if msg.type in {
+            aiohttp.web.WSMsgType.CLOSING,
+            aiohttp.web.WSMsgType.CLOSED,
+            aiohttp.web.WSMsgType.ERROR,
+        }:
+            break
+        upload_session.touch()
 
         # Open msgpack and handle message
         try:
-            msg_unpacked: typing.Dict[str, typing.Any] = msgpack.unpackb(msg.data)
+            if upload_session.uses_chunk_frames() and cryptupload.is_chunk_frame(
+                msg.data
+            ):
+                await upload_session.handle_upload_frame(msg.data)
+                continue
+
+            msg_unpacked: typing.Dict[str, typing.Any] = cryptupload.unpack_message(
+                msg.data
+            )
 
             if msg_unpacked["command"] == "add_header":
                 await upload_session.handle_begin_upload(msg_unpacked)
@@ -241,6 +318,8 @@ async def handle_upload_ws(
                 await upload_session.handle_upload_chunk(msg_unpacked)
             if msg_unpacked["command"] == "add_chunks":
                 await upload_session.handle_upload_chunks(msg_unpacked)
+            if msg_unpacked["command"] == "resume":
+                await upload_session.handle_resume_upload(msg_unpacked)
             if msg_unpacked["command"] == "cancel":
                 await upload_session.handle_close()
             if msg_unpacked["command"] == "finish":
@@ -254,6 +333,19 @@ async def handle_upload_ws(
         except msgpack.exceptions.FormatError:
             LOGGER.error("Incorrectly formatted message.")
             LOGGER.error(msg.data)
+        except KeyError as e:
+            LOGGER.error(f"Message for an unknown upload or without {e}.")
+            LOGGER.debug(msg.data)
+
+    push_metrics.cancel()
+    await asyncio.gather(push_metrics, return_exceptions=True)
+
+    # Keep the unfinished uploads for resuming only if the connection was lost
+    # and the client can resume them, otherwise they'd wait for nothing
+    await upload_session.handle_disconnect(
+        ws,
+        resume=not client_closed and ws.ws_protocol == cryptupload.UPLOAD_PROTOCOL_V2,
+    )
 
     return ws
 
@@ -278,6 +370,56 @@ async def handle_health_check(request: aiohttp.web.Request) -> aiohttp.web.Respo
     )
 
 
+async def handle_get_upload_budget(
+    request: aiohttp.web.Request,
+) -> aiohttp.web.Response:
+    """Answer the occupancy of the process wide upload memory budget."""
+    budget: cryptupload.UploadBudget = request.app[UPLOAD_BUDGET]
+    return aiohttp.web.json_response(budget.get_stats())
+
+
+async def handle_get_upload_sessions(
+    request: aiohttp.web.Request,
+) -> aiohttp.web.Response:
+    """Answer the live upload sessions of the process and their buffer usage."""
+    reaper: SessionReaper = request.app[SESSION_REAPER]
+    sessions = [
+        # The session id is a credential, so only list a prefix for telling
+        # the sessions apart
+        {"session": key[:8], **upload_session.get_stats()}
+        for key, projects in request.app[UPLOAD_SESSIONS].items()
+        for upload_session in projects.values()
+    ]
+    return aiohttp.web.json_response(
+        {
+            "sessions": sessions,
+            "buffered": sum(session["buffered"] for session in sessions),
+            "reaper": reaper.get_stats(),
+        }
+    )
+
+
+async def handle_get_upload_metrics(
+    request: aiohttp.web.Request,
+) -> aiohttp.web.Response:
+    """Answer the upload throughput and latency metrics of the process."""
+    metrics: cryptupload.UploadMetrics = request.app[UPLOAD_METRICS]
+    return aiohttp.web.json_response(
+        {
+            **metrics.get_stats(),
+            "sessions": [
+                {
+                    "session": key[:8],
+                    "project": upload_session.project,
+                    **upload_session.metrics.get_stats(),
+                }
+                for key, projects in request.app[UPLOAD_SESSIONS].items()
+                for upload_session in projects.values()
+            ],
+        }
+    )
+
+
 async def handle_project_key(request: aiohttp.web.Request) -> aiohttp.web.Response:
     """Answer project specific encryption keys."""
     vault_client: VaultClient = request.app[VAULT_CLIENT]
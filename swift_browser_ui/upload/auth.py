@@ -3,6 +3,7 @@
 import logging
 import os
 import secrets
+import typing
 
 import aiohttp
 import aiohttp.web
@@ -10,6 +11,7 @@ import aiohttp.web
 import swift_browser_ui.common.signature
 import swift_browser_ui.common.types
 import swift_browser_ui.upload.common
+from swift_browser_ui.upload.common import SESSION_STORE, UPLOAD_SESSIONS
 
 LOGGER = logging.getLogger(__name__)
 
@@ -22,10 +24,10 @@ async def handle_login(request: aiohttp.web.Request) -> aiohttp.web.StreamRespon
     try:
         project = request.match_info["project"]
         login_form = await request.post()
-        request.app[session_key] = {}
-        request.app[session_key]["uploads"] = {}
-        request.app[session_key]["enuploads"] = {}
-        request.app[session_key]["token"] = login_form["token"]
+        session: typing.Dict[str, typing.Any] = {
+            "project": project,
+            "token": login_form["token"],
+        }
 
         async with client.post(
             f"{os.environ.get('OS_AUTH_URL')}/auth/tokens",
@@ -36,7 +38,7 @@ async def handle_login(request: aiohttp.web.Request) -> aiohttp.web.StreamRespon
                             "token",
                         ],
                         "token": {
-                            "id": request.app[session_key]["token"],
+                            "id": session["token"],
                         },
                     },
                     "scope": {"project": {"id": project}},
@@ -51,11 +53,11 @@ async def handle_login(request: aiohttp.web.Request) -> aiohttp.web.StreamRespon
                     f"Could not log in session {session_key} due to no service access with token."
                 )
                 raise aiohttp.web.HTTPForbidden(reason="No access to service with token.")
-            request.app[session_key]["token"] = ret.headers["X-Subject-Token"]
+            session["token"] = ret.headers["X-Subject-Token"]
             token = await ret.json()
             LOGGER.debug(token)
             # Use the first available public endpoint
-            request.app[session_key]["endpoint"] = [
+            session["endpoint"] = [
                 list(filter(lambda i: i["interface"] == "public", i["endpoints"]))[0][
                     "url"
                 ]
@@ -63,8 +65,9 @@ async def handle_login(request: aiohttp.web.Request) -> aiohttp.web.StreamRespon
                     lambda i: i["type"] == "object-store", token["token"]["catalog"]
                 )
             ][0]
-            LOGGER.debug(f"Using endpoint {request.app[session_key]['endpoint']}")
-            print(request.app[session_key])
+            LOGGER.debug(f"Using endpoint {session['endpoint']}")
+        # Store the session where all runner processes can find it
+        await request.app[SESSION_STORE].a_put_session(session_key, session)
         resp = aiohttp.web.Response(
             status=200,
             body="OK",
@@ -78,12 +81,12 @@ async def handle_login(request: aiohttp.web.Request) -> aiohttp.web.StreamRespon
 
 async def handle_logout(request: aiohttp.web.Request) -> aiohttp.web.Response:
     """Close the specified upload session."""
-    try:
-        # We can safely ignore any errors in keys, since that just means the session
-        # doesn't exist
-        session_key: str = swift_browser_ui.upload.common.get_session_id(request)
-        request.app.pop(session_key)
-    except KeyError:
-        pass
+    session_key: str = swift_browser_ui.upload.common.get_session_id(request)
+    # Deleting a session that doesn't exist is a no-op
+    await request.app[SESSION_STORE].a_delete_session(session_key)
+    # Close the upload websockets served by this process
+    upload_sessions = request.app[UPLOAD_SESSIONS].pop(session_key, {})
+    for upload_session in upload_sessions.values():
+        await upload_session.handle_close()
 
     return aiohttp.web.Response(status=204)
@@ -11,8 +11,19 @@ LOGGER.setLevel(os.environ.get("LOG_LEVEL", "INFO"))
 
 
 VAULT_CLIENT = "vault_client"
+UPLOAD_BUDGET = "upload_budget"
+UPLOAD_METRICS = "upload_metrics"
+SESSION_STORE = "session_store"
+UPLOAD_SESSIONS = "upload_sessions"
+SESSION_REAPER = "session_reaper"
+REPLICATION_JOBS = "replication_jobs"
 SEGMENTS_CONTAINER = "_segments"
 
+# Write static large object manifests instead of X-Object-Manifest ones
+USE_SLO = os.environ.get("SWIFTUI_UPLOAD_RUNNER_SLO", "False") == "True"
+# Most segments Swift accepts in a static manifest, max_manifest_segments
+SLO_MAX_SEGMENTS = int(os.environ.get("SWIFTUI_UPLOAD_RUNNER_SLO_MAX_SEGMENTS", 1000))
+
 
 def generate_download_url(
     host: str,
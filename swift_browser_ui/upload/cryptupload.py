@@ -2,12 +2,24 @@
 
 import asyncio
 import base64
+import bisect
+import collections
+import contextlib
+import functools
+import hashlib
+import heapq
+import itertools
+import json
 import logging
+import mmap
 import os
-import random
 import secrets
 import ssl
+import struct
+import tempfile
+import time
 import typing
+import urllib.parse
 
 import aiohttp.client
 import aiohttp.web
@@ -31,9 +43,662 @@ SEGMENT_SIZE = 5368708140
 SEGMENT_CHUNKS = 81885
 CHUNK_SIZE = 65564
 
+# Segment size used when the upload doesn't request one, rounded down to
+# a multiple of the chunk size
+CRYPTUPLOAD_SEGMENT_SIZE = int(
+    os.environ.get("SWIFTUI_UPLOAD_RUNNER_SEGMENT_SIZE", SEGMENT_SIZE)
+)
+# Amount of segments of a single file that can be uploaded concurrently
+CRYPTUPLOAD_SEGMENT_CONCURRENCY = int(
+    os.environ.get("SWIFTUI_UPLOAD_RUNNER_SEGMENT_CONCURRENCY", 1)
+)
+
+# Files up to this size are buffered and uploaded as a single object,
+# without a segments container or a manifest
+CRYPTUPLOAD_DIRECT_MAX = int(os.environ.get("SWIFTUI_UPLOAD_RUNNER_DIRECT_MAX", 8388608))
+
+# Seconds an upload is kept for resuming after its websocket disconnects
+CRYPTUPLOAD_RESUME_TIMEOUT = int(
+    os.environ.get("SWIFTUI_UPLOAD_RUNNER_RESUME_TIMEOUT", 3600)
+)
+
+# Amount of files of an upload session streamed at the same time, the rest
+# wait until the client is told to start them
+CRYPTUPLOAD_SESSION_FILES = int(os.environ.get("SWIFTUI_UPLOAD_RUNNER_SESSION_FILES", 4))
+# Amount of segments of an upload session uploaded at the same time. A segment
+# request stays open until Swift has stored the data, while the chunk window
+# already lets the next segments start, so by default every streamed file can
+# have twice its segment concurrency in flight
+CRYPTUPLOAD_SESSION_SEGMENTS = int(
+    os.environ.get(
+        "SWIFTUI_UPLOAD_RUNNER_SESSION_SEGMENTS",
+        CRYPTUPLOAD_SESSION_FILES * (2 * CRYPTUPLOAD_SEGMENT_CONCURRENCY + 1),
+    )
+)
+
+# Amount of times a failed or corrupted segment is uploaded again
+CRYPTUPLOAD_SEGMENT_RETRIES = int(
+    os.environ.get("SWIFTUI_UPLOAD_RUNNER_SEGMENT_RETRIES", 2)
+)
+# Amount of chunks hashed at a time outside the event loop
+DIGEST_BATCH = 16
+# Segments up to this size keep their chunks until they're stored, so they
+# can be uploaded again without the client sending the chunks again
+CRYPTUPLOAD_RETRY_BUFFER = int(
+    os.environ.get("SWIFTUI_UPLOAD_RUNNER_RETRY_BUFFER", 67108864)
+)
+
+# Seconds a container is remembered to exist after checking or creating it
+CRYPTUPLOAD_CONTAINER_CACHE_TTL = int(
+    os.environ.get("SWIFTUI_UPLOAD_RUNNER_CONTAINER_CACHE_TTL", 300)
+)
+
+# Amount of segments removed with a single bulk delete request when an
+# upload is aborted, Swift allows up to 10000 by default
+CRYPTUPLOAD_BULK_DELETE_SIZE = int(
+    os.environ.get("SWIFTUI_UPLOAD_RUNNER_BULK_DELETE_SIZE", 10000)
+)
+# Amount of concurrent segment deletions when bulk delete isn't available
+CRYPTUPLOAD_DELETE_CONCURRENCY = int(
+    os.environ.get("SWIFTUI_UPLOAD_RUNNER_DELETE_CONCURRENCY", 8)
+)
+
 # Use an approx 10 MiB queue for each upload by default
 CRYPTUPLOAD_Q_DEPTH = int(os.environ.get("SWIFTUI_UPLOAD_RUNNER_Q_DEPTH", 160))
 
+# Use an approx 1 GiB memory budget for the chunk caches of all uploads by default
+CRYPTUPLOAD_MEM_BUDGET = int(
+    os.environ.get("SWIFTUI_UPLOAD_RUNNER_MEM_BUDGET", 1073741824)
+)
+
+# Spill chunks of an encrypted upload to a temporary file in this directory
+# once the in-memory cache of the upload is full, disabled by default
+CRYPTUPLOAD_SPILL_DIR = os.environ.get("SWIFTUI_UPLOAD_RUNNER_SPILL_DIR", "")
+# Use an approx 4 MiB in-memory cache per upload before spilling by default
+CRYPTUPLOAD_SPILL_WATERMARK = int(
+    os.environ.get("SWIFTUI_UPLOAD_RUNNER_SPILL_WATERMARK", 4194304)
+)
+# Use an approx 256 MiB spill file per upload by default
+CRYPTUPLOAD_SPILL_SIZE = int(
+    os.environ.get("SWIFTUI_UPLOAD_RUNNER_SPILL_SIZE", 268435456)
+)
+
+# Time to wait for a missing chunk before asking the client to resend it
+CHUNK_RETRY_TIMEOUT = 60
+
+# Upper bounds in seconds of the chunk arrival-to-send latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+# Seconds between the upload metrics pushed to the client, 0 disables pushing
+CRYPTUPLOAD_METRICS_INTERVAL = int(
+    os.environ.get("SWIFTUI_UPLOAD_RUNNER_METRICS_INTERVAL", 0)
+)
+
+# Copying the chunks out of frames smaller than this is cheaper than
+# decoding views of the frame in Python
+ZERO_COPY_MIN_FRAME = 524288
+
+# Websocket subprotocol for the binary chunk framing. Clients not offering it
+# are served with msgpack messages only.
+UPLOAD_PROTOCOL_V2 = "swift-upload.v2"
+# A v2 chunk frame starts with the frame type, the upload handle assigned in
+# start_upload and the amount of records, followed by the chunk records, each
+# consisting of chunk order and length followed by the chunk data
+FRAME_CHUNKS = 0x01
+FRAME_HEADER = struct.Struct(">BII")
+FRAME_RECORD = struct.Struct(">QI")
+
+# msgpack type bytes of fixed size numbers mapped to their struct formats
+MSGPACK_NUMBERS = {
+    0xCA: ">f",
+    0xCB: ">d",
+    0xCC: ">B",
+    0xCD: ">H",
+    0xCE: ">I",
+    0xCF: ">Q",
+    0xD0: ">b",
+    0xD1: ">h",
+    0xD2: ">i",
+    0xD3: ">q",
+}
+
+
+def _decode_msgpack(buf: memoryview, pos: int) -> typing.Tuple[typing.Any, int]:
+    """Decode a msgpack object, returning bin objects as views of the buffer."""
+    first = buf[pos]
+    pos += 1
+    if first <= 0x7F:
+        return first, pos
+    if 0xA0 <= first <= 0xBF:
+        end = pos + (first & 0x1F)
+        return str(buf[pos:end], "utf-8"), end
+    if 0x80 <= first <= 0x8F:
+        return _decode_msgpack_map(buf, pos, first & 0x0F)
+    if 0xC4 <= first <= 0xC6:
+        size = 1 << (first - 0xC4)
+        end = pos + size + int.from_bytes(buf[pos : pos + size], "big")
+        if end > len(buf):
+            raise IndexError("Binary field runs past the end of the frame")
+        return buf[pos + size : end], end
+    if first in MSGPACK_NUMBERS:
+        fmt = MSGPACK_NUMBERS[first]
+        return struct.unpack_from(fmt, buf, pos)[0], pos + struct.calcsize(fmt)
+    if 0x90 <= first <= 0x9F:
+        return _decode_msgpack_array(buf, pos, first & 0x0F)
+    if first >= 0xE0:
+        return first - 0x100, pos
+    if 0xD9 <= first <= 0xDB:
+        size = 1 << (first - 0xD9)
+        end = pos + size + int.from_bytes(buf[pos : pos + size], "big")
+        return str(buf[pos + size : end], "utf-8"), end
+    if first in {0xDC, 0xDD}:
+        size = 2 if first == 0xDC else 4
+        length = int.from_bytes(buf[pos : pos + size], "big")
+        return _decode_msgpack_array(buf, pos + size, length)
+    if first in {0xDE, 0xDF}:
+        size = 2 if first == 0xDE else 4
+        length = int.from_bytes(buf[pos : pos + size], "big")
+        return _decode_msgpack_map(buf, pos + size, length)
+    if first == 0xC0:
+        return None, pos
+    if first in {0xC2, 0xC3}:
+        return first == 0xC3, pos
+    raise msgpack.exceptions.FormatError(f"Unsupported msgpack type {first:#x}")
+
+
+def _decode_msgpack_map(
+    buf: memoryview, pos: int, length: int
+) -> typing.Tuple[typing.Dict[typing.Any, typing.Any], int]:
+    """Decode a msgpack map with the given amount of items."""
+    ret = {}
+    for _ in range(length):
+        key, pos = _decode_msgpack(buf, pos)
+        ret[key], pos = _decode_msgpack(buf, pos)
+    return ret, pos
+
+
+def _decode_msgpack_array(
+    buf: memoryview, pos: int, length: int
+) -> typing.Tuple[typing.List[typing.Any], int]:
+    """Decode a msgpack array with the given amount of items."""
+    ret = []
+    for _ in range(length):
+        item, pos = _decode_msgpack(buf, pos)
+        ret.append(item)
+    return ret, pos
+
+
+def unpack_message(frame: bytes) -> typing.Any:
+    """Unpack a websocket message without copying the chunk data.
+
+    Binary fields of large frames are returned as memoryview slices of the
+    frame, so the uploaded data isn't copied before it's sent to Swift.
+    """
+    if len(frame) < ZERO_COPY_MIN_FRAME:
+        return msgpack.unpackb(frame)
+    try:
+        ret, pos = _decode_msgpack(memoryview(frame), 0)
+    except (IndexError, TypeError, UnicodeDecodeError, struct.error):
+        raise msgpack.exceptions.FormatError("Truncated or malformed message")
+    if pos != len(frame):
+        raise msgpack.exceptions.ExtraData(ret, frame[pos:])
+    return ret
+
+
+def get_segment_chunks(segment_size: int = 0) -> int:
+    """Return the amount of chunks in a segment of the requested size.
+
+    The segment size is rounded down to a multiple of the chunk size and
+    capped to the largest segment Swift accepts.
+    """
+    if segment_size <= 0:
+        segment_size = CRYPTUPLOAD_SEGMENT_SIZE
+    return min(max(segment_size // CHUNK_SIZE, 1), SEGMENT_CHUNKS)
+
+
+def is_chunk_frame(frame: bytes) -> bool:
+    """Check if the message is a v2 chunk frame instead of a msgpack message."""
+    # Message type byte of a chunk frame can't start a msgpack map
+    return len(frame) > 0 and frame[0] == FRAME_CHUNKS
+
+
+def pack_chunk_frame(
+    handle: int,
+    chunks: typing.Iterable[typing.Tuple[int, bytes]],
+) -> bytes:
+    """Pack chunks of an upload into a v2 chunk frame."""
+    records = [(order, data) for order, data in chunks]
+    ret = [FRAME_HEADER.pack(FRAME_CHUNKS, handle, len(records))]
+    for order, data in records:
+        ret.append(FRAME_RECORD.pack(order, len(data)))
+        ret.append(data)
+    return b"".join(ret)
+
+
+def unpack_chunk_frame(
+    frame: bytes,
+) -> typing.Tuple[int, typing.List[typing.Tuple[int, memoryview]]]:
+    """Unpack a v2 chunk frame into the upload handle and chunks.
+
+    Chunk data is returned as memoryview slices of the frame.
+    """
+    buf = memoryview(frame)
+    try:
+        _, handle, count = FRAME_HEADER.unpack_from(buf, 0)
+        pos = FRAME_HEADER.size
+        chunks = []
+        for _ in range(count):
+            order, length = FRAME_RECORD.unpack_from(buf, pos)
+            pos += FRAME_RECORD.size
+            chunks.append((order, buf[pos : pos + length]))
+            pos += length
+    except struct.error:
+        raise msgpack.exceptions.FormatError("Truncated chunk frame")
+    if pos != len(buf):
+        raise msgpack.exceptions.FormatError("Chunk frame length mismatch")
+    return handle, chunks
+
+
+class UploadBudget:
+    """Byte budget shared by the chunk buffers of all uploads in the process.
+
+    Every active upload gets an equal share of the budget. An upload is
+    allowed to receive more chunks only while its cache is below that share.
+    """
+
+    def __init__(self, limit: int = CRYPTUPLOAD_MEM_BUDGET):
+        """."""
+        self.limit = limit
+        self.used = 0
+        self.uploads: typing.Dict["FileUpload", int] = {}
+
+    def fair_share(self) -> int:
+        """Return the amount of bytes a single upload may keep cached."""
+        return self.limit // max(len(self.uploads), 1)
+
+    def has_room(self, upload: "FileUpload") -> bool:
+        """Check if the upload is allowed to receive more chunks."""
+        return self.uploads.get(upload, 0) < self.fair_share()
+
+    def register(self, upload: "FileUpload") -> None:
+        """Add an upload to the budget."""
+        if upload not in self.uploads:
+            self.uploads[upload] = 0
+            # The shares of the other uploads shrank
+            self.notify_all()
+
+    def unregister(self, upload: "FileUpload") -> None:
+        """Remove an upload and return its reserved bytes to the budget."""
+        if upload in self.uploads:
+            self.used -= self.uploads.pop(upload)
+            # The shares of the other uploads grew
+            self.notify_all()
+
+    def reserve(self, upload: "FileUpload", amount: int) -> None:
+        """Account for bytes cached or kept by the upload."""
+        if upload in self.uploads:
+            self.uploads[upload] += amount
+            self.used += amount
+
+    def release(self, upload: "FileUpload", amount: int) -> None:
+        """Account for bytes no longer cached or kept by the upload."""
+        if upload in self.uploads:
+            self.uploads[upload] -= amount
+            self.used -= amount
+
+    def notify_all(self) -> None:
+        """Wake up all uploads waiting for cache space."""
+        for upload in self.uploads:
+            upload.cache_drained.set()
+
+    def get_stats(self) -> typing.Dict[str, typing.Any]:
+        """Return the budget occupancy."""
+        return {
+            "limit": self.limit,
+            "used": self.used,
+            "uploads": len(self.uploads),
+            "share": self.fair_share(),
+            "largest": max(self.uploads.values(), default=0),
+        }
+
+
+class UploadScheduler:
+    """Scheduler for the files and segments of an upload session.
+
+    Files are started in the order their headers arrive, and only a few of
+    them are streamed at a time. Segment requests of the whole session share
+    a limited amount of slots, which are handed to the earliest started file
+    first, so started files get finished before the later ones progress.
+    """
+
+    def __init__(
+        self,
+        max_files: int = CRYPTUPLOAD_SESSION_FILES,
+        max_segments: int = CRYPTUPLOAD_SESSION_SEGMENTS,
+    ):
+        """."""
+        self.max_files = max(max_files, 1)
+        self.max_segments = max(max_segments, 1)
+        self.pending: typing.Deque["FileUpload"] = collections.deque()
+        self.active: typing.Set["FileUpload"] = set()
+        self.sequence = itertools.count(1)
+
+        self.segments: int = 0
+        # Segments waiting for a slot, by the start order of their file
+        self.waiters: typing.List[typing.Tuple[int, int, int, asyncio.Future]] = []
+        self.waiter_sequence = itertools.count()
+
+    def activate(self, upload: "FileUpload") -> None:
+        """Mark an upload as streamed."""
+        self.active.add(upload)
+        if not upload.priority:
+            upload.priority = next(self.sequence)
+
+    async def a_submit(self, upload: "FileUpload") -> None:
+        """Queue an upload to be started once there's room for it."""
+        self.pending.append(upload)
+        await self.a_admit()
+
+    async def a_admit(self) -> None:
+        """Start the queued uploads that fit in the limits."""
+        while self.pending and len(self.active) < self.max_files:
+            upload = self.pending.popleft()
+            self.activate(upload)
+            await upload.begin_upload()
+
+    async def a_release(self, upload: "FileUpload") -> None:
+        """Remove an upload that is no longer streamed, and start the next."""
+        if upload in self.pending:
+            self.pending.remove(upload)
+        if upload in self.active:
+            self.active.discard(upload)
+            await self.a_admit()
+
+    def clear(self) -> None:
+        """Forget the uploads that haven't been started."""
+        self.pending.clear()
+
+    @contextlib.asynccontextmanager
+    async def segment_slot(
+        self, upload: "FileUpload", order: int
+    ) -> typing.AsyncIterator[None]:
+        """Hold one of the segment slots of the session."""
+        if self.segments < self.max_segments and not self.waiters:
+            self.segments += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            heapq.heappush(
+                self.waiters,
+                (upload.priority, order, next(self.waiter_sequence), waiter),
+            )
+            try:
+                # The slot is handed over by the releasing segment
+                await waiter
+            except asyncio.CancelledError:
+                if not waiter.cancelled():
+                    # The slot was handed over just before cancelling
+                    self.release_segment()
+                raise
+        try:
+            yield
+        finally:
+            self.release_segment()
+
+    def release_segment(self) -> None:
+        """Hand a segment slot to the next waiting segment."""
+        while self.waiters:
+            waiter = heapq.heappop(self.waiters)[-1]
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.segments -= 1
+
+    def get_stats(self) -> typing.Dict[str, typing.Any]:
+        """Return the amount of streamed and queued files and segments."""
+        return {
+            "active_files": len(self.active),
+            "queued_files": len(self.pending),
+            "segments": self.segments,
+            "queued_segments": sum(not w[-1].done() for w in self.waiters),
+        }
+
+
+class ContainerCache:
+    """Cache of the containers known to exist, shared by uploads of a session.
+
+    Concurrent uploads to the same container wait for a single check instead
+    of each checking the container.
+    """
+
+    def __init__(self, ttl: int = CRYPTUPLOAD_CONTAINER_CACHE_TTL):
+        """."""
+        self.ttl = ttl
+        # Expiry times of the containers known to exist, keyed by their URL
+        self.expiries: typing.Dict[str, float] = {}
+        self.checks: typing.Dict[str, asyncio.Task] = {}
+
+    def invalidate(self, url: str) -> None:
+        """Forget a container that no longer exists."""
+        self.expiries.pop(url, None)
+
+    async def a_check(
+        self, url: str, create: typing.Callable[[], typing.Awaitable[bool]]
+    ) -> bool:
+        """Run the container check and remember a successful result."""
+        try:
+            if exists := await create():
+                self.expiries[url] = time.monotonic() + self.ttl
+            return exists
+        finally:
+            self.checks.pop(url, None)
+
+    async def a_ensure(
+        self, url: str, create: typing.Callable[[], typing.Awaitable[bool]]
+    ) -> bool:
+        """Make sure the container exists, creating it if needed."""
+        if self.expiries.get(url, 0.0) > time.monotonic():
+            return True
+        if url not in self.checks:
+            self.checks[url] = asyncio.create_task(self.a_check(url, create))
+        # A cancelled upload mustn't cancel the check of the others
+        return await asyncio.shield(self.checks[url])
+
+
+class SegmentDigest:
+    """MD5 digest of a segment, computed in a thread while it's streamed.
+
+    Hashing releases the GIL, so the digests of concurrent segments are
+    computed in parallel without blocking the event loop.
+    """
+
+    def __init__(self):
+        """."""
+        self.md5 = hashlib.md5(usedforsecurity=False)
+        self.pending: typing.List[bytes | memoryview] = []
+        self.hashing: asyncio.Future | None = None
+
+    def hash_chunks(self, chunks: typing.List[bytes | memoryview]) -> None:
+        """Add chunks to the digest."""
+        for chunk in chunks:
+            self.md5.update(chunk)
+
+    async def update(self, chunk: bytes | memoryview) -> None:
+        """Add a chunk to the digest, hashing a batch once it's full."""
+        self.pending.append(chunk)
+        if len(self.pending) >= DIGEST_BATCH:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Start hashing the pending chunks after the previous batch."""
+        if self.hashing is not None:
+            await self.hashing
+        chunks, self.pending = self.pending, []
+        self.hashing = asyncio.get_running_loop().run_in_executor(
+            None, self.hash_chunks, chunks
+        )
+
+    async def a_hexdigest(self) -> str:
+        """Return the digest of all chunks added so far."""
+        await self.flush()
+        await self.hashing  # type: ignore
+        return self.md5.hexdigest()
+
+
+class LatencyHistogram:
+    """Histogram of latencies in fixed buckets."""
+
+    def __init__(self):
+        """."""
+        # The last bucket counts the latencies above the highest bound
+        self.buckets: typing.List[int] = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count: int = 0
+        self.sum: float = 0.0
+
+    def observe(self, latency: float) -> None:
+        """Count a latency in its bucket."""
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+        self.count += 1
+        self.sum += latency
+
+    def get_stats(self) -> typing.Dict[str, typing.Any]:
+        """Return the cumulative bucket counts, keyed by their upper bound."""
+        counts = itertools.accumulate(self.buckets)
+        return {
+            "buckets": {
+                str(bound): count
+                for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), counts, strict=True)
+            },
+            "count": self.count,
+            "sum": round(self.sum, 6),
+        }
+
+
+class UploadMetrics:
+    """Throughput and latency counters, added up to the parent counters."""
+
+    def __init__(self, parent: "UploadMetrics | None" = None):
+        """."""
+        self.parent = parent
+        self.started: float = time.monotonic()
+        # Bytes received from the client, and stored in Swift
+        self.bytes_received: int = 0
+        self.bytes_acknowledged: int = 0
+        # Seconds spent waiting for chunks that hadn't arrived yet
+        self.chunk_wait: float = 0.0
+        self.chunk_retries: int = 0
+        self.segment_retries: int = 0
+        self.latency = LatencyHistogram()
+
+    def chain(self) -> typing.Iterator["UploadMetrics"]:
+        """Iterate over the counters and their parents."""
+        metrics: UploadMetrics | None = self
+        while metrics is not None:
+            yield metrics
+            metrics = metrics.parent
+
+    def add_received(self, amount: int) -> None:
+        """Count bytes received from the client."""
+        for metrics in self.chain():
+            metrics.bytes_received += amount
+
+    def add_acknowledged(self, amount: int) -> None:
+        """Count bytes stored in Swift."""
+        for metrics in self.chain():
+            metrics.bytes_acknowledged += amount
+
+    def add_chunk_wait(self, seconds: float) -> None:
+        """Count time spent waiting for a chunk."""
+        for metrics in self.chain():
+            metrics.chunk_wait += seconds
+
+    def add_chunk_retry(self) -> None:
+        """Count a chunk asked again from the client."""
+        for metrics in self.chain():
+            metrics.chunk_retries += 1
+
+    def add_segment_retry(self) -> None:
+        """Count a segment uploaded again."""
+        for metrics in self.chain():
+            metrics.segment_retries += 1
+
+    def observe_latency(self, latency: float) -> None:
+        """Record the time a chunk was buffered before being sent."""
+        for metrics in self.chain():
+            metrics.latency.observe(latency)
+
+    def get_stats(self, histogram: bool = True) -> typing.Dict[str, typing.Any]:
+        """Return the counters and the throughput to Swift."""
+        elapsed = time.monotonic() - self.started
+        stats: typing.Dict[str, typing.Any] = {
+            "bytes_received": self.bytes_received,
+            "bytes_acknowledged": self.bytes_acknowledged,
+            "throughput": round(self.bytes_acknowledged / elapsed) if elapsed else 0,
+            "chunk_wait": round(self.chunk_wait, 6),
+            "chunk_retries": self.chunk_retries,
+            "segment_retries": self.segment_retries,
+        }
+        if histogram:
+            stats["latency"] = self.latency.get_stats()
+        return stats
+
+
+class ChunkSpillFile:
+    """Pre-allocated temporary file for chunks that don't fit in memory.
+
+    The file is split into slots of a single chunk and memory mapped. Chunks
+    are copied out of the mapping when popped, as their slot gets reused
+    while they are still being sent and hashed.
+    """
+
+    def __init__(
+        self,
+        size: int = CRYPTUPLOAD_SPILL_SIZE,
+        directory: str = CRYPTUPLOAD_SPILL_DIR,
+    ):
+        """."""
+        slots = max(size // CHUNK_SIZE, 1)
+        self.file = tempfile.TemporaryFile(dir=directory or None)
+        # Truncating creates a sparse file, so disk is used only when written
+        self.file.truncate(slots * CHUNK_SIZE)
+        self.mmap = mmap.mmap(self.file.fileno(), slots * CHUNK_SIZE)
+        self.free_slots: typing.Deque[int] = collections.deque(range(slots))
+        self.chunks: typing.Dict[int, typing.Tuple[int, int]] = {}
+
+    def __contains__(self, order: int) -> bool:
+        """Check if the chunk is in the file."""
+        return order in self.chunks
+
+    def __len__(self) -> int:
+        """Return the amount of chunks in the file."""
+        return len(self.chunks)
+
+    def full(self) -> bool:
+        """Check if all slots are in use."""
+        return not self.free_slots
+
+    def fits(self, data: bytes | memoryview) -> bool:
+        """Check if the chunk can be written to the file."""
+        return bool(self.free_slots) and len(data) <= CHUNK_SIZE
+
+    def put(self, order: int, data: bytes | memoryview) -> None:
+        """Write a chunk to a free slot."""
+        slot = self.free_slots.popleft()
+        offset = slot * CHUNK_SIZE
+        self.mmap[offset : offset + len(data)] = data
+        self.chunks[order] = (slot, len(data))
+
+    def pop(self, order: int) -> bytes:
+        """Free the slot of a chunk and return a copy of its contents."""
+        slot, length = self.chunks.pop(order)
+        self.free_slots.append(slot)
+        offset = slot * CHUNK_SIZE
+        return self.mmap[offset : offset + length]
+
+    def close(self) -> None:
+        """Remove the file."""
+        self.chunks = {}
+        self.mmap.close()
+        self.file.close()
+
 
 class FileUpload:
     """Class for handling the upload of a single file."""
@@ -51,12 +716,21 @@ class FileUpload:
         total: int,
         owner: str = "",
         owner_name: str = "",
+        budget: UploadBudget | None = None,
+        segment_size: int = 0,
+        containers: ContainerCache | None = None,
+        scheduler: UploadScheduler | None = None,
+        metrics: UploadMetrics | None = None,
     ):
         """."""
         self.session = session
         self.client = client
         self.vault = vault
         self.socket = socket
+        self.budget = budget if budget is not None else UploadBudget()
+        self.containers = containers if containers is not None else ContainerCache()
+        # Counters of the upload, added up to the counters of its session
+        self.metrics = UploadMetrics(metrics)
 
         self.project = project
         self.container = container
@@ -76,32 +750,212 @@ class FileUpload:
             self.endpoint,
             self.owner if self.owner else self.project,
         )
-        self.chunk_cache: typing.Dict[int, bytes] = {}
+        self.chunk_cache: typing.Dict[int, bytes | memoryview] = {}
+        self.cache_size: int = 0
+        # Received frames the buffered chunks are views of, by their id, with
+        # the amount of buffered views and the size of the frame
+        self.frames: typing.Dict[int, typing.List[int]] = {}
+        # Chunks that didn't fit in the cache, if spilling is enabled
+        self.spill: ChunkSpillFile | None = None
+        # Waiters for chunks that haven't arrived yet, keyed by chunk order
+        self.chunk_waiters: typing.Dict[int, asyncio.Future] = {}
+        # Arrival times of the buffered chunks, keyed by chunk order
+        self.chunk_arrivals: typing.Dict[int, float] = {}
+        # Set whenever a chunk is consumed from the cache
+        self.cache_drained = asyncio.Event()
         self.failed: bool = False
         self.finished: bool = False
         self.aborted: bool = False
+        # Set while the client is disconnected, and when it was suspended
+        self.suspended: bool = False
+        self.suspended_at: float = 0.0
 
         # Calculate upload parameters
-        self.total_segments: int = -(self.total // -SEGMENT_SIZE)
-        self.remainder_segment: int = self.total % SEGMENT_SIZE
         self.total_chunks: int = -(self.total // -CHUNK_SIZE)
+        # Small files are uploaded directly as a single segment
+        self.direct: bool = 0 < self.total <= min(CRYPTUPLOAD_DIRECT_MAX, SEGMENT_SIZE)
+        self.segment_chunks: int = (
+            self.total_chunks if self.direct else get_segment_chunks(segment_size)
+        )
+        # Write a static large object manifest for the segments
+        self.slo: bool = common.USE_SLO
+        if self.slo and self.total_chunks > self.segment_chunks * common.SLO_MAX_SEGMENTS:
+            # Swift rejects manifests with too many segments, so the segments
+            # are made larger, or a dynamic manifest is used if they can't be
+            slo_chunks = -(self.total_chunks // -common.SLO_MAX_SEGMENTS)
+            self.slo = slo_chunks <= SEGMENT_CHUNKS
+            if self.slo:
+                self.segment_chunks = slo_chunks
+        self.segment_size: int = self.segment_chunks * CHUNK_SIZE
+        self.total_segments: int = -(self.total // -self.segment_size)
+        self.remainder_segment: int = self.total % self.segment_size
         self.remainder_chunks: int = -(self.remainder_segment // -CHUNK_SIZE)
+        self.segment_concurrency: int = min(
+            max(CRYPTUPLOAD_SEGMENT_CONCURRENCY, 1), max(self.total_segments, 1)
+        )
+        # Uploads outside of a session are scheduled on their own
+        self.scheduler = (
+            scheduler
+            if scheduler is not None
+            else UploadScheduler(1, 2 * self.segment_concurrency + 1)
+        )
+
+        # Bytes sliced for each segment, and the manifest entries of the
+        # uploaded segments when using a static manifest
+        self.segment_sizes: typing.Dict[int, int] = {}
+        self.segments: typing.Dict[int, typing.Dict[str, typing.Any]] = {}
+        # MD5 digests of the segments, checked against the ETag from Swift
+        self.segment_digests: typing.Dict[int, SegmentDigest] = {}
+        # Chunks of the segments being uploaded, kept for retrying them
+        self.keep_segments: bool = (
+            not self.direct and self.segment_size <= CRYPTUPLOAD_RETRY_BUFFER
+        )
+        self.segment_buffers: typing.Dict[int, typing.List[bytes | memoryview]] = {}
+        self.kept_size: int = 0
+        # Segments already stored in Swift, kept when the upload is resumed
+        self.done_segments: typing.Set[int] = set()
+        # Segments that may exist in Swift, as their upload has been started
+        self.started_segments: typing.Set[int] = set()
 
         self.tasks: typing.List[asyncio.Task] = []
+        # Numeric handle of the upload in v2 chunk frames, 0 when unused
+        self.handle: int = 0
+        # Start order of the upload in its session, 0 until started
+        self.priority: int = 0
 
         LOGGER.debug(f"total: {self.total}")
         LOGGER.debug(f"segments: {self.total_segments}")
+        LOGGER.debug(f"direct: {self.direct}")
         LOGGER.debug(f"chunks: {self.total_chunks}")
 
+    def get_segment_name(self, order: int) -> str:
+        """Return the object name of the segment with given ordering number."""
+        return f"{self.path}/{self.segment_id}/{(order + 1):08d}"
+
+    def get_buffered_size(self) -> int:
+        """Return the amount of bytes buffered in memory and on disk."""
+        spilled = 0
+        if self.spill is not None:
+            spilled = sum(length for _, length in self.spill.chunks.values())
+        return self.cache_size + spilled + self.kept_size
+
+    def get_stats(self) -> typing.Dict[str, typing.Any]:
+        """Return the progress and buffer usage of the upload."""
+        return {
+            "container": self.container,
+            "object": self.path,
+            "total": self.total,
+            "segments": self.total_segments,
+            "done_segments": len(self.done_segments),
+            "cached": self.cache_size,
+            "buffered": self.get_buffered_size(),
+            "suspended": self.suspended,
+            **self.metrics.get_stats(histogram=False),
+        }
+
+    def hold_chunk(self, data: bytes | memoryview) -> int:
+        """Return the bytes a newly buffered chunk keeps in memory.
+
+        A view keeps its whole frame alive, so the frame is counted with
+        the first buffered view of it.
+        """
+        if not isinstance(data, memoryview):
+            return len(data)
+        frame = self.frames.setdefault(id(data.obj), [0, memoryview(data.obj).nbytes])
+        frame[0] += 1
+        return frame[1] if frame[0] == 1 else 0
+
+    def free_chunk(self, data: bytes | memoryview) -> int:
+        """Return the bytes freed by dropping a buffered chunk."""
+        if not isinstance(data, memoryview):
+            return len(data)
+        frame = self.frames.get(id(data.obj))
+        if frame is None:
+            # The buffers were already cleared
+            return 0
+        frame[0] -= 1
+        if frame[0]:
+            return 0
+        del self.frames[id(data.obj)]
+        return frame[1]
+
+    def has_chunk(self, order: int) -> bool:
+        """Check if the chunk is cached in memory or on disk."""
+        return order in self.chunk_cache or (
+            self.spill is not None and order in self.spill
+        )
+
+    def get_window(self) -> int:
+        """Return the amount of chunks the upload can keep in memory."""
+        # Buffer enough chunks for the concurrent segments to stream in parallel,
+        # as the chunks of the later segments arrive while the first one drains
+        return (self.segment_concurrency - 1) * self.segment_chunks + CRYPTUPLOAD_Q_DEPTH
+
+    def cache_full(self) -> bool:
+        """Check if the upload can't receive more chunks at the moment."""
+        if CRYPTUPLOAD_SPILL_DIR:
+            # Chunks that don't fit in memory are written to disk instead
+            return self.spill is not None and self.spill.full()
+        return len(self.chunk_cache) > self.get_window() or not self.budget.has_room(self)
+
+    def spill_chunk(self, order: int, data: bytes | memoryview) -> bool:
+        """Write the chunk to disk if it doesn't fit in memory."""
+        if not CRYPTUPLOAD_SPILL_DIR or (
+            self.cache_size < CRYPTUPLOAD_SPILL_WATERMARK and self.budget.has_room(self)
+        ):
+            return False
+        if self.spill is None:
+            self.spill = ChunkSpillFile(CRYPTUPLOAD_SPILL_SIZE, CRYPTUPLOAD_SPILL_DIR)
+        if not self.spill.fits(data):
+            return False
+        self.spill.put(order, data)
+        return True
+
+    def close_spill(self) -> None:
+        """Remove the spill file of the upload if one was opened."""
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+
     async def wait_for_cache(self) -> bool:
         """Block until the cache has enough space available."""
-        while len(self.chunk_cache) > CRYPTUPLOAD_Q_DEPTH:
-            if self.finished:
+        while self.cache_full():
+            if self.finished or self.aborted:
                 return False
-            # We can safely ignore the warning about using the random library
-            await asyncio.sleep(random.uniform(0.1, 0.2))  # nosec  # noqa: S311
+            self.cache_drained.clear()
+            await self.cache_drained.wait()
         return True
 
+    async def wait_for_chunk(
+        self,
+        order: int,
+        timeout: float | None = None,
+    ) -> bool:
+        """Block until the chunk with the given order is in cache.
+
+        Return False if the upload was aborted while waiting. Raise
+        TimeoutError if the chunk doesn't arrive within ``timeout``.
+        """
+        while not self.has_chunk(order):
+            if self.aborted:
+                return False
+            waiter = self.chunk_waiters.get(order)
+            if waiter is None or waiter.done():
+                waiter = asyncio.get_running_loop().create_future()
+                self.chunk_waiters[order] = waiter
+            # Shield the shared future, so that a timeout in one waiter
+            # doesn't cancel it for the others
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        return True
+
+    def wake_waiters(self) -> None:
+        """Wake up all coroutines waiting on the chunk cache."""
+        for waiter in self.chunk_waiters.values():
+            if not waiter.done():
+                waiter.set_result(None)
+        self.chunk_waiters = {}
+        self.cache_drained.set()
+
     async def add_header(self, header: bytes) -> None:
         """Add header for the file."""
         if (
@@ -132,9 +986,22 @@ class FileUpload:
             owner=self.owner_name,
         )
 
-        self.tasks = [
+        # The client starts streaming once the scheduler admits the upload
+        await self.scheduler.a_submit(self)
+
+    async def begin_upload(self):
+        """Start the segment uploads and tell the client to stream the file."""
+        if self.done_segments and len(self.done_segments) == self.total_segments:
+            # A resumed upload may have stored all of its segments already
+            await self.a_complete_upload()
+            return
+
+        # Only the uploads being streamed share the memory budget
+        self.budget.register(self)
+        self.tasks += [
             asyncio.create_task(self.upload_segment(i))
             for i in range(0, self.total_segments)
+            if i not in self.done_segments
         ]
 
         await self.start_upload()
@@ -142,18 +1009,18 @@ class FileUpload:
     async def start_upload(self):
         """Tell the frontend to start the file upload."""
         if self.socket is not None and not self.socket.closed:
-            await self.socket.send_bytes(
-                msgpack.packb(
-                    {
-                        "command": "start_upload",
-                        "container": self.container,
-                        "object": self.path,
-                    }
-                )
-            )
+            msg: typing.Dict[str, typing.Any] = {
+                "command": "start_upload",
+                "container": self.container,
+                "object": self.path,
+            }
+            if self.handle:
+                msg["handle"] = self.handle
+            await self.socket.send_bytes(msgpack.packb(msg))
 
     async def retry_chunk(self, order):
         """Retry a failed chunk."""
+        self.metrics.add_chunk_retry()
         if self.socket is not None and not self.socket.closed:
             await self.socket.send_bytes(
                 msgpack.packb(
@@ -169,38 +1036,61 @@ class FileUpload:
     async def add_to_chunks(
         self,
         order: int,
-        data: bytes,
+        data: bytes | memoryview,
     ):
         """Add a chunk to cache."""
-        if order in self.done_chunks or order in self.chunk_cache:
+        if order in self.done_chunks or self.has_chunk(order):
             return
 
-        self.chunk_cache[order] = data
+        if not self.spill_chunk(order, data):
+            self.chunk_cache[order] = data
+            self.cache_size += len(data)
+            self.budget.reserve(self, self.hold_chunk(data))
+        self.chunk_arrivals[order] = time.monotonic()
+        self.metrics.add_received(len(data))
+
+        waiter = self.chunk_waiters.pop(order, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
 
     async def a_create_container(self) -> bool:
-        """Create the container required by the upload."""
-        for container in {self.container, f"{self.container}_segments"}:
-            async with self.client.head(
-                common.generate_download_url(self.host, container),
-                headers={"Content-Length": "0", "X-Auth-Token": self.token},
-                ssl=ssl_context,
-            ) as resp_get:
-                if resp_get.status != 204:
-                    async with self.client.put(
-                        common.generate_download_url(self.host, container),
-                        headers={"Content-Length": "0", "X-Auth-Token": self.token},
-                        ssl=ssl_context,
-                    ) as resp_put:
-                        if resp_put.status not in {201, 202}:
-                            return False
-        return True
+        """Create the containers required by the upload."""
+        containers = [self.container]
+        if not self.direct:
+            containers.append(f"{self.container}{common.SEGMENTS_CONTAINER}")
+        results = await asyncio.gather(
+            *[
+                self.containers.a_ensure(
+                    common.generate_download_url(self.host, container),
+                    functools.partial(self.a_check_container, container),
+                )
+                for container in containers
+            ]
+        )
+        return all(results)
+
+    async def a_check_container(self, container: str) -> bool:
+        """Check that a container exists, creating it if it doesn't."""
+        async with self.client.head(
+            common.generate_download_url(self.host, container),
+            headers={"Content-Length": "0", "X-Auth-Token": self.token},
+            ssl=ssl_context,
+        ) as resp_get:
+            if resp_get.status == 204:
+                return True
+        async with self.client.put(
+            common.generate_download_url(self.host, container),
+            headers={"Content-Length": "0", "X-Auth-Token": self.token},
+            ssl=ssl_context,
+        ) as resp_put:
+            return resp_put.status in {201, 202}
 
     async def slice_segment(self, segment: int):
-        """Slice a ~5GiB segment from queue."""
-        seg_start = segment * SEGMENT_CHUNKS
-        seg_end = seg_start + SEGMENT_CHUNKS
+        """Slice a segment from queue."""
+        seg_start = segment * self.segment_chunks
+        seg_end = seg_start + self.segment_chunks
         if segment == self.total_segments - 1 and self.total_chunks:
-            # In case of the object size > SEGMENT_SIZE,
+            # In case of the object size > segment size,
             # there are some variances between calculated variables
             # which can cause some missing chunks.
             # Using total_chunks for last segment's chunk amount
@@ -211,70 +1101,155 @@ class FileUpload:
 
         # Start the upload
         LOGGER.debug(f"Generator yielding chunks from {seg_start} until {seg_end}.")
-        for i in range(seg_start, seg_end):
-            wait_count = 0
-            while i not in self.chunk_cache:
-                if self.aborted:
-                    LOGGER.debug(
-                        f"Terminating slicer for segment {segment} for {self.container}/{self.path} due to upload abortion."
-                    )
-                    return
-                wait_count += 1
-                # We can safely ignore the warning about using the random library
-                await asyncio.sleep(random.uniform(0.1, 0.2))  # nosec # noqa: S311
-                # If handler has waited for too long for the next chunk, retry
-                # Currently 60 seconds is considered too long
-                if wait_count > 600:
+        self.segment_sizes[segment] = 0
+        digest = SegmentDigest()
+        self.segment_digests[segment] = digest
+        # Chunks kept from an earlier attempt are sent first
+        kept = self.segment_buffers.setdefault(segment, []) if self.keep_segments else []
+        for chunk in list(kept):
+            await digest.update(chunk)
+            self.segment_sizes[segment] += len(chunk)
+            yield chunk
+        for i in range(seg_start + len(kept), seg_end):
+            waited = 0.0 if self.has_chunk(i) else time.monotonic()
+            while True:
+                try:
+                    available = await self.wait_for_chunk(i, CHUNK_RETRY_TIMEOUT)
+                    break
+                except TimeoutError:
+                    # If handler has waited for too long for the next chunk, retry
                     try:
                         await self.retry_chunk(i)
-                        wait_count = 0
                     except ConnectionResetError:
                         pass
+            if waited:
+                self.metrics.add_chunk_wait(time.monotonic() - waited)
+            if not available:
+                LOGGER.debug(
+                    f"Terminating slicer for segment {segment} for {self.container}/{self.path} due to upload abortion."
+                )
+                return
             self.done_chunks.add(i)
-            chunk = self.chunk_cache.pop(i)
+            if i in self.chunk_cache:
+                chunk = self.chunk_cache.pop(i)
+                self.cache_size -= len(chunk)
+                self.budget.release(self, self.free_chunk(chunk))
+            else:
+                chunk = self.spill.pop(i)  # type: ignore
+            self.cache_drained.set()
+            arrived = self.chunk_arrivals.pop(i, None)
+            if arrived is not None:
+                self.metrics.observe_latency(time.monotonic() - arrived)
+            if segment in self.segment_buffers:
+                if self.budget.has_room(self):
+                    kept.append(chunk)
+                    self.kept_size += len(chunk)
+                    self.budget.reserve(self, self.hold_chunk(chunk))
+                else:
+                    # Waiting for room would stall the segment, so it can't be retried
+                    self.drop_segment_buffer(segment)
+            await digest.update(chunk)
+            self.segment_sizes[segment] += len(chunk)
             yield chunk
 
         # Finally yield eof
         return
 
+    async def read_object(self) -> bytearray:
+        """Buffer the whole file for a direct upload."""
+        body = bytearray()
+        async for chunk in self.slice_segment(0):
+            body += chunk
+        return body
+
     async def upload_segment(self, order: int) -> int:
         """Upload the segment with given ordering number."""
-        seg_start = order * SEGMENT_CHUNKS
+        seg_start = order * self.segment_chunks
         # Wait until first chunk is available in cache, before starting the request
         LOGGER.debug(f"Waiting until first chunk in segment {order} is available.")
-        while (seg_start) not in self.chunk_cache:
-            if self.aborted:
-                LOGGER.debug(
-                    f"Terminating segment {order} for {self.container}/{self.path} early due to upload abortion."
-                )
-                return 410
-            # We can safely ignore the warning about using the random library
-            await asyncio.sleep(random.uniform(0.1, 0.2))  # nosec  # noqa: S311
+        if not await self.wait_for_chunk(seg_start):
+            LOGGER.debug(
+                f"Terminating segment {order} for {self.container}/{self.path} early due to upload abortion."
+            )
+            return 410
         LOGGER.debug(f"Got first chunk for segment {order}. Starting upload...")
 
-        headers = {
-            "X-Auth-Token": self.token,
-            "Content-Type": "application/swiftclient-segment",
-        }
-
-        async with self.client.put(
-            common.generate_download_url(
+        data: typing.Any
+        if self.direct:
+            # Upload the buffered file as the object itself
+            data = await self.read_object()
+            if self.aborted:
+                return 410
+            container = self.container
+            url = common.generate_download_url(
                 self.host,
-                container=f"{self.container}{common.SEGMENTS_CONTAINER}",
-                object_name=f"{self.path}/{self.segment_id}/{(order + 1):08d}",
-            ),
-            data=self.slice_segment(order),
-            headers=headers,
-            timeout=ClientTimeout(total=UPL_TIMEOUT),
-            ssl=ssl_context,
-        ) as resp:
-            LOGGER.info(f"Segment {order} finished with status {resp.status}.")
-
-        if (
-            self.total_segments - 1 == order
-            and self.socket is not None
-            and not self.socket.closed
-        ):
+                container=container,
+                object_name=self.path,
+            )
+            # The whole object is known, so Swift can verify it while storing it
+            digest = SegmentDigest()
+            await digest.update(data)
+            headers = {"X-Auth-Token": self.token, "ETag": await digest.a_hexdigest()}
+        else:
+            container = f"{self.container}{common.SEGMENTS_CONTAINER}"
+            url = common.generate_download_url(
+                self.host,
+                container=container,
+                object_name=self.get_segment_name(order),
+            )
+            headers = {
+                "X-Auth-Token": self.token,
+                "Content-Type": "application/swiftclient-segment",
+            }
+            self.started_segments.add(order)
+            if self.keep_segments:
+                # Chunks are kept for retrying until the budget runs out
+                self.segment_buffers.setdefault(order, [])
+
+        for attempt in range(0, max(CRYPTUPLOAD_SEGMENT_RETRIES, 0) + 1):
+            if attempt:
+                self.metrics.add_segment_retry()
+                LOGGER.warning(
+                    f"Retrying segment {order} of {self.container}/{self.path}, "
+                    f"attempt {attempt}."
+                )
+            status, etag = await self.a_put_segment(
+                order, url, data if self.direct else self.slice_segment(order), headers
+            )
+            if status == 404:
+                # The container was removed, so it needs to be checked again
+                self.containers.invalidate(
+                    common.generate_download_url(self.host, container)
+                )
+            if status in {201, 202} or not self.can_retry(order, status):
+                break
+        self.drop_segment_buffer(order)
+
+        LOGGER.info(f"Segment {order} finished with status {status}.")
+        if status in {201, 202}:
+            self.done_segments.add(order)
+            self.metrics.add_acknowledged(
+                len(data) if self.direct else self.segment_sizes.get(order, 0)
+            )
+            if self.slo and not self.direct:
+                self.segments[order] = {
+                    "path": f"/{self.container}{common.SEGMENTS_CONTAINER}/"
+                    f"{self.get_segment_name(order)}",
+                    "etag": etag,
+                    "size_bytes": self.segment_sizes.get(order, 0),
+                }
+            # Segments finish in any order, the file is done with the last one
+            if len(self.done_segments) == self.total_segments and not self.finished:
+                await self.a_complete_upload()
+        elif not (self.aborted or self.suspended or self.failed):
+            await self.a_fail_upload(f"Segment {order} failed with status {status}.")
+
+        return status
+
+    async def a_complete_upload(self) -> None:
+        """Tell the client the file was uploaded, once all its segments are stored."""
+        self.finished = True
+        if self.socket is not None and not self.socket.closed:
             LOGGER.info("Informing client that file was finished.")
             await self.socket.send_bytes(
                 msgpack.packb(
@@ -285,13 +1260,102 @@ class FileUpload:
                     }
                 )
             )
-            self.finished = True
+        self.budget.unregister(self)
+        self.cache_drained.set()
+        await self.scheduler.a_release(self)
 
-        return resp.status
+    async def a_fail_upload(self, reason: str) -> None:
+        """Tell the client the file can't be uploaded, as a segment failed."""
+        self.failed = True
+        if self.socket is not None and not self.socket.closed:
+            await self.socket.send_bytes(
+                msgpack.packb(
+                    {
+                        "command": "abort",
+                        "container": self.container,
+                        "object": self.path,
+                        "reason": reason,
+                    }
+                )
+            )
+
+    async def a_put_segment(
+        self,
+        order: int,
+        url: str,
+        data: typing.Any,
+        headers: typing.Dict[str, str],
+    ) -> typing.Tuple[int, str]:
+        """Upload a segment once and verify what Swift stored."""
+        try:
+            async with (
+                self.scheduler.segment_slot(self, order),
+                self.client.put(
+                    url,
+                    data=data,
+                    headers=headers,
+                    timeout=ClientTimeout(total=UPL_TIMEOUT),
+                    ssl=ssl_context,
+                ) as resp,
+            ):
+                status = resp.status
+                etag = resp.headers.get("ETag", "").strip('"')
+        except (aiohttp.ClientError, TimeoutError) as e:
+            if not self.can_retry(order, 502):
+                raise
+            LOGGER.error(f"Segment {order} of {self.container}/{self.path} failed: {e}")
+            return 502, ""
+
+        if self.direct:
+            digest = headers["ETag"]
+        elif order in self.segment_digests:
+            digest = await self.segment_digests[order].a_hexdigest()
+        else:
+            # The request was answered without reading the segment
+            return status, etag
+        if status in {201, 202} and etag and etag != digest:
+            LOGGER.error(
+                f"Segment {order} of {self.container}/{self.path} was stored with "
+                f"ETag {etag} instead of {digest}."
+            )
+            # Swift answers with 422 when it notices the mismatch itself
+            return 422, etag
+        return status, digest
+
+    def drop_segment_buffer(self, order: int) -> None:
+        """Free the chunks kept for retrying a segment."""
+        kept = self.segment_buffers.pop(order, [])
+        self.kept_size -= sum(len(chunk) for chunk in kept)
+        self.budget.release(self, sum(self.free_chunk(chunk) for chunk in kept))
+
+    def can_retry(self, order: int, status: int) -> bool:
+        """Check if a failed segment can be uploaded again from buffered data."""
+        return (
+            (status >= 500 or status in {408, 422})
+            and (self.direct or order in self.segment_buffers)
+            and not self.aborted
+            and not self.suspended
+        )
 
     async def finish_upload(self):
         """Finalize the upload."""
-        await asyncio.gather(*self.tasks)
+        statuses = await asyncio.gather(*self.tasks)
+        self.budget.unregister(self)
+        self.close_spill()
+
+        if self.direct:
+            # Directly uploaded files don't need a manifest
+            return aiohttp.web.Response(status=statuses[0] if statuses else 410)
+
+        failed = [status for status in statuses if status not in {201, 202}]
+        if failed:
+            # A manifest would make the missing or corrupted segments readable
+            LOGGER.error(f"Not adding manifest for {self.path}, segments failed.")
+            return aiohttp.web.Response(status=failed[0])
+
+        # Static manifests can't be empty, empty files still use a dynamic one
+        if self.slo and self.segments:
+            return await self.a_put_slo_manifest()
 
         LOGGER.info(f"Add manifest for {self.path}.")
         async with self.client.put(
@@ -310,6 +1374,97 @@ class FileUpload:
         ) as resp:
             return aiohttp.web.Response(status=resp.status)
 
+    async def a_put_slo_manifest(self) -> aiohttp.web.Response:
+        """Write a static large object manifest for the uploaded segments."""
+        LOGGER.info(f"Add static manifest for {self.path}.")
+        async with self.client.put(
+            common.generate_download_url(
+                self.host,
+                container=self.container,
+                object_name=self.path,
+            ),
+            data=json.dumps([self.segments[i] for i in sorted(self.segments)]),
+            params={"multipart-manifest": "put"},
+            headers={"X-Auth-Token": self.token},
+            ssl=ssl_context,
+        ) as resp:
+            return aiohttp.web.Response(status=resp.status)
+
+    def get_resume_chunk(self) -> int:
+        """Return the first chunk the client needs to send when resuming."""
+        for segment in range(0, self.total_segments):
+            if segment not in self.done_segments:
+                return segment * self.segment_chunks
+        return self.total_chunks
+
+    def get_resume_state(self) -> typing.Dict[str, typing.Any]:
+        """Return the state a reconnecting client needs to resume the upload."""
+        state: typing.Dict[str, typing.Any] = {
+            "container": self.container,
+            "object": self.path,
+            "segment_id": self.segment_id,
+            "total": self.total,
+            "segment_size": self.segment_size,
+            "segments": sorted(self.done_segments),
+            "chunk": self.get_resume_chunk(),
+        }
+        if self.handle:
+            state["handle"] = self.handle
+        return state
+
+    async def suspend_upload(self) -> None:
+        """Stop the upload until the client reconnects.
+
+        Requests for unfinished segments are cancelled, so that Swift
+        discards them, and the segments already stored are kept.
+        """
+        self.suspended = True
+        self.suspended_at = time.monotonic()
+        for task in self.tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = [
+            task
+            for task in self.tasks
+            if not task.cancelled()
+            and task.exception() is None
+            and task.result() in {201, 202}
+        ]
+
+        # Chunks of the unfinished segments need to be sent again
+        self.chunk_waiters = {}
+        self.done_chunks = {
+            order
+            for order in self.done_chunks
+            if min(order // self.segment_chunks, self.total_segments - 1)
+            in self.done_segments
+        }
+        self.chunk_cache = {}
+        self.chunk_arrivals = {}
+        self.cache_size = 0
+        self.segment_buffers = {}
+        self.kept_size = 0
+        self.frames = {}
+        self.budget.unregister(self)
+        self.close_spill()
+        await self.scheduler.a_release(self)
+        LOGGER.info(
+            f"Suspended upload {self.container}/{self.path} with "
+            f"{len(self.done_segments)}/{self.total_segments} segments done."
+        )
+
+    async def resume_upload(self, socket: aiohttp.web.WebSocketResponse) -> None:
+        """Queue a suspended upload to continue with the unfinished segments."""
+        self.socket = socket
+        self.suspended = False
+        LOGGER.info(
+            f"Resuming upload {self.container}/{self.path} "
+            f"from chunk {self.get_resume_chunk()}."
+        )
+        # The unfinished segments are started once the scheduler admits the upload
+        await self.scheduler.a_submit(self)
+
     async def abort_upload(self):
         """Abort the upload."""
         if self.socket is not None and not self.socket.closed:
@@ -325,33 +1480,97 @@ class FileUpload:
             )
 
         self.aborted = True
-
-        await asyncio.gather(*self.tasks)
+        self.wake_waiters()
+        # Free the buffered chunks, as they won't be uploaded anymore
+        self.chunk_cache = {}
+        self.chunk_arrivals = {}
+        self.cache_size = 0
+        self.segment_buffers = {}
+        self.kept_size = 0
+        self.frames = {}
+        self.budget.unregister(self)
+        self.close_spill()
+        await self.scheduler.a_release(self)
+
+        await asyncio.gather(*self.tasks, return_exceptions=True)
         for task in self.tasks:
             if not task.done():
                 task.cancel()
 
-        # Delete segments that might've been uploaded
+        if self.direct:
+            # The object is only created if the single PUT succeeds
+            return
+
+        # Only the segments with a started upload can exist in Swift
+        await self.a_delete_segments(sorted(self.started_segments))
+
+    async def a_delete_segments(self, orders: typing.List[int]) -> None:
+        """Delete segments, in bulk if Swift allows it."""
+        names = [self.get_segment_name(order) for order in orders]
+        batch_size = max(CRYPTUPLOAD_BULK_DELETE_SIZE, 1)
+        for i in range(0, len(names), batch_size):
+            if not await self.a_bulk_delete_segments(names[i : i + batch_size]):
+                await self.a_delete_each_segment(names[i:])
+                return
+
+    async def a_bulk_delete_segments(self, names: typing.List[str]) -> bool:
+        """Delete segments with a single bulk delete request."""
+        container = f"{self.container}{common.SEGMENTS_CONTAINER}"
+        body = "\n".join(urllib.parse.quote(f"/{container}/{name}") for name in names)
+        async with self.client.post(
+            self.host,
+            params={"bulk-delete": "true"},
+            data=body.encode(),
+            headers={
+                "X-Auth-Token": self.token,
+                "Content-Type": "text/plain",
+                "Accept": "application/json",
+            },
+            ssl=ssl_context,
+        ) as resp:
+            # Without the bulk middleware the request is a no-op account POST
+            if resp.status != 200:
+                LOGGER.debug(f"Bulk delete not available, got status {resp.status}.")
+                return False
+            try:
+                result = json.loads(await resp.text())
+            except ValueError:
+                LOGGER.debug("Bulk delete not available, got a non-JSON response.")
+                return False
+
+        if not isinstance(result, dict) or "Number Deleted" not in result:
+            return False
+        LOGGER.info(
+            f"Bulk deleted {result['Number Deleted']} segments of "
+            f"{self.container}/{self.path}, "
+            f"{result.get('Number Not Found', 0)} not found."
+        )
+        if result.get("Errors"):
+            LOGGER.error(f"Failed to delete segments: {result['Errors']}")
+        return True
+
+    async def a_delete_each_segment(self, names: typing.List[str]) -> None:
+        """Delete segments one by one, a few at a time."""
+        semaphore = asyncio.Semaphore(max(CRYPTUPLOAD_DELETE_CONCURRENCY, 1))
         headers = {
             "X-Auth-Token": self.token,
             "Content-Type": "application/swiftclient-segment",
         }
-        delete_tasks = [
-            asyncio.create_task(
-                self.client.delete(
+
+        async def delete_segment(name: str) -> int:
+            async with semaphore:
+                async with self.client.delete(
                     common.generate_download_url(
                         self.host,
                         container=f"{self.container}{common.SEGMENTS_CONTAINER}",
-                        object_name=f"{self.path}/{self.segment_id}/{(segment + 1):08d}",
+                        object_name=name,
                     ),
                     headers=headers,
                     ssl=ssl_context,
-                )
-            )
-            for segment in range(0, self.total_segments)
-        ]
-        delete_resps = await asyncio.gather(*delete_tasks)
-        delete_results = [resp.status for resp in delete_resps]
+                ) as resp:
+                    return resp.status
+
+        delete_results = await asyncio.gather(*[delete_segment(n) for n in names])
         LOGGER.info(f"Segment deletions finished with statuses: {delete_results}")
 
 
@@ -366,13 +1585,106 @@ class UploadSession:
         self.vault: vault_client.VaultClient = request.app[common.VAULT_CLIENT]
         self.project: str = request.match_info["project"]
         self.session = session
+        self.budget: UploadBudget = request.app[common.UPLOAD_BUDGET]
+        self.containers = ContainerCache()
+        self.scheduler = UploadScheduler()
+        # Counters of the session, added up to the process wide counters
+        self.metrics = UploadMetrics(request.app[common.UPLOAD_METRICS])
 
         self.uploads: typing.Dict[str, typing.Dict[str, FileUpload]] = {}
         self.ws: aiohttp.web.WebSocketResponse | None = None
 
+        # Uploads by their numeric handle in v2 chunk frames
+        self.handles: typing.Dict[int, FileUpload] = {}
+        self.next_handle = itertools.count(1)
+
+        # Tasks aborting suspended uploads that don't get resumed
+        self.expiries: typing.Set[asyncio.Task] = set()
+
+        # Time of the last websocket activity, used for reaping idle sessions
+        self.last_active: float = time.monotonic()
+
     def set_ws(self, ws: aiohttp.web.WebSocketResponse):
         """Set the websocket for the upload session."""
         self.ws = ws
+        self.touch()
+
+    def touch(self) -> None:
+        """Mark the upload session as active."""
+        self.last_active = time.monotonic()
+
+    def is_connected(self) -> bool:
+        """Check if the session has an open websocket."""
+        return self.ws is not None and not self.ws.closed
+
+    def is_idle(self, timeout: float) -> bool:
+        """Check if the session has been without a websocket for too long."""
+        return not self.is_connected() and (
+            time.monotonic() - self.last_active >= timeout
+        )
+
+    def get_upload_count(self) -> int:
+        """Return the amount of ongoing uploads."""
+        return sum(len(container) for container in self.uploads.values())
+
+    def get_buffered_size(self) -> int:
+        """Return the amount of bytes buffered by the ongoing uploads."""
+        return sum(
+            upload.get_buffered_size()
+            for container in self.uploads.values()
+            for upload in container.values()
+        )
+
+    def get_stats(self) -> typing.Dict[str, typing.Any]:
+        """Return the uploads and buffer usage of the session."""
+        return {
+            "project": self.project,
+            "connected": self.is_connected(),
+            "idle": round(time.monotonic() - self.last_active),
+            "buffered": self.get_buffered_size(),
+            **self.scheduler.get_stats(),
+            "metrics": self.metrics.get_stats(),
+            "uploads": [
+                upload.get_stats()
+                for container in self.uploads.values()
+                for upload in container.values()
+            ],
+        }
+
+    async def push_metrics(self, ws: aiohttp.web.WebSocketResponse) -> None:
+        """Send the upload metrics to the client periodically, if enabled."""
+        if CRYPTUPLOAD_METRICS_INTERVAL <= 0:
+            return
+        while not ws.closed:
+            await asyncio.sleep(CRYPTUPLOAD_METRICS_INTERVAL)
+            if ws.closed:
+                return
+            await ws.send_bytes(
+                msgpack.packb(
+                    {
+                        "command": "metrics",
+                        **self.metrics.get_stats(histogram=False),
+                        "uploads": [
+                            {
+                                "container": upload.container,
+                                "object": upload.path,
+                                **upload.metrics.get_stats(histogram=False),
+                            }
+                            for container in self.uploads.values()
+                            for upload in container.values()
+                        ],
+                    }
+                )
+            )
+
+    def uses_chunk_frames(self) -> bool:
+        """Check if the websocket negotiated the v2 chunk framing."""
+        return self.ws is not None and self.ws.ws_protocol == UPLOAD_PROTOCOL_V2
+
+    def remove_upload(self, container: str, path: str) -> None:
+        """Remove an upload from the session."""
+        upload = self.uploads[container].pop(path)
+        self.handles.pop(upload.handle, None)
 
     async def handle_begin_upload(self, msg: typing.Dict[str, typing.Any]) -> None:
         """Handle the upload start."""
@@ -386,6 +1698,7 @@ class UploadSession:
         if "owner_name" in msg:
             owner_name = str(msg["owner_name"])
         total = int(msg["total"])
+        segment_size = int(msg.get("segment_size", 0))
 
         if (
             container in self.uploads
@@ -395,6 +1708,7 @@ class UploadSession:
         ):
             # abort previous upload quietly and continue
             await self.uploads[container][path].abort_upload()
+            self.handles.pop(self.uploads[container][path].handle, None)
 
         if container not in self.uploads:
             self.uploads[container] = {}
@@ -412,10 +1726,52 @@ class UploadSession:
             total,
             owner,
             owner_name,
+            self.budget,
+            segment_size,
+            self.containers,
+            self.scheduler,
+            self.metrics,
         )
+        if self.uses_chunk_frames():
+            self.uploads[container][path].handle = next(self.next_handle)
+            self.handles[self.uploads[container][path].handle] = self.uploads[container][
+                path
+            ]
 
         await self.uploads[container][path].add_header(bytes(msg["data"]))
 
+    async def handle_resume_upload(self, msg: typing.Dict[str, typing.Any]) -> None:
+        """Handle resuming a suspended upload after reconnecting."""
+        container: str = str(msg["container"])
+        path: str = str(msg["object"])
+        upload = self.uploads.get(container, {}).get(path)
+
+        if self.ws is None:
+            return
+
+        if upload is None or not upload.suspended:
+            await self.ws.send_bytes(
+                msgpack.packb(
+                    {
+                        "command": "abort",
+                        "container": container,
+                        "object": path,
+                        "reason": "No upload to resume.",
+                    }
+                )
+            )
+            return
+
+        if self.uses_chunk_frames() and not upload.handle:
+            upload.handle = next(self.next_handle)
+            self.handles[upload.handle] = upload
+
+        # The client streams the rest after the upload is started again
+        await self.ws.send_bytes(
+            msgpack.packb({"command": "resume", **upload.get_resume_state()})
+        )
+        await upload.resume_upload(self.ws)
+
     async def handle_upload_chunk(self, msg: typing.Dict[str, typing.Any]):
         """Handle the addition of a new chunk."""
         container: str = str(msg["container"])
@@ -423,7 +1779,7 @@ class UploadSession:
 
         await self.uploads[container][path].add_to_chunks(
             int(msg["order"]),
-            bytes(msg["data"]),
+            msg["data"],
         )
 
     async def handle_upload_chunks(self, msg: typing.Dict[str, typing.Any]):
@@ -431,24 +1787,41 @@ class UploadSession:
         container: str = str(msg["container"])
         path: str = str(msg["object"])
 
-        for chunk in msg["chunks"]:
-            await self.uploads[container][path].add_to_chunks(
-                int(chunk["order"]),
-                bytes(chunk["data"]),
-            )
+        await self.add_chunks(
+            self.uploads[container][path],
+            [(int(chunk["order"]), chunk["data"]) for chunk in msg["chunks"]],
+        )
+
+    async def handle_upload_frame(self, frame: bytes):
+        """Handle the addition of multiple new chunks in a v2 chunk frame."""
+        handle, chunks = unpack_chunk_frame(frame)
+        upload = self.handles.get(handle)
+        if upload is None:
+            # Frames still in flight for an upload that was started again
+            LOGGER.warning(f"Dropping chunk frame for unknown upload handle {handle}.")
+            return
+        await self.add_chunks(upload, chunks)
+
+    async def add_chunks(
+        self,
+        upload: FileUpload,
+        chunks: typing.Iterable[typing.Tuple[int, bytes | memoryview]],
+    ):
+        """Add chunks to an upload and ask for more once there's space."""
+        for order, data in chunks:
+            await upload.add_to_chunks(order, data)
 
         if (
-            container in self.uploads
-            and path in self.uploads[container]
-            and await self.uploads[container][path].wait_for_cache()
+            self.uploads.get(upload.container, {}).get(upload.path) is upload
+            and await upload.wait_for_cache()
             and self.ws is not None
         ):
             await self.ws.send_bytes(
                 msgpack.packb(
                     {
                         "command": "next",
-                        "container": container,
-                        "object": path,
+                        "container": upload.container,
+                        "object": upload.path,
                     }
                 )
             )
@@ -459,10 +1832,55 @@ class UploadSession:
         path: str = str(msg["object"])
 
         await self.uploads[container][path].finish_upload()
-        self.uploads[container].pop(path)
+        self.remove_upload(container, path)
+
+    async def handle_disconnect(
+        self, ws: aiohttp.web.WebSocketResponse, resume: bool = True
+    ) -> None:
+        """Suspend the ongoing uploads when the websocket disconnects.
+
+        The uploads are aborted instead if they won't be resumed.
+        """
+        if ws is not self.ws:
+            # The client has already reconnected with another websocket
+            return
+        self.touch()
+        if not resume:
+            await self.handle_close()
+            return
+
+        uploads = [
+            upload
+            for container in self.uploads.values()
+            for upload in container.values()
+            if not upload.suspended
+        ]
+        # Uploads that weren't started yet get started when resumed
+        self.scheduler.clear()
+        await asyncio.gather(*[upload.suspend_upload() for upload in uploads])
+
+        for upload in uploads:
+            expiry = asyncio.create_task(self.expire_upload(upload, upload.suspended_at))
+            self.expiries.add(expiry)
+            expiry.add_done_callback(self.expiries.discard)
+
+    async def expire_upload(self, upload: FileUpload, suspended_at: float) -> None:
+        """Abort a suspended upload if it doesn't get resumed in time."""
+        await asyncio.sleep(CRYPTUPLOAD_RESUME_TIMEOUT)
+        if (
+            not upload.suspended
+            or upload.suspended_at != suspended_at
+            or self.uploads.get(upload.container, {}).get(upload.path) is not upload
+        ):
+            return
+
+        LOGGER.info(f"Upload {upload.container}/{upload.path} wasn't resumed.")
+        await upload.abort_upload()
+        self.remove_upload(upload.container, upload.path)
 
     async def handle_close(self):
         """Gracefully close all ongoing uploads."""
+        self.scheduler.clear()
         abort_tasks = []
         for container in self.uploads:
             for file in self.uploads[container]:
@@ -473,20 +1891,27 @@ class UploadSession:
 
         LOGGER.debug("Clearing upload session directory.")
         self.uploads = {}
+        self.handles = {}
 
 
-def get_encrypted_upload_session(
+async def get_encrypted_upload_session(
     request: aiohttp.web.Request,
 ) -> UploadSession:
     """Return the specific encrypted upload session for the project."""
     session = common.get_session_id(request)
     project = request.match_info["project"]
 
-    if project in request.app[session]["enuploads"]:
+    # Upload sessions hold the live websocket, so they stay in this process
+    upload_sessions = request.app[common.UPLOAD_SESSIONS].get(session, {})
+    if project in upload_sessions:
         LOGGER.debug(f"Returning an existing upload session for id {session}.")
-        return request.app[session]["enuploads"][project]
+        return upload_sessions[project]
     else:
         LOGGER.debug(f"Opening a new upload session for id {session}.")
-        upload_session = UploadSession(request, request.app[session])
-        request.app[session]["enuploads"][project] = upload_session
+        upload_session = UploadSession(
+            request, await request.app[common.SESSION_STORE].a_get_session(session)
+        )
+        request.app[common.UPLOAD_SESSIONS].setdefault(session, {})[
+            project
+        ] = upload_session
         return upload_session
@@ -1,10 +1,14 @@
 """Container and object replication handlers using aiohttp."""
 
+import asyncio
 import base64
+import collections
+import json
 import logging
 import os
 import ssl
 import typing
+import urllib.parse
 
 import aiohttp.client
 import aiohttp.web
@@ -12,7 +16,14 @@ import certifi
 from aiohttp import ClientTimeout
 
 import swift_browser_ui.common.vault_client
+from swift_browser_ui.common.common_util import get_redis_client
+from swift_browser_ui.common.replication_jobs import (
+    RedisReplicationJobStore,
+    ReplicationJobs,
+    ReplicationJobStore,
+)
 from swift_browser_ui.upload import common
+from swift_browser_ui.upload.sessions import SESSION_STORE_BACKEND
 
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(os.environ.get("LOG_LEVEL", "INFO"))
@@ -27,6 +38,43 @@ ssl_context.load_verify_locations(certifi.where())
 # The new value is approx 4.5 hours.
 REPL_TIMEOUT = 16384
 
+# Amount of objects copied at the same time by a container replication job
+REPLICATE_CONCURRENCY = int(
+    os.environ.get("SWIFTUI_UPLOAD_RUNNER_REPLICATE_CONCURRENCY", 8)
+)
+# Amount of segments of a single object copied at the same time
+REPLICATE_SEGMENT_CONCURRENCY = int(
+    os.environ.get("SWIFTUI_UPLOAD_RUNNER_REPLICATE_SEGMENT_CONCURRENCY", 4)
+)
+# Copy objects inside Swift with X-Copy-From instead of streaming them
+# through the runner, falling back to streaming if Swift refuses the copy
+REPLICATE_SERVER_COPY = (
+    os.environ.get("SWIFTUI_UPLOAD_RUNNER_REPLICATE_SERVER_COPY", "True") == "True"
+)
+# Statuses with which Swift refuses server-side copies altogether
+SERVER_COPY_REFUSED = {400, 403, 405, 501}
+# Listed objects waiting to be copied, about a page of a Swift container
+# listing, so that the next page is listed while the previous one is copied
+REPLICATE_LISTING_QUEUE = 10000
+# Upper limit for the concurrency requested for a single replication job
+REPLICATE_MAX_CONCURRENCY = int(
+    os.environ.get("SWIFTUI_UPLOAD_RUNNER_REPLICATE_MAX_CONCURRENCY", 32)
+)
+# Listing hash of empty objects, which is also the hash of dynamic manifests
+EMPTY_ETAG = "d41d8cd98f00b204e9800998ecf8427e"
+# Backend used for storing the replication job states, either memory or redis
+REPLICATE_JOB_STORE = os.environ.get(
+    "SWIFTUI_UPLOAD_RUNNER_REPLICATE_JOB_STORE", SESSION_STORE_BACKEND
+)
+
+
+async def get_replication_jobs() -> ReplicationJobs:
+    """Return the replication job registry configured for the runner."""
+    if REPLICATE_JOB_STORE == "redis":
+        LOGGER.info("Storing replication jobs in Redis.")
+        return ReplicationJobs(RedisReplicationJobStore(await get_redis_client()))
+    return ReplicationJobs(ReplicationJobStore())
+
 
 class ObjectReplicationProxy:
     """A class for replicating objects."""
@@ -42,6 +90,9 @@ class ObjectReplicationProxy:
         source_container: str,
         project_name: str = "",
         source_project_name: str = "",
+        concurrency: int = REPLICATE_CONCURRENCY,
+        segment_concurrency: int = REPLICATE_SEGMENT_CONCURRENCY,
+        incremental: bool = False,
     ) -> None:
         """."""
         self.project = project
@@ -55,6 +106,28 @@ class ObjectReplicationProxy:
         self.source_project_name = source_project_name
 
         self.client = client
+        self.concurrency = min(max(concurrency, 1), max(REPLICATE_MAX_CONCURRENCY, 1))
+        self.segment_concurrency = max(segment_concurrency, 1)
+        # Only copy the objects missing from or changed in the destination
+        self.incremental = incremental
+
+        # Objects that couldn't be copied, with the reason of the failure
+        self.failures: typing.Dict[str, str] = {}
+        self.copied: int = 0
+        # Cleared when Swift refuses a server-side copy
+        self.server_copy: bool = REPLICATE_SERVER_COPY
+        self.server_copies: int = 0
+        # Objects and their bytes in the source container listing so far
+        self.listed: int = 0
+        self.listed_bytes: int = 0
+        self.copied_bytes: int = 0
+        self.skipped: int = 0
+        # Listed objects not yet handled, in listing order, each with the
+        # object listed before it, and the last object before which every
+        # listed object has been handled
+        self.pending: typing.OrderedDict[str, str] = collections.OrderedDict()
+        self.last_listed: str = ""
+        self.marker: str = ""
 
         self.endpoint: str = session["endpoint"]
         self.token: str = session["token"]
@@ -62,8 +135,11 @@ class ObjectReplicationProxy:
         self.source_host: str = common.get_download_host(
             self.endpoint, self.source_project
         )
+        self.source_account: str = self.source_host.split("/")[-1]
 
-    async def a_ensure_container(self, segmented: bool = False) -> None:
+    async def a_ensure_container(
+        self, segmented: bool = False, exist_ok: bool = False
+    ) -> None:
         """Ensure that the container required for copying exists."""
         container = f"{self.container}_segments" if segmented else self.container
         LOGGER.debug(f"Checking container {container}.")
@@ -74,6 +150,8 @@ class ObjectReplicationProxy:
         ) as resp:
             if resp.status in {200, 201, 202, 204}:
                 LOGGER.info(f"Container '{container}' already exists.")
+                if exist_ok:
+                    return
                 raise aiohttp.web.HTTPConflict(reason="Container already exists.")
             if resp.status == 404:
                 pass
@@ -94,8 +172,155 @@ class ObjectReplicationProxy:
 
         LOGGER.info(f"Created container '{container}'.")
 
-    async def a_sync_object_segments(self, manifest: str) -> str:
-        """Get object segments."""
+    async def a_server_copy(
+        self, container: str, object_name: str, to_container: str, etag: str
+    ) -> bool:
+        """Copy an object inside Swift without streaming it through the runner.
+
+        Returns False if the object needs to be streamed instead.
+        """
+        if not self.server_copy:
+            return False
+        source = f"/{urllib.parse.quote(container)}/{urllib.parse.quote(object_name)}"
+        async with self.client.put(
+            common.generate_download_url(
+                self.host, container=to_container, object_name=object_name
+            ),
+            data=b"",
+            headers={
+                "X-Auth-Token": self.token,
+                "X-Copy-From": source,
+                "X-Copy-From-Account": self.source_account,
+            },
+            timeout=ClientTimeout(total=REPL_TIMEOUT),
+            ssl=ssl_context,
+        ) as resp:
+            status = resp.status
+            copied_etag = resp.headers.get("ETag", "").strip('"')
+
+        if status in {201, 202}:
+            if copied_etag and copied_etag != etag.strip('"'):
+                raise aiohttp.web.HTTPUnprocessableEntity(reason="Copy checksum mismatch")
+            self.server_copies += 1
+            LOGGER.debug(f"Copied {object_name} inside Swift")
+            return True
+        if status in SERVER_COPY_REFUSED:
+            LOGGER.info(
+                f"Swift refused a server-side copy with status {status}, "
+                "streaming the rest of the objects."
+            )
+            self.server_copy = False
+        else:
+            LOGGER.warning(
+                f"Server-side copy of {object_name} failed with status {status}, "
+                "streaming it instead."
+            )
+        return False
+
+    async def a_server_copy_segment(
+        self, container: str, segment: str
+    ) -> typing.Dict[str, typing.Any] | None:
+        """Copy a segment inside Swift and return its static manifest entry."""
+        async with self.client.head(
+            common.generate_download_url(
+                self.source_host, container=container, object_name=segment
+            ),
+            headers={"X-Auth-Token": self.token},
+            ssl=ssl_context,
+        ) as resp:
+            if resp.status not in {200, 204}:
+                raise aiohttp.web.HTTPNotFound(reason="Segment not found")
+            length = int(resp.headers["Content-Length"])
+            etag = resp.headers.get("ETag", "")
+        if not etag:
+            # Let the streamed copy report the missing ETag
+            return None
+
+        if not await self.a_server_copy(
+            container, segment, f"{self.container}_segments", etag
+        ):
+            return None
+        return {
+            "path": f"/{self.container}_segments/{segment}",
+            "etag": etag.strip('"'),
+            "size_bytes": length,
+        }
+
+    async def a_copy_segment(
+        self, container: str, segment: str
+    ) -> typing.Dict[str, typing.Any]:
+        """Copy a segment and return its static manifest entry."""
+        if self.server_copy:
+            entry = await self.a_server_copy_segment(container, segment)
+            if entry is not None:
+                return entry
+
+        from_url = common.generate_download_url(
+            self.source_host, container=container, object_name=segment
+        )
+        LOGGER.debug(f"Getting segment from url: {from_url}")
+        async with self.client.get(
+            from_url,
+            headers={
+                "X-Auth-Token": self.token,
+                "Accept-Encoding": "identity",
+            },
+            timeout=ClientTimeout(total=REPL_TIMEOUT),
+            ssl=ssl_context,
+        ) as resp_g:
+            length = int(resp_g.headers["Content-Length"])
+            headers = {"X-Auth-Token": self.token}
+
+            if resp_g.status not in {200, 201, 202}:
+                raise aiohttp.web.HTTPNotFound(reason="Segment not found")
+            LOGGER.debug(f"Copying segment {segment}")
+            headers["Content-Length"] = str(length)
+            headers["Content-Type"] = resp_g.headers["Content-Type"]
+            if "ETag" in resp_g.headers:
+                headers["ETag"] = resp_g.headers["ETag"]
+            else:
+                LOGGER.error("ETag missing, maybe segments file empty")
+                raise aiohttp.web.HTTPUnprocessableEntity(
+                    reason="ETag missing, maybe segments file empty"
+                )
+
+            to_url = common.generate_download_url(
+                self.host, container=f"{self.container}_segments", object_name=segment
+            )
+            LOGGER.debug(f"Posting segment to url: {to_url}")
+            async with self.client.put(
+                to_url,
+                data=resp_g.content.iter_chunked(65564),
+                headers=headers,
+                timeout=ClientTimeout(total=REPL_TIMEOUT),
+                ssl=ssl_context,
+            ) as resp_p:
+                LOGGER.debug(f"Segment {segment} status {resp_p.status}")
+                if resp_p.status == 408:
+                    raise aiohttp.web.HTTPRequestTimeout()
+                if resp_p.status == 422:
+                    # Swift checks the copy against the ETag of the source
+                    raise aiohttp.web.HTTPUnprocessableEntity(
+                        reason="Segment checksum mismatch"
+                    )
+                if resp_p.status not in {201, 202}:
+                    raise aiohttp.web.HTTPBadRequest(reason="Segment upload failed")
+            LOGGER.debug(f"Success in copying segment {segment}")
+
+        return {
+            "path": f"/{self.container}_segments/{segment}",
+            "etag": headers["ETag"].strip('"'),
+            "size_bytes": length,
+        }
+
+    async def a_sync_object_segments(
+        self, manifest: str
+    ) -> typing.Tuple[str, typing.List[typing.Dict[str, typing.Any]]]:
+        """Get object segments.
+
+        Returns the copied manifest prefix, and the static manifest entries
+        of the copied segments.
+        """
         async with self.client.get(
             common.generate_download_url(
                 self.source_host, container=manifest.split("/")[0]
@@ -126,61 +351,91 @@ class ObjectReplicationProxy:
 
         LOGGER.debug(f"Got following segments: {segments}")
 
-        for segment in segments:
-            from_url = common.generate_download_url(
-                self.source_host, container=manifest.split("/")[0], object_name=segment
-            )
-            LOGGER.debug(f"Getting segment from url: {from_url}")
-            async with self.client.get(
-                from_url,
-                headers={
-                    "X-Auth-Token": self.token,
-                    "Accept-Encoding": "identity",
-                },
-                timeout=ClientTimeout(total=REPL_TIMEOUT),
-                ssl=ssl_context,
-            ) as resp_g:
-                length = int(resp_g.headers["Content-Length"])
-                headers = {"X-Auth-Token": self.token}
-
-                if resp_g.status not in {200, 201, 202}:
-                    raise aiohttp.web.HTTPNotFound(reason="Segment not found")
-                LOGGER.debug(f"Copying segment {segment}")
-                headers["Content-Length"] = str(length)
-                headers["Content-Type"] = resp_g.headers["Content-Type"]
-                if "ETag" in resp_g.headers:
-                    headers["ETag"] = resp_g.headers["ETag"]
-                else:
-                    LOGGER.error("ETag missing, maybe segments file empty")
-                    raise aiohttp.web.HTTPUnprocessableEntity(
-                        reason="ETag missing, maybe segments file empty"
-                    )
-
-                to_url = common.generate_download_url(
-                    self.host, container=f"{self.container}_segments", object_name=segment
-                )
-                LOGGER.debug(f"Posting segment to url: {to_url}")
-                async with self.client.put(
-                    to_url,
-                    data=resp_g.content.iter_chunked(65564),
-                    headers=headers,
-                    timeout=ClientTimeout(total=REPL_TIMEOUT),
-                    ssl=ssl_context,
-                ) as resp_p:
-                    LOGGER.debug(f"Segment {segment} status {resp_p.status}")
-                    if resp_p.status == 408:
-                        raise aiohttp.web.HTTPRequestTimeout()
-                    if resp_p.status not in {201, 202}:
-                        raise aiohttp.web.HTTPBadRequest(reason="Segment upload failed")
-                LOGGER.debug(f"Success in copying segment {segment}")
+        copied = await self.a_copy_segments(
+            [(manifest.split("/")[0], segment) for segment in segments]
+        )
 
         new_manifest = manifest.replace(
             manifest.split("/")[0], f"{self.container}_segments"
         )
-        return new_manifest
+        return new_manifest, copied
 
-    async def a_copy_object(self, object_name: str) -> None:
-        """Copy an object from a location."""
+    async def a_sync_slo_segments(
+        self, object_name: str
+    ) -> typing.List[typing.Dict[str, typing.Any]]:
+        """Copy the segments listed in a static large object manifest."""
+        async with self.client.get(
+            common.generate_download_url(
+                self.source_host, container=self.source_container, object_name=object_name
+            ),
+            headers={"X-Auth-Token": self.token},
+            params={"multipart-manifest": "get"},
+            timeout=ClientTimeout(total=REPL_TIMEOUT),
+            ssl=ssl_context,
+        ) as resp:
+            if resp.status != 200:
+                raise aiohttp.web.HTTPBadRequest(reason="Source manifest fetch failed")
+            manifest = json.loads(await resp.text())
+
+        # Segment names are in the form /container/object
+        return await self.a_copy_segments(
+            [segment["name"].lstrip("/").split("/", 1) for segment in manifest]
+        )
+
+    async def a_copy_segments(
+        self, segments: typing.List[typing.Sequence[str]]
+    ) -> typing.List[typing.Dict[str, typing.Any]]:
+        """Copy segments concurrently and return their entries in order.
+
+        The first failure cancels the rest of the copies, so that no
+        manifest gets written for an incomplete object.
+        """
+        semaphore = asyncio.Semaphore(self.segment_concurrency)
+
+        async def copy_segment(
+            container: str, segment: str
+        ) -> typing.Dict[str, typing.Any]:
+            async with semaphore:
+                return await self.a_copy_segment(container, segment)
+
+        tasks = [
+            asyncio.create_task(copy_segment(container, segment))
+            for container, segment in segments
+        ]
+        try:
+            return list(await asyncio.gather(*tasks))
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def a_put_slo_manifest(
+        self,
+        object_name: str,
+        headers: typing.Dict[str, str],
+        segments: typing.List[typing.Dict[str, typing.Any]],
+    ) -> None:
+        """Create a static large object manifest for copied segments."""
+        async with self.client.put(
+            common.generate_download_url(
+                self.host, container=self.container, object_name=object_name
+            ),
+            data=json.dumps(segments),
+            params={"multipart-manifest": "put"},
+            headers=headers,
+            timeout=ClientTimeout(total=REPL_TIMEOUT),
+            ssl=ssl_context,
+        ) as resp:
+            if resp.status != 201:
+                raise aiohttp.web.HTTPInternalServerError(
+                    reason="Object manifest creation failed"
+                )
+        LOGGER.debug(f"Uploaded static manifest for {object_name}")
+
+    async def a_stream_object(
+        self, object_name: str, headers: typing.Dict[str, str]
+    ) -> None:
+        """Stream an object through the runner into the destination container."""
         # Get the object stream handle
         async with self.client.get(
             common.generate_download_url(
@@ -198,51 +453,80 @@ class ObjectReplicationProxy:
                 raise aiohttp.web.HTTPBadRequest(reason="Source object fetch failed")
             LOGGER.debug(f"Got stream handle for {object_name}")
 
-            LOGGER.debug(f"Got headers: {resp_g.headers}")
-
-            headers = {"X-Auth-Token": self.token}
-
-            length = int(resp_g.headers["Content-Length"])
-
-            # Copy over metadata headers
-            for i in resp_g.headers:
-                if "X-Object-Meta-Usertags" in i:
-                    headers[i] = resp_g.headers[i]
-
-            if "X-Object-Manifest" not in resp_g.headers:
-                LOGGER.info(f"Copying object {object_name} in full.")
-                headers["Content-Length"] = str(length)
-                headers["Content-Type"] = resp_g.headers["Content-Type"]
-                if "ETag" in resp_g.headers:
-                    headers["ETag"] = resp_g.headers["ETag"]
-                else:
-                    LOGGER.error("ETag missing, maybe segments file empty")
-                    raise aiohttp.web.HTTPUnprocessableEntity(
-                        reason="ETag missing, maybe segments file empty"
+            headers = dict(headers)
+            headers["Content-Length"] = resp_g.headers["Content-Length"]
+            headers["Content-Type"] = resp_g.headers["Content-Type"]
+            async with self.client.put(
+                common.generate_download_url(self.host, self.container, object_name),
+                data=resp_g.content.iter_chunked(65564),
+                headers=headers,
+                timeout=ClientTimeout(total=REPL_TIMEOUT),
+                ssl=ssl_context,
+            ) as resp_p:
+                if resp_p.status == 408:
+                    raise aiohttp.web.HTTPRequestTimeout()
+                if resp_p.status not in {201, 202}:
+                    raise aiohttp.web.HTTPBadRequest(
+                        reason="Object segment upload failed"
                     )
-                async with self.client.put(
-                    common.generate_download_url(self.host, self.container, object_name),
-                    data=resp_g.content.iter_chunked(65564),
-                    headers=headers,
-                    timeout=ClientTimeout(total=REPL_TIMEOUT),
-                    ssl=ssl_context,
-                ) as resp_p:
-                    if resp_p.status == 408:
-                        raise aiohttp.web.HTTPRequestTimeout()
-                    if resp_p.status not in {201, 202}:
-                        raise aiohttp.web.HTTPBadRequest(
-                            reason="Object segment upload failed"
-                        )
-                LOGGER.debug(f"Success in copying object {object_name}")
-            else:
-                # Ensure the segment container exists, since performing
-                # segmented upload
-                LOGGER.debug(f"Copying object {object_name} in segments.")
 
-                manifest = await self.a_sync_object_segments(
-                    resp_g.headers["X-Object-Manifest"]
+    async def a_copy_object(self, object_name: str) -> None:
+        """Copy an object from a location."""
+        # The metadata decides how the object is copied, so the body is only
+        # fetched if it needs to be streamed
+        async with self.client.head(
+            common.generate_download_url(
+                self.source_host, container=self.source_container, object_name=object_name
+            ),
+            headers={"X-Auth-Token": self.token},
+            timeout=ClientTimeout(total=REPL_TIMEOUT),
+            ssl=ssl_context,
+        ) as resp_h:
+            # If the source object doesn't exist, abort
+            if resp_h.status != 200:
+                raise aiohttp.web.HTTPBadRequest(reason="Source object fetch failed")
+            source_headers = resp_h.headers
+        LOGGER.debug(f"Got headers: {source_headers}")
+
+        headers = {"X-Auth-Token": self.token}
+
+        # Copy over metadata headers
+        for i in source_headers:
+            if "X-Object-Meta-Usertags" in i:
+                headers[i] = source_headers[i]
+
+        if "X-Static-Large-Object" in source_headers:
+            # Static manifests list their segments, so no listing is needed
+            LOGGER.debug(f"Copying static large object {object_name}.")
+            segments = await self.a_sync_slo_segments(object_name)
+            await self.a_put_slo_manifest(object_name, headers, segments)
+        elif "X-Object-Manifest" not in source_headers:
+            LOGGER.info(f"Copying object {object_name} in full.")
+            if "ETag" in source_headers:
+                headers["ETag"] = source_headers["ETag"]
+            else:
+                LOGGER.error("ETag missing, maybe segments file empty")
+                raise aiohttp.web.HTTPUnprocessableEntity(
+                    reason="ETag missing, maybe segments file empty"
                 )
+            if not await self.a_server_copy(
+                self.source_container, object_name, self.container, headers["ETag"]
+            ):
+                await self.a_stream_object(object_name, headers)
+            LOGGER.debug(f"Success in copying object {object_name}")
+        else:
+            # Ensure the segment container exists, since performing
+            # segmented upload
+            LOGGER.debug(f"Copying object {object_name} in segments.")
+
+            manifest, segments = await self.a_sync_object_segments(
+                source_headers["X-Object-Manifest"]
+            )
 
+            # Swift rejects static manifests with too many segments
+            if common.USE_SLO and 0 < len(segments) <= common.SLO_MAX_SEGMENTS:
+                await self.a_put_slo_manifest(object_name, headers, segments)
+            else:
                 LOGGER.debug("Uploading manifest")
                 # Add manifest headers
                 headers["X-Object-Manifest"] = manifest
@@ -262,17 +546,21 @@ class ObjectReplicationProxy:
                         )
                 LOGGER.debug(f"Uploaded manifest for {object_name}")
 
-            if ".c4gh" in object_name and self.project_name:
-                LOGGER.debug(f"Copying the header for encrypted object {object_name}")
-                header = await self.vault.get_header(
-                    self.project_name,
-                    self.source_container,
-                    object_name,
-                    owner=self.source_project_name,
-                )
-                await self.vault.put_header(
-                    self.project_name, self.container, object_name, header
-                )
+        await self.a_copy_object_header(object_name)
+
+    async def a_copy_object_header(self, object_name: str) -> None:
+        """Copy the header of an encrypted object."""
+        if ".c4gh" in object_name and self.project_name:
+            LOGGER.debug(f"Copying the header for encrypted object {object_name}")
+            header = await self.vault.get_header(
+                self.project_name,
+                self.source_container,
+                object_name,
+                owner=self.source_project_name,
+            )
+            await self.vault.put_header(
+                self.project_name, self.container, object_name, header
+            )
 
     async def check_public_key(self) -> None:
         """Check that the source project public key is whitelisted."""
@@ -299,15 +587,23 @@ class ObjectReplicationProxy:
         finally:
             await self.remove_public_key()
 
-    async def a_get_container_page(self, marker: str = "") -> list[str]:
-        """Get a single page of objects from a container."""
+    async def a_get_container_page(
+        self, marker: str = "", destination: bool = False
+    ) -> typing.List[typing.Dict[str, typing.Any]]:
+        """Get a single page of the JSON listing of a container."""
+        params = {"format": "json"}
+        if marker:
+            params["marker"] = marker
         async with self.client.get(
-            common.generate_download_url(
-                self.source_host,
-                container=self.source_container,
+            (
+                common.generate_download_url(self.host, container=self.container)
+                if destination
+                else common.generate_download_url(
+                    self.source_host, container=self.source_container
+                )
             ),
             headers={"X-Auth-Token": self.token},
-            params={"marker": marker} if marker else None,
+            params=params,
             timeout=ClientTimeout(total=REPL_TIMEOUT),
             ssl=ssl_context,
         ) as resp:
@@ -318,30 +614,160 @@ class ObjectReplicationProxy:
                 )
 
             if resp.status == 200:
-                ret = await resp.text()
-                return ret.rstrip().lstrip().split("\n")
+                return json.loads(await resp.text())
 
             return []
 
-    async def a_copy_from_container(self) -> None:
-        """Copy objects from a source container."""
+    async def a_list_destination(
+        self, marker: str = ""
+    ) -> typing.AsyncGenerator[typing.Dict[str, typing.Any], None]:
+        """Iterate the objects of the destination container page by page."""
+        page = await self.a_get_container_page(marker, destination=True)
+        while page:
+            for entry in page:
+                yield entry
+            page = await self.a_get_container_page(page[-1]["name"], destination=True)
+
+    async def a_list_container(self, queue: asyncio.Queue, marker: str = "") -> None:
+        """Queue the objects of the source container page by page.
+
+        In incremental mode the destination is listed alongside the source,
+        as both listings are sorted by name, and the objects that already
+        exist are queued with their destination entry.
+        """
+        destination = self.a_list_destination(marker) if self.incremental else None
+        try:
+            existing = await anext(destination, None) if destination is not None else None
+            page = await self.a_get_container_page(marker)
+            while page:
+                for entry in page:
+                    if destination is not None:
+                        while existing is not None and existing["name"] < entry["name"]:
+                            existing = await anext(destination, None)
+                        if existing is not None and existing["name"] == entry["name"]:
+                            entry["existing"] = existing
+                    self.pending[entry["name"]] = self.last_listed
+                    self.last_listed = entry["name"]
+                    await queue.put(entry)
+                    self.listed += 1
+                    self.listed_bytes += entry.get("bytes", 0)
+                page = await self.a_get_container_page(page[-1]["name"])
+        finally:
+            if destination is not None:
+                await destination.aclose()
+
+    async def a_copy_from_container(self, marker: str = "") -> typing.Dict[str, str]:
+        """Copy objects from a source container, after the marker if given.
+
+        Returns the objects that failed to copy with the reason of the failure.
+        """
         LOGGER.debug(f"Fetching objects from container {self.source_container}")
         container_url = common.generate_download_url(
             self.source_host, container=self.source_container
         )
         LOGGER.debug(f"Container url: {container_url}")
 
-        # Page through all the objects in a container
-        to_copy: list[str] = []
-        page = await self.a_get_container_page()
-        while page:
-            to_copy = to_copy + page
-            page = await self.a_get_container_page(to_copy[-1])
-
         await self.check_public_key()
 
+        # Objects are copied while the rest of the container is being listed
+        queue: asyncio.Queue = asyncio.Queue(REPLICATE_LISTING_QUEUE)
+        workers = [
+            asyncio.create_task(self.a_copy_objects(queue))
+            for _ in range(0, self.concurrency)
+        ]
         try:
-            for obj in to_copy:
-                await self.a_copy_object(obj)
+            await self.a_list_container(queue, marker)
+            # Each worker stops at the end of the listing
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
         finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
             await self.remove_public_key()
+
+        LOGGER.info(
+            f"Copied {self.copied}/{self.listed} objects ({self.listed_bytes} bytes) "
+            f"from {self.source_container} to {self.container}, "
+            f"{self.skipped} unchanged, {len(self.failures)} failed."
+        )
+        return self.failures
+
+    async def a_copy_objects(self, queue: asyncio.Queue) -> None:
+        """Copy queued objects until the listing ends, recording the failures."""
+        while True:
+            entry = await queue.get()
+            if entry is None:
+                return
+            obj = entry["name"]
+            try:
+                if await self.a_is_unchanged(entry):
+                    LOGGER.debug(f"Skipping unchanged object {obj}")
+                    self.skipped += 1
+                    self.mark_handled(obj)
+                    continue
+                await self.a_copy_object(obj)
+            except Exception as e:
+                reason = e.reason if isinstance(e, aiohttp.web.HTTPException) else e
+                LOGGER.error(f"Failed to copy object {obj}: {reason}")
+                self.failures[obj] = str(reason)
+            else:
+                self.copied += 1
+                self.copied_bytes += entry.get("bytes", 0)
+            self.mark_handled(obj)
+
+    async def a_head_object(
+        self, host: str, container: str, object_name: str
+    ) -> typing.Tuple[str, str]:
+        """Return the length and the ETag of an object."""
+        async with self.client.head(
+            common.generate_download_url(
+                host, container=container, object_name=object_name
+            ),
+            headers={"X-Auth-Token": self.token},
+            ssl=ssl_context,
+        ) as resp:
+            if resp.status != 200:
+                raise aiohttp.web.HTTPBadRequest(reason="Object HEAD failed")
+            return (
+                resp.headers.get("Content-Length", ""),
+                resp.headers.get("ETag", "").strip('"'),
+            )
+
+    async def a_is_unchanged(self, entry: typing.Dict[str, typing.Any]) -> bool:
+        """Check if the destination already has the listed source object."""
+        existing = entry.get("existing")
+        if existing is None:
+            return False
+        if (entry.get("bytes"), entry.get("hash")) != (
+            existing.get("bytes"),
+            existing.get("hash"),
+        ):
+            return False
+        if entry.get("bytes") or entry.get("hash") != EMPTY_ETAG:
+            return True
+        # Dynamic manifests are listed like empty objects, whatever their
+        # segments, but their HEAD has the length and ETag of the segments
+        source = await self.a_head_object(
+            self.source_host, self.source_container, entry["name"]
+        )
+        copied = await self.a_head_object(self.host, self.container, entry["name"])
+        return source == copied
+
+    def mark_handled(self, object_name: str) -> None:
+        """Advance the marker past the objects handled in listing order."""
+        # Handled objects are forgotten right away, so a slow object only
+        # holds back the marker and not the memory of the objects after it
+        self.pending.pop(object_name, None)
+        self.marker = next(iter(self.pending.values()), self.last_listed)
+
+    def get_progress(self) -> typing.Dict[str, typing.Any]:
+        """Return the progress of the container replication."""
+        return {
+            "marker": self.marker,
+            "copied": self.copied,
+            "bytes": self.copied_bytes,
+            "skipped": self.skipped,
+            "failures": self.failures,
+        }
@@ -22,6 +22,10 @@ from swift_browser_ui.upload.api import (
     handle_download_shared_object_options,
     handle_get_object,
     handle_get_object_header,
+    handle_get_replication_job,
+    handle_get_upload_budget,
+    handle_get_upload_metrics,
+    handle_get_upload_sessions,
     handle_health_check,
     handle_post_object_chunk,
     handle_post_object_options,
@@ -36,7 +40,18 @@ from swift_browser_ui.upload.auth import (
     handle_login,
     handle_logout,
 )
-from swift_browser_ui.upload.common import VAULT_CLIENT
+from swift_browser_ui.upload.common import (
+    REPLICATION_JOBS,
+    SESSION_REAPER,
+    SESSION_STORE,
+    UPLOAD_BUDGET,
+    UPLOAD_METRICS,
+    UPLOAD_SESSIONS,
+    VAULT_CLIENT,
+)
+from swift_browser_ui.upload.cryptupload import UploadBudget, UploadMetrics
+from swift_browser_ui.upload.replicate import get_replication_jobs
+from swift_browser_ui.upload.sessions import SessionReaper, get_session_store
 
 # temporarily ignore typecheck from mypy until
 # this issue is fixed https://github.com/MagicStack/uvloop/issues/575
@@ -74,7 +89,11 @@ async def servinit() -> aiohttp.web.Application:
 
     app.on_startup.append(swift_browser_ui.common.db.db_graceful_start)
     app.on_startup.append(swift_browser_ui.common.common_util.read_in_keys)
+    app.on_startup.append(start_session_reaper)
+    app.on_shutdown.append(stop_session_reaper)
+    app.on_shutdown.append(close_replication_jobs)
     app.on_shutdown.append(kill_client)
+    app.on_shutdown.append(close_session_store)
     app.on_shutdown.append(swift_browser_ui.common.db.db_graceful_close)
 
     # Add client session for aiohttp requests
@@ -89,9 +108,27 @@ async def servinit() -> aiohttp.web.Application:
         http_client = aiohttp.client.ClientSession()
     app["client"] = http_client
     app[VAULT_CLIENT] = VaultClient(http_client)
+    app[UPLOAD_BUDGET] = UploadBudget()
+    app[UPLOAD_METRICS] = UploadMetrics()
+
+    # Runner sessions can be shared between processes, upload sessions can't
+    app[SESSION_STORE] = await get_session_store()
+    app[UPLOAD_SESSIONS] = {}
+    app[SESSION_REAPER] = SessionReaper(app)
+    # Replication job states can be shared too, for checking and resuming them
+    app[REPLICATION_JOBS] = await get_replication_jobs()
 
     app.add_routes([aiohttp.web.get("/health", handle_health_check)])
 
+    # Add runner introspection routes
+    app.add_routes(
+        [
+            aiohttp.web.get("/admin/budget", handle_get_upload_budget),
+            aiohttp.web.get("/admin/sessions", handle_get_upload_sessions),
+            aiohttp.web.get("/admin/metrics", handle_get_upload_metrics),
+        ]
+    )
+
     # Add auth related routes
     # Can use direct project post for creating a session, as it's intuitive
     # and POST upload against an account doesn't exist
@@ -158,6 +195,7 @@ async def servinit() -> aiohttp.web.Application:
 
     app.add_routes(
         [
+            aiohttp.web.get("/replicate/jobs/{job}", handle_get_replication_job),
             aiohttp.web.get("/{project}/{container}/{object_name:.*}", handle_get_object),
             aiohttp.web.options(
                 "/{project}/{container}/{object_name:.*}",
@@ -176,6 +214,27 @@ async def kill_client(app: aiohttp.web.Application) -> None:
     await app["client"].close()
 
 
+async def start_session_reaper(app: aiohttp.web.Application) -> None:
+    """Start reaping idle sessions."""
+    app[SESSION_REAPER].start()
+
+
+async def stop_session_reaper(app: aiohttp.web.Application) -> None:
+    """Stop reaping idle sessions."""
+    await app[SESSION_REAPER].stop()
+
+
+async def close_replication_jobs(app: aiohttp.web.Application) -> None:
+    """Interrupt the running replication jobs and close their store."""
+    await app[REPLICATION_JOBS].a_close()
+    await app[REPLICATION_JOBS].store.a_close()
+
+
+async def close_session_store(app: aiohttp.web.Application) -> None:
+    """Close the runner session store."""
+    await app[SESSION_STORE].a_close()
+
+
 def run_server(
     app: typing.Coroutine[typing.Any, typing.Any, aiohttp.web.Application],
 ) -> None:
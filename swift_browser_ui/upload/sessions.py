@@ -0,0 +1,228 @@
+"""Runner session storage for swift-upload-runner."""
+
+import asyncio
+import collections
+import json
+import logging
+import os
+import time
+import typing
+
+import aiohttp.web
+import redis.asyncio as redis
+
+import swift_browser_ui.upload.common as common
+from swift_browser_ui.common.common_util import get_redis_client
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(os.environ.get("LOG_LEVEL", "INFO"))
+
+# Backend used for storing runner sessions, either memory or redis
+SESSION_STORE_BACKEND = os.environ.get("SWIFT_UPLOAD_RUNNER_SESSION_STORE", "memory")
+# Seconds a runner session is kept after it was last used
+SESSION_TTL = int(os.environ.get("SWIFT_UPLOAD_RUNNER_SESSION_TTL", 28800))
+SESSION_PREFIX = "swift-upload-runner:session:"
+# Seconds an upload session without a websocket is kept after its last message
+SESSION_IDLE_TIMEOUT = int(
+    os.environ.get("SWIFT_UPLOAD_RUNNER_SESSION_IDLE_TIMEOUT", 3600)
+)
+# Seconds between the runs of the idle session reaper
+SESSION_REAPER_INTERVAL = int(
+    os.environ.get("SWIFT_UPLOAD_RUNNER_SESSION_REAPER_INTERVAL", 60)
+)
+
+
+class SessionStore:
+    """Runner session store in the memory of a single runner process."""
+
+    def __init__(self, ttl: int = SESSION_TTL) -> None:
+        """."""
+        self.ttl = ttl
+        # Sessions in the order they were last used, least recent first
+        self.sessions: typing.OrderedDict[str, typing.Dict[str, typing.Any]] = (
+            collections.OrderedDict()
+        )
+        self.accessed: typing.Dict[str, float] = {}
+
+    def touch(self, key: str) -> None:
+        """Mark a runner session as the most recently used one."""
+        self.sessions.move_to_end(key)
+        self.accessed[key] = time.monotonic()
+
+    async def a_get_session(self, key: str) -> typing.Dict[str, typing.Any]:
+        """Return the runner session with the given key."""
+        try:
+            session = self.sessions[key]
+        except KeyError:
+            raise aiohttp.web.HTTPUnauthorized(reason="Runner session not found")
+        self.touch(key)
+        return session
+
+    async def a_has_session(self, key: str) -> bool:
+        """Check if the runner session exists without using it."""
+        return key in self.sessions
+
+    async def a_put_session(
+        self, key: str, session: typing.Dict[str, typing.Any]
+    ) -> None:
+        """Store a runner session."""
+        self.sessions[key] = session
+        self.touch(key)
+
+    async def a_delete_session(self, key: str) -> None:
+        """Remove a runner session if it exists."""
+        self.sessions.pop(key, None)
+        self.accessed.pop(key, None)
+
+    async def a_expire_sessions(self) -> typing.List[str]:
+        """Remove the runner sessions left unused for longer than the TTL."""
+        expired: typing.List[str] = []
+        now = time.monotonic()
+        for key in list(self.sessions):
+            if now - self.accessed.get(key, 0.0) < self.ttl:
+                # The rest of the sessions have been used more recently
+                break
+            expired.append(key)
+            await self.a_delete_session(key)
+        return expired
+
+    async def a_close(self) -> None:
+        """Close the store."""
+        return
+
+
+class RedisSessionStore(SessionStore):
+    """Runner session store shared between runner processes in Redis."""
+
+    def __init__(self, client: redis.Redis, ttl: int = SESSION_TTL) -> None:
+        """."""
+        super().__init__(ttl)
+        self.client = client
+
+    async def a_get_session(self, key: str) -> typing.Dict[str, typing.Any]:
+        """Return the runner session with the given key."""
+        # Using the session extends its expiry
+        session = await self.client.getex(f"{SESSION_PREFIX}{key}", ex=self.ttl)
+        if session is None:
+            raise aiohttp.web.HTTPUnauthorized(reason="Runner session not found")
+        return json.loads(session)
+
+    async def a_has_session(self, key: str) -> bool:
+        """Check if the runner session exists without using it."""
+        return bool(await self.client.exists(f"{SESSION_PREFIX}{key}"))
+
+    async def a_put_session(
+        self, key: str, session: typing.Dict[str, typing.Any]
+    ) -> None:
+        """Store a runner session."""
+        await self.client.set(f"{SESSION_PREFIX}{key}", json.dumps(session), ex=self.ttl)
+
+    async def a_delete_session(self, key: str) -> None:
+        """Remove a runner session if it exists."""
+        await self.client.delete(f"{SESSION_PREFIX}{key}")
+
+    async def a_expire_sessions(self) -> typing.List[str]:
+        """Remove the runner sessions left unused for longer than the TTL."""
+        # Redis expires the keys by itself
+        return []
+
+    async def a_close(self) -> None:
+        """Close the store."""
+        await self.client.aclose()
+
+
+async def get_session_store() -> SessionStore:
+    """Return the runner session store configured for the runner."""
+    if SESSION_STORE_BACKEND == "redis":
+        LOGGER.info("Storing runner sessions in Redis.")
+        return RedisSessionStore(await get_redis_client())
+    return SessionStore()
+
+
+class SessionReaper:
+    """Background task removing idle sessions and their orphaned uploads."""
+
+    def __init__(
+        self,
+        app: aiohttp.web.Application,
+        idle_timeout: int = SESSION_IDLE_TIMEOUT,
+        interval: int = SESSION_REAPER_INTERVAL,
+    ) -> None:
+        """."""
+        self.app = app
+        self.idle_timeout = idle_timeout
+        self.interval = interval
+        self.task: asyncio.Task | None = None
+
+        self.reaped_sessions: int = 0
+        self.aborted_uploads: int = 0
+        self.reclaimed_bytes: int = 0
+
+    async def reap_upload_session(self, key: str, project: str) -> None:
+        """Abort the uploads of an upload session and remove it."""
+        upload_sessions = self.app[common.UPLOAD_SESSIONS]
+        upload_session = upload_sessions[key].pop(project)
+        if not upload_sessions[key]:
+            del upload_sessions[key]
+
+        uploads = upload_session.get_upload_count()
+        buffered = upload_session.get_buffered_size()
+        await upload_session.handle_close()
+
+        self.reaped_sessions += 1
+        self.aborted_uploads += uploads
+        self.reclaimed_bytes += buffered
+        LOGGER.info(
+            f"Reaped idle upload session for {project}, aborted {uploads} "
+            f"uploads and reclaimed {buffered} bytes."
+        )
+
+    async def reap(self) -> None:
+        """Remove expired runner sessions and idle upload sessions."""
+        store: SessionStore = self.app[common.SESSION_STORE]
+        for key, projects in list(self.app[common.UPLOAD_SESSIONS].items()):
+            if any(session.is_connected() for session in projects.values()):
+                # Websocket messages don't use the runner session, so it's
+                # kept alive for as long as its uploads are streamed
+                try:
+                    await store.a_get_session(key)
+                except aiohttp.web.HTTPUnauthorized:
+                    pass
+        expired = set(await store.a_expire_sessions())
+
+        for key, projects in list(self.app[common.UPLOAD_SESSIONS].items()):
+            # Sessions that expired elsewhere can't continue their uploads
+            orphaned = key in expired or not await store.a_has_session(key)
+            for project, upload_session in list(projects.items()):
+                if upload_session.is_connected():
+                    continue
+                if orphaned or upload_session.is_idle(self.idle_timeout):
+                    await self.reap_upload_session(key, project)
+
+    async def run(self) -> None:
+        """Reap sessions periodically."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reap()
+            except Exception as e:
+                LOGGER.error(f"Failed to reap idle sessions: {e}")
+
+    def start(self) -> None:
+        """Start reaping in the background."""
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop reaping."""
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def get_stats(self) -> typing.Dict[str, typing.Any]:
+        """Return the totals of the reaped sessions."""
+        return {
+            "reaped_sessions": self.reaped_sessions,
+            "aborted_uploads": self.aborted_uploads,
+            "reclaimed_bytes": self.reclaimed_bytes,
+        }
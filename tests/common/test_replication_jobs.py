@@ -0,0 +1,184 @@
+"""Unit tests for swift_browser_ui.common.replication_jobs module."""
+
+import asyncio
+import json
+import time
+import unittest
+import unittest.mock
+
+import aiohttp.web
+
+from swift_browser_ui.common.replication_jobs import (
+    JOB_KEY_PREFIX,
+    JOB_LOCK_PREFIX,
+    JOB_PREFIX,
+    RedisReplicationJobStore,
+    ReplicationJobs,
+    ReplicationJobStore,
+)
+
+PARAMS = {
+    "project": "test-project",
+    "container": "test-container",
+    "source_project": "test-source-project",
+    "source_container": "test-source-container",
+}
+
+
+class ReplicationJobStoreTestClass(unittest.IsolatedAsyncioTestCase):
+    """Test class for the replication job stores."""
+
+    async def test_replication_job_store(self):
+        """Test storing replication jobs in process memory."""
+        store = ReplicationJobStore(60)
+        job = {"id": "test-job", "key": "test-key", "updated": time.time()}
+        await store.a_put_job(job)
+        self.assertEqual(await store.a_get_job("test-job"), job)
+        self.assertEqual(await store.a_find_job("test-key"), job)
+        self.assertIsNone(await store.a_get_job("other-job"))
+        self.assertIsNone(await store.a_find_job("other-key"))
+
+        self.assertTrue(await store.a_lock_job("test-job", 60))
+        self.assertFalse(await store.a_lock_job("test-job", 60))
+        self.assertTrue(await store.a_is_locked("test-job"))
+        await store.a_unlock_job("test-job")
+        self.assertFalse(await store.a_is_locked("test-job"))
+
+        # Jobs not updated within the TTL are forgotten
+        await store.a_put_job({"id": "old-job", "key": "test-key", "updated": 0.0})
+        self.assertIsNone(await store.a_find_job("test-key"))
+        self.assertEqual(list(store.jobs), ["test-job"])
+
+    async def test_redis_replication_job_store(self):
+        """Test storing replication jobs in Redis."""
+        mock_redis = unittest.mock.AsyncMock()
+        store = RedisReplicationJobStore(mock_redis, 60)
+        job = {"id": "test-job", "key": "test-key"}
+
+        await store.a_put_job(job)
+        mock_redis.set.assert_has_awaits(
+            [
+                unittest.mock.call(f"{JOB_PREFIX}test-job", json.dumps(job), ex=60),
+                unittest.mock.call(f"{JOB_KEY_PREFIX}test-key", "test-job", ex=60),
+            ]
+        )
+
+        mock_redis.get.side_effect = [b"test-job", json.dumps(job).encode()]
+        self.assertEqual(await store.a_find_job("test-key"), job)
+        # Clients decoding the responses return strings
+        mock_redis.get.side_effect = ["test-job", json.dumps(job)]
+        self.assertEqual(await store.a_find_job("test-key"), job)
+        mock_redis.get.side_effect = [None]
+        self.assertIsNone(await store.a_get_job("test-job"))
+
+        mock_redis.set.reset_mock()
+        mock_redis.set.return_value = None
+        self.assertFalse(await store.a_lock_job("test-job", 30))
+        mock_redis.set.assert_awaited_once_with(
+            f"{JOB_LOCK_PREFIX}test-job", "1", nx=True, ex=30
+        )
+        mock_redis.exists.return_value = 1
+        self.assertTrue(await store.a_is_locked("test-job"))
+        await store.a_unlock_job("test-job")
+        mock_redis.delete.assert_awaited_once_with(f"{JOB_LOCK_PREFIX}test-job")
+        await store.a_close()
+        mock_redis.aclose.assert_awaited_once()
+
+
+class ReplicationJobsTestClass(unittest.IsolatedAsyncioTestCase):
+    """Test class for swift_browser_ui.common.replication_jobs.ReplicationJobs."""
+
+    def setUp(self):
+        """Set up mocks."""
+        self.jobs = ReplicationJobs(ReplicationJobStore(), checkpoint_interval=0)
+        self.progress = {"marker": "", "copied": 0, "bytes": 0, "failures": {}}
+
+    def get_progress(self):
+        """Return the progress of the mock replication."""
+        return self.progress
+
+    async def test_run_job(self):
+        """Test running a job to the end, checkpointing on the way."""
+        checkpointed = asyncio.Event()
+
+        async def replicate(marker):
+            self.progress.update(marker="object-1", copied=1, bytes=10)
+            while (await self.jobs.store.a_get_job(job["id"]))["copied"] < 1:
+                await asyncio.sleep(0)
+            checkpointed.set()
+            self.progress.update(marker="object-2", failures={"object-2": "test-error"})
+
+        job = await self.jobs.a_start("test-key", PARAMS, replicate, self.get_progress)
+        self.assertEqual(job["status"], "running")
+        self.assertTrue(await self.jobs.a_is_running(job))
+        with self.assertRaises(aiohttp.web.HTTPConflict):
+            await self.jobs.a_start("test-key", PARAMS, replicate, self.get_progress, job)
+
+        await asyncio.gather(*self.jobs.tasks.values())
+        self.assertTrue(checkpointed.is_set())
+        job = await self.jobs.a_get_job(job["id"])
+        self.assertEqual(job["status"], "finished")
+        self.assertEqual(job["marker"], "object-2")
+        self.assertEqual((job["copied"], job["bytes"], job["failed"]), (1, 10, 1))
+        self.assertEqual(job["failures"], {"object-2": "test-error"})
+        self.assertEqual(job["container"], "test-container")
+        self.assertFalse(await self.jobs.a_is_running(job))
+        self.assertIsNone(await self.jobs.a_find_unfinished_job("test-key"))
+        self.assertFalse(self.jobs.tasks)
+
+    async def test_failed_job(self):
+        """Test recording why a job failed."""
+        replicate = unittest.mock.AsyncMock(
+            side_effect=aiohttp.web.HTTPBadRequest(reason="test-reason")
+        )
+        job = await self.jobs.a_start("test-key", PARAMS, replicate, self.get_progress)
+        await asyncio.gather(*self.jobs.tasks.values())
+
+        job = await self.jobs.a_get_job(job["id"])
+        self.assertEqual((job["status"], job["error"]), ("failed", "test-reason"))
+        self.assertEqual(await self.jobs.a_find_unfinished_job("test-key"), job)
+
+    async def test_resume_job(self):
+        """Test resuming an interrupted job from its checkpoint."""
+        started = asyncio.Event()
+
+        async def replicate(marker):
+            self.progress.update(marker="object-1", copied=1, bytes=10)
+            started.set()
+            await asyncio.Event().wait()
+
+        job = await self.jobs.a_start("test-key", PARAMS, replicate, self.get_progress)
+        await started.wait()
+        await self.jobs.a_close()
+
+        job = await self.jobs.a_find_unfinished_job("test-key")
+        self.assertEqual(job["status"], "interrupted")
+        self.assertFalse(await self.jobs.a_is_running(job))
+
+        self.progress = {"marker": "object-2", "copied": 1, "bytes": 5, "failures": {}}
+        replicate_rest = unittest.mock.AsyncMock()
+        await self.jobs.a_start(
+            "test-key", PARAMS, replicate_rest, self.get_progress, job
+        )
+        await asyncio.gather(*self.jobs.tasks.values())
+
+        replicate_rest.assert_awaited_once_with("object-1")
+        job = await self.jobs.a_get_job(job["id"])
+        self.assertEqual(
+            (job["status"], job["marker"], job["copied"], job["bytes"], job["resumed"]),
+            ("finished", "object-2", 2, 15, 1),
+        )
+
+    async def test_get_job(self):
+        """Test reporting jobs left running by a stopped process as interrupted."""
+        await self.jobs.store.a_put_job(
+            {
+                "id": "test-job",
+                "key": "test-key",
+                "status": "running",
+                "updated": time.time(),
+            }
+        )
+        self.assertEqual((await self.jobs.a_get_job("test-job"))["status"], "interrupted")
+        with self.assertRaises(aiohttp.web.HTTPNotFound):
+            await self.jobs.a_get_job("other-job")
@@ -0,0 +1,185 @@
+"""Compare container replication with different object concurrency.
+
+Replicates a container of small objects through ``ObjectReplicationProxy``
+from a local Swift stand-in, which answers each request after a fixed
+latency like a remote Swift proxy does. Reports the time taken, the time
+until the first object got copied and the objects copied per second with
+each concurrency, and for an incremental copy into a destination that has
+every object but one percent of them. Then lists a large container without
+copying the objects, and reports the peak memory allocated while doing so.
+
+Usage: python tests/performance/replicate_container_bench.py [objects] [latency ms] [listed objects]
+"""
+
+import asyncio
+import logging
+import sys
+import time
+import tracemalloc
+import unittest.mock
+
+import aiohttp.client
+import aiohttp.web
+
+import swift_browser_ui.upload.replicate as replicate
+
+OBJECT_SIZE = 4096
+LISTING_LIMIT = 10000
+# Every this many objects differ in the destination of an incremental copy
+CHANGED_EVERY = 100
+
+
+async def swift_get_container(request: aiohttp.web.Request) -> aiohttp.web.Response:
+    """List a page of the source container objects."""
+    await asyncio.sleep(request.app["latency"])
+    marker = request.query.get("marker", "")
+    start = int(marker.split("-")[1]) + 1 if marker else 0
+    end = min(start + LISTING_LIMIT, request.app["state"]["objects"])
+    if start >= end:
+        return aiohttp.web.Response(status=204)
+    names = [f"object-{i:08d}" for i in range(start, end)]
+    if request.query.get("format") == "json":
+        # The destination has an older version of some of the objects
+        copy = request.match_info["container"] == "bench-copy"
+        return aiohttp.web.json_response(
+            [
+                {
+                    "name": name,
+                    "bytes": OBJECT_SIZE,
+                    "hash": (
+                        "old-etag" if copy and i % CHANGED_EVERY == 0 else "bench-etag"
+                    ),
+                }
+                for i, name in zip(range(start, end), names, strict=True)
+            ]
+        )
+    return aiohttp.web.Response(text="\n".join(names) + "\n")
+
+
+async def swift_get_object(request: aiohttp.web.Request) -> aiohttp.web.Response:
+    """Answer a source object."""
+    await asyncio.sleep(request.app["latency"])
+    return aiohttp.web.Response(
+        body=b"x" * OBJECT_SIZE,
+        headers={"ETag": '"bench-etag"', "Content-Type": "application/octet-stream"},
+    )
+
+
+async def swift_put(request: aiohttp.web.Request) -> aiohttp.web.Response:
+    """Receive a copied object."""
+    await request.read()
+    await asyncio.sleep(request.app["latency"])
+    state = request.app["state"]
+    state["copied"] += 1
+    state.setdefault("first", time.perf_counter())
+    return aiohttp.web.Response(status=201)
+
+
+class ListingReplicator(replicate.ObjectReplicationProxy):
+    """Replicator that only lists the objects it would copy."""
+
+    async def a_copy_object(self, object_name: str) -> None:
+        """Skip copying the object."""
+        return
+
+
+def create_replicator(
+    cls: type,
+    client: aiohttp.client.ClientSession,
+    port: int,
+    concurrency: int,
+    incremental: bool = False,
+) -> replicate.ObjectReplicationProxy:
+    """Create a replicator copying from the Swift stand-in."""
+    return cls(
+        {"endpoint": f"http://127.0.0.1:{port}/v1/AUTH_bench", "token": "bench"},
+        client,
+        unittest.mock.AsyncMock(),
+        "bench",
+        "bench-copy",
+        "bench",
+        "bench-source",
+        concurrency=concurrency,
+        incremental=incremental,
+    )
+
+
+async def main(objects: int, latency_ms: int, listed: int) -> None:
+    """Run the benchmark."""
+    replicate.LOGGER.setLevel(logging.WARNING)
+    app = aiohttp.web.Application()
+    app["latency"] = latency_ms / 1000
+    state: dict = {"objects": objects}
+    app["state"] = state
+    app.add_routes(
+        [
+            aiohttp.web.get("/v1/{account}/{container}", swift_get_container),
+            aiohttp.web.get("/v1/{account}/{container}/{object:.*}", swift_get_object),
+            aiohttp.web.put("/v1/{account}/{container}/{object:.*}", swift_put),
+        ]
+    )
+    runner = aiohttp.web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = aiohttp.web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+
+    print(f"{objects} objects of {OBJECT_SIZE} bytes, {latency_ms} ms per request")
+    print(
+        f"{'mode':>12} {'concurrency':>12} {'time':>8} {'first copy':>11} "
+        f"{'copied':>7} {'objects/s':>10} {'failed':>7}"
+    )
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.client.ClientSession(connector=connector) as client:
+        for mode, concurrency in (
+            ("full", 1),
+            ("full", 8),
+            ("full", 32),
+            ("incremental", 32),
+        ):
+            state.update({"copied": 0, "objects": objects})
+            state.pop("first", None)
+            replicator = create_replicator(
+                replicate.ObjectReplicationProxy,
+                client,
+                port,
+                concurrency,
+                incremental=mode == "incremental",
+            )
+            start = time.perf_counter()
+            failures = await replicator.a_copy_from_container()
+            duration = time.perf_counter() - start
+            print(
+                f"{mode:>12} {concurrency:>12} {duration:>7.2f}s "
+                f"{state['first'] - start:>10.2f}s {state['copied']:>7} "
+                f"{objects / duration:>10.1f} {len(failures):>7}"
+            )
+
+        state["objects"] = listed
+        start = time.perf_counter()
+        await create_replicator(
+            ListingReplicator, client, port, 8
+        ).a_copy_from_container()
+        duration = time.perf_counter() - start
+        # Tracing slows down allocating, so the memory is measured separately
+        tracemalloc.start()
+        await create_replicator(
+            ListingReplicator, client, port, 8
+        ).a_copy_from_container()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(
+            f"listing {listed} objects: {duration:.2f}s, "
+            f"peak memory {peak / 1024 / 1024:.1f} MiB"
+        )
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 10,
+            int(sys.argv[3]) if len(sys.argv) > 3 else 200000,
+        )
+    )
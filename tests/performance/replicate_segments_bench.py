@@ -0,0 +1,139 @@
+"""Compare replicating a segmented object with different segment concurrency.
+
+Replicates a dynamic large object through ``ObjectReplicationProxy`` from a
+local Swift stand-in that limits the bandwidth of each PUT connection, like
+a single Swift proxy connection does. Server-side copies take as long as
+streaming the segment through a connection would, without sending it.
+Reports the time taken, the throughput, the bytes streamed through the
+runner and the CPU time used with each amount of segments copied at the
+same time, with the segments streamed and with them copied inside Swift.
+
+Usage: python tests/performance/replicate_segments_bench.py [segments] [MiB per segment] [MiB/s per connection]
+"""
+
+import asyncio
+import logging
+import sys
+import time
+import unittest.mock
+
+import aiohttp.client
+import aiohttp.web
+
+import swift_browser_ui.upload.replicate as replicate
+
+
+async def swift_get_segments(request: aiohttp.web.Request) -> aiohttp.web.Response:
+    """List the segments of the source object."""
+    state = request.app["state"]
+    return aiohttp.web.Response(
+        text="".join(f"big/1/{i:08d}\n" for i in range(0, state["segments"]))
+    )
+
+
+async def swift_get_object(request: aiohttp.web.Request) -> aiohttp.web.Response:
+    """Answer the source manifest or one of its segments."""
+    state = request.app["state"]
+    if request.match_info["container"] == "bench-source":
+        return aiohttp.web.Response(
+            headers={"X-Object-Manifest": "bench-source_segments/big/1/"}
+        )
+    return aiohttp.web.Response(
+        body=state["segment"],
+        headers={
+            "ETag": '"bench-etag"',
+            "Content-Type": "application/swiftclient-segment",
+        },
+    )
+
+
+async def swift_put(request: aiohttp.web.Request) -> aiohttp.web.Response:
+    """Receive an object at the bandwidth of a single connection."""
+    state = request.app["state"]
+    if "X-Copy-From" in request.headers:
+        await asyncio.sleep(len(state["segment"]) / state["rate"])
+        return aiohttp.web.Response(status=201, headers={"ETag": '"bench-etag"'})
+    start = time.perf_counter()
+    received = 0
+    async for data in request.content.iter_any():
+        received += len(data)
+        ahead = received / state["rate"] - (time.perf_counter() - start)
+        if ahead > 0:
+            await asyncio.sleep(ahead)
+    state["received"] += received
+    return aiohttp.web.Response(status=201)
+
+
+async def main(segments: int, size_mib: int, rate_mib: int) -> None:
+    """Run the benchmark."""
+    replicate.LOGGER.setLevel(logging.WARNING)
+    app = aiohttp.web.Application(client_max_size=0)
+    state = {
+        "segments": segments,
+        "segment": b"x" * size_mib * 1024 * 1024,
+        "rate": rate_mib * 1024 * 1024,
+        "received": 0,
+    }
+    app["state"] = state
+    app.add_routes(
+        [
+            aiohttp.web.get("/v1/{account}/{container}", swift_get_segments),
+            aiohttp.web.get("/v1/{account}/{container}/{object:.*}", swift_get_object),
+            aiohttp.web.put("/v1/{account}/{container}/{object:.*}", swift_put),
+        ]
+    )
+    runner = aiohttp.web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = aiohttp.web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+
+    print(
+        f"{segments} segments of {size_mib} MiB, "
+        f"Swift bandwidth {rate_mib} MiB/s per connection"
+    )
+    print(
+        f"{'mode':>8} {'concurrency':>12} {'time':>8} {'throughput':>12} "
+        f"{'streamed':>10} {'CPU time':>9}"
+    )
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.client.ClientSession(connector=connector) as client:
+        for mode in ("streamed", "server"):
+            for concurrency in (1, 4, 8):
+                state["received"] = 0
+                replicator = replicate.ObjectReplicationProxy(
+                    {
+                        "endpoint": f"http://127.0.0.1:{port}/v1/AUTH_bench",
+                        "token": "bench",
+                    },
+                    client,
+                    unittest.mock.AsyncMock(),
+                    "bench",
+                    "bench-copy",
+                    "bench",
+                    "bench-source",
+                    segment_concurrency=concurrency,
+                )
+                replicator.server_copy = mode == "server"
+                start = time.perf_counter()
+                cpu_start = time.process_time()
+                await replicator.a_copy_object("big")
+                cpu = time.process_time() - cpu_start
+                duration = time.perf_counter() - start
+                copied = segments * len(state["segment"])
+                print(
+                    f"{mode:>8} {concurrency:>12} {duration:>7.2f}s "
+                    f"{copied / duration / 1024 / 1024:>7.1f} MiB/s "
+                    f"{state['received'] / 1024 / 1024:>6.0f} MiB {cpu:>8.2f}s"
+                )
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 16,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 16,
+            int(sys.argv[3]) if len(sys.argv) > 3 else 50,
+        )
+    )
@@ -0,0 +1,88 @@
+"""Compare opening an S3 client per request with using the client pool.
+
+Sends head bucket requests to a moto S3 server the way the UI S3 handlers
+do, first opening a new session and client for every request as the
+handlers used to, then taking the client from ``S3ClientPool``. Reports the
+average time of a request in both cases.
+
+Requires moto with its server, e.g. ``pip install "moto[server]"``.
+
+Usage: python tests/performance/s3_clients_bench.py [requests]
+"""
+
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+
+import aioboto3
+import aiohttp.client
+
+from swift_browser_ui.ui.s3_clients import S3ClientPool
+from swift_browser_ui.ui.settings import setd
+
+
+def free_port() -> int:
+    """Return a free local port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def main(requests: int) -> None:
+    """Run the benchmark."""
+    port = free_port()
+    moto = subprocess.Popen(  # noqa: S603
+        [sys.executable, "-m", "moto.server", "-H", "127.0.0.1", "-p", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    setd["s3api_endpoint"] = f"http://127.0.0.1:{port}"
+    setd["check_certificate"] = False
+    access, secret = "bench", "bench"  # noqa: S105
+    pool = S3ClientPool()
+    try:
+        async with aiohttp.client.ClientSession() as client:
+            for _ in range(0, 100):
+                try:
+                    async with client.get(setd["s3api_endpoint"]):
+                        break
+                except aiohttp.ClientConnectionError:
+                    await asyncio.sleep(0.1)
+
+        async with pool.client(access, secret) as s3_client:
+            await s3_client.create_bucket(Bucket="bench")
+
+        print(f"{requests} head bucket requests")
+        print(f"{'clients':>8} {'per request':>12}")
+
+        start = time.perf_counter()
+        for _ in range(0, requests):
+            s3session = aioboto3.Session(
+                aws_access_key_id=access, aws_secret_access_key=secret
+            )
+            async with s3session.client(
+                "s3",
+                region_name="us-east-1",
+                endpoint_url=setd["s3api_endpoint"],
+                verify=setd["check_certificate"],
+            ) as s3_client:
+                await s3_client.head_bucket(Bucket="bench")
+        duration = time.perf_counter() - start
+        print(f"{'new':>8} {duration / requests * 1000:>9.1f} ms")
+
+        start = time.perf_counter()
+        for _ in range(0, requests):
+            async with pool.client(access, secret) as s3_client:
+                await s3_client.head_bucket(Bucket="bench")
+        duration = time.perf_counter() - start
+        print(f"{'pooled':>8} {duration / requests * 1000:>9.1f} ms")
+    finally:
+        await pool.a_close()
+        moto.terminate()
+        moto.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100))
@@ -0,0 +1,186 @@
+"""Compare S3 bucket replication with different object concurrency.
+
+Replicates a bucket of small encrypted objects through ``ObjectReplicator``
+from a moto S3 server, reached through a proxy that answers each request
+after a fixed latency like a remote S3 endpoint does. The Vault header
+transfers of the objects take the same latency. Reports the time taken and
+the objects copied per second with each concurrency. Then copies a large
+object in parts, with the proxy answering each part copy after the time S3
+would take copying the range at a fixed rate, and reports the time taken
+with each amount of parts copied at the same time.
+
+Requires moto with its server, e.g. ``pip install "moto[server]"``.
+
+Usage: python tests/performance/s3_replicate_bench.py [objects] [latency ms] [MiB large object]
+"""
+
+import asyncio
+import logging
+import socket
+import subprocess
+import sys
+import time
+import unittest.mock
+
+import aioboto3
+import aiohttp.client
+import aiohttp.web
+import botocore.config
+
+import swift_browser_ui.ui.replicate as replicate
+
+# Bytes per second S3 copies a part at
+COPY_RATE = 25 * 1024 * 1024
+
+
+async def proxy(request: aiohttp.web.Request) -> aiohttp.web.Response:
+    """Forward a request to moto after the latency."""
+    await asyncio.sleep(request.app["latency"])
+    if "x-amz-copy-source-range" in request.headers:
+        first, last = request.headers["x-amz-copy-source-range"][6:].split("-")
+        await asyncio.sleep((int(last) - int(first) + 1) / COPY_RATE)
+    client: aiohttp.client.ClientSession = request.app["client"]
+    async with client.request(
+        request.method,
+        f"{request.app['moto']}{request.path_qs}",
+        headers={k: v for k, v in request.headers.items() if k != "Host"},
+        data=await request.read(),
+    ) as resp:
+        return aiohttp.web.Response(
+            status=resp.status,
+            body=await resp.read(),
+            headers={
+                k: v
+                for k, v in resp.headers.items()
+                if k not in {"Content-Length", "Transfer-Encoding", "Content-Encoding"}
+            },
+        )
+
+
+def free_port() -> int:
+    """Return a free local port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def main(objects: int, latency_ms: int, large_mib: int) -> None:
+    """Run the benchmark."""
+    replicate.LOGGER.setLevel(logging.WARNING)
+    latency = latency_ms / 1000
+    moto_port = free_port()
+    moto = subprocess.Popen(  # noqa: S603
+        [sys.executable, "-m", "moto.server", "-H", "127.0.0.1", "-p", str(moto_port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    client = aiohttp.client.ClientSession()
+    app = aiohttp.web.Application(client_max_size=0)
+    app["latency"] = latency
+    app["moto"] = f"http://127.0.0.1:{moto_port}"
+    app["client"] = client
+    app.add_routes([aiohttp.web.route("*", "/{path:.*}", proxy)])
+    runner = aiohttp.web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = aiohttp.web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+
+    async def vault_call(*_: object, **__: object) -> str:
+        await asyncio.sleep(latency)
+        return "aGVhZGVy"
+
+    vault = unittest.mock.AsyncMock()
+    for method in ("get_header", "put_header", "get_public_key"):
+        getattr(vault, method).side_effect = vault_call
+
+    try:
+        for _ in range(0, 100):
+            try:
+                async with client.get(app["moto"]):
+                    break
+            except aiohttp.ClientConnectionError:
+                await asyncio.sleep(0.1)
+
+        session = aioboto3.Session(
+            aws_access_key_id="bench", aws_secret_access_key="bench"  # noqa: S106
+        )
+        async with session.client(
+            "s3",
+            region_name="us-east-1",
+            endpoint_url=f"http://127.0.0.1:{port}",
+            config=botocore.config.Config(max_pool_connections=64),
+        ) as s3client:
+            await s3client.create_bucket(Bucket="bench-source")
+            for i in range(0, objects):
+                await s3client.put_object(
+                    Bucket="bench-source", Key=f"object-{i:06d}.c4gh", Body=b"x" * 4096
+                )
+
+            print(f"{objects} objects, {latency_ms} ms per request")
+            print(f"{'concurrency':>12} {'time':>8} {'objects/s':>10} {'failed':>7}")
+            for concurrency in (1, 8, 32):
+                bucket = f"bench-copy-{concurrency}"
+                await s3client.create_bucket(Bucket=bucket)
+                replicator = replicate.ObjectReplicator(
+                    s3client,
+                    vault,
+                    "bench",
+                    bucket,
+                    "bench",
+                    "bench-source",
+                    "bench",
+                    concurrency=concurrency,
+                )
+                start = time.perf_counter()
+                await replicator.replicate_objects()
+                duration = time.perf_counter() - start
+                print(
+                    f"{concurrency:>12} {duration:>7.2f}s "
+                    f"{replicator.copied / duration:>10.1f} "
+                    f"{len(replicator.failures):>7}"
+                )
+
+            large = large_mib * 1024 * 1024
+            await s3client.put_object(
+                Bucket="bench-source", Key="large", Body=b"x" * large
+            )
+            print(
+                f"object of {large_mib} MiB in "
+                f"{replicate.get_part_size(large) // 1024 // 1024} MiB parts, "
+                f"copied at {COPY_RATE // 1024 // 1024} MiB/s per part"
+            )
+            print(f"{'parts at once':>14} {'time':>8} {'throughput':>12}")
+            for part_concurrency in (1, 4, 8):
+                replicator = replicate.ObjectReplicator(
+                    s3client,
+                    vault,
+                    "bench",
+                    "bench-copy-1",
+                    "bench",
+                    "bench-source",
+                    part_concurrency=part_concurrency,
+                )
+                start = time.perf_counter()
+                await replicator._multipart_copy({"Key": "large", "Size": large})
+                duration = time.perf_counter() - start
+                await s3client.delete_object(Bucket="bench-copy-1", Key="large")
+                print(
+                    f"{part_concurrency:>14} {duration:>7.2f}s "
+                    f"{large_mib / duration:>7.1f} MiB/s"
+                )
+    finally:
+        await runner.cleanup()
+        await client.close()
+        moto.terminate()
+        moto.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 20,
+            int(sys.argv[3]) if len(sys.argv) > 3 else 400,
+        )
+    )
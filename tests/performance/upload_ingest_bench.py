@@ -0,0 +1,107 @@
+"""Benchmark the chunk ingestion loop of the upload websocket.
+
+Decodes ``add_chunks`` frames, caches the chunks of a ``FileUpload`` and
+consumes them in order like the segment slicer does, reporting the bytes
+per second of CPU time for a single core. Chunk data is copied out of
+msgpack frames with ``msgpack.unpackb`` and compared against the view
+based ``unpack_message`` and against v2 chunk frames.
+
+Usage: python tests/performance/upload_ingest_bench.py [MiB per run]
+"""
+
+import asyncio
+import sys
+import time
+import types
+import typing
+import unittest.mock
+
+import msgpack
+
+import swift_browser_ui.upload.cryptupload as cryptupload
+
+
+def copying_unpack(frame: bytes) -> typing.List[bytes]:
+    """Unpack a frame copying out the chunk data, like the runner used to."""
+    return [bytes(chunk["data"]) for chunk in msgpack.unpackb(frame)["chunks"]]
+
+
+def view_unpack(frame: bytes) -> typing.List[memoryview]:
+    """Unpack a msgpack frame to views of the chunk data."""
+    return [chunk["data"] for chunk in cryptupload.unpack_message(frame)["chunks"]]
+
+
+def frame_unpack(frame: bytes) -> typing.List[memoryview]:
+    """Unpack a v2 chunk frame."""
+    return [data for _, data in cryptupload.unpack_chunk_frame(frame)[1]]
+
+
+async def ingest(
+    unpack: typing.Callable[[bytes], typing.List[typing.Any]],
+    frame: bytearray,
+    per_frame: int,
+    total: int,
+) -> float:
+    """Run the ingestion loop and return the CPU time used."""
+    upload = cryptupload.FileUpload(
+        unittest.mock.Mock(),
+        unittest.mock.AsyncMock(),
+        {"endpoint": "https://swift.example/v1/AUTH_bench", "token": "bench"},
+        types.SimpleNamespace(closed=True),  # type: ignore
+        "bench",
+        "bench-container",
+        "bench",
+        "bench-object.c4gh",
+        total,
+    )
+    slicer = upload.slice_segment(0)
+    order = 0
+    start = time.process_time()
+    while order < upload.total_chunks:
+        # Each websocket message arrives in a freshly allocated buffer
+        for data in unpack(bytes(frame)):
+            await upload.add_to_chunks(order, data)
+            order += 1
+        for _ in range(per_frame):
+            await slicer.__anext__()
+    return time.process_time() - start
+
+
+async def main(size_mib: int) -> None:
+    """Run the benchmark."""
+    total = size_mib * 1024 * 1024
+    print(f"{'chunks/frame':>12} {'msgpack copy':>14} {'unpack_message':>15} {'v2':>14}")
+    for per_frame in (1, 4, 8, 16, 64):
+        chunk = b"x" * cryptupload.CHUNK_SIZE
+        msgpack_frame = bytearray(
+            msgpack.packb(
+                {
+                    "command": "add_chunks",
+                    "container": "bench-container",
+                    "object": "bench-object.c4gh",
+                    "chunks": [{"order": 0, "data": chunk} for _ in range(per_frame)],
+                }
+            )
+        )
+        v2_frame = bytearray(
+            cryptupload.pack_chunk_frame(1, [(0, chunk) for _ in range(per_frame)])
+        )
+        # Round the upload to whole frames
+        chunks = total // cryptupload.CHUNK_SIZE // per_frame * per_frame
+        size = chunks * cryptupload.CHUNK_SIZE
+        rates = [
+            size / await ingest(unpack, frame, per_frame, size) / 1024 / 1024
+            for unpack, frame in (
+                (copying_unpack, msgpack_frame),
+                (view_unpack, msgpack_frame),
+                (frame_unpack, v2_frame),
+            )
+        ]
+        print(
+            f"{per_frame:>12} {rates[0]:>9.0f} MiB/s {rates[1]:>10.0f} MiB/s "
+            f"{rates[2]:>9.0f} MiB/s"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2048))
@@ -0,0 +1,150 @@
+"""Benchmark concurrent encrypted uploads through the upload runner.
+
+Runs a number of ``FileUpload`` instances against an in-memory Swift
+stand-in, feeding chunks the way the upload websocket does, and reports
+per-file throughput and the CPU time used by the runner process. The CPU
+time used while the same number of uploads wait idle for their first chunk
+is reported separately.
+
+Usage: python tests/performance/upload_runner_bench.py [uploads] [MiB per file]
+"""
+
+import asyncio
+import logging
+import statistics
+import sys
+import time
+import types
+import unittest.mock
+
+import swift_browser_ui.upload.cryptupload as cryptupload
+
+# Browser workers deliver chunks in small batches with a short gap between them
+BATCH_SIZE = 8
+BATCH_GAP = 0.005
+IDLE_TIME = 2.0
+
+
+class MockSwiftResponse:
+    """Response handle for the in-memory Swift stand-in."""
+
+    def __init__(self, status: int):
+        """."""
+        self.status = status
+        # No ETag, so the digest of the streamed segment isn't compared
+        self.headers: dict = {}
+
+    async def __aenter__(self):
+        """."""
+        return self
+
+    async def __aexit__(self, *_):
+        """."""
+        return
+
+
+class MockSwiftClient:
+    """In-memory Swift stand-in that consumes streamed request bodies."""
+
+    def __init__(self):
+        """."""
+        self.received = 0
+
+    def put(self, _url, data=b"", **_kwargs):
+        """Consume a PUT body."""
+        client = self
+
+        class Handle(MockSwiftResponse):
+            async def __aenter__(self):
+                if isinstance(data, (bytes, bytearray)):
+                    # Small files are uploaded directly from a buffer
+                    client.received += len(data)
+                else:
+                    async for chunk in data:
+                        client.received += len(chunk)
+                return self
+
+        return Handle(201)
+
+    def head(self, _url, **_kwargs):
+        """Answer a HEAD request."""
+        return MockSwiftResponse(204)
+
+    async def delete(self, _url, **_kwargs):
+        """Answer a DELETE request."""
+        return MockSwiftResponse(204)
+
+
+async def feed(upload: cryptupload.FileUpload, chunk: bytes) -> None:
+    """Feed all chunks of a file to the upload, like the websocket handler."""
+    for start in range(0, upload.total_chunks, BATCH_SIZE):
+        for order in range(start, min(start + BATCH_SIZE, upload.total_chunks)):
+            await upload.add_to_chunks(order, chunk)
+        await upload.wait_for_cache()
+        await asyncio.sleep(BATCH_GAP)
+
+
+def create_upload(client: MockSwiftClient, total: int) -> cryptupload.FileUpload:
+    """Create a file upload against the Swift stand-in."""
+    return cryptupload.FileUpload(
+        client,  # type: ignore
+        unittest.mock.AsyncMock(),
+        {"endpoint": "https://swift.example/v1/AUTH_bench", "token": "bench"},
+        types.SimpleNamespace(closed=True),  # type: ignore
+        "bench",
+        "bench-container",
+        "bench",
+        "bench-object.c4gh",
+        total,
+    )
+
+
+async def run_upload(client: MockSwiftClient, total: int, chunk: bytes) -> float:
+    """Run a single file upload and return the time it took."""
+    upload = create_upload(client, total)
+    start = time.perf_counter()
+    await upload.add_header(b"header")
+    await asyncio.gather(feed(upload, chunk), upload.finish_upload())
+    return time.perf_counter() - start
+
+
+async def main(uploads: int, size_mib: int) -> None:
+    """Run the benchmark."""
+    cryptupload.LOGGER.setLevel(logging.WARNING)
+    client = MockSwiftClient()
+    chunk = b"x" * cryptupload.CHUNK_SIZE
+    total = size_mib * 1024 * 1024
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    durations = await asyncio.gather(
+        *[run_upload(client, total, chunk) for _ in range(uploads)]
+    )
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    idle = [create_upload(client, total) for _ in range(uploads)]
+    for upload in idle:
+        await upload.add_header(b"header")
+    idle_start = time.process_time()
+    await asyncio.sleep(IDLE_TIME)
+    idle_cpu = time.process_time() - idle_start
+    await asyncio.gather(*[upload.abort_upload() for upload in idle])
+
+    per_file = [total / d / 1024 / 1024 for d in durations]
+    print(f"uploads:              {uploads} x {size_mib} MiB")
+    print(f"bytes through runner: {client.received / 1024 / 1024:.1f} MiB")
+    print(f"wall time:            {wall:.2f} s")
+    print(f"runner CPU time:      {cpu:.2f} s ({100 * cpu / wall:.0f} % of one core)")
+    print(f"per-file throughput:  median {statistics.median(per_file):.2f} MiB/s")
+    print(f"aggregate throughput: {client.received / wall / 1024 / 1024:.1f} MiB/s")
+    print(f"idle CPU time:        {idle_cpu:.3f} s over {IDLE_TIME:.0f} s")
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 4,
+        )
+    )
@@ -0,0 +1,168 @@
+"""Compare encrypted upload of a folder with and without file scheduling.
+
+Uploads many files through ``FileUpload`` instances sharing one
+``UploadScheduler``, like the uploads of a single upload session do, into
+a local Swift stand-in whose bandwidth is shared by all connections. The
+client streams a file once it's told to start it. Reports the time taken,
+when files got finished and the peak amount of open segment requests when
+every file is started at once, and when the files are scheduled.
+
+Usage: python tests/performance/upload_scheduler_bench.py [files] [MiB per file] [MiB/s]
+"""
+
+import asyncio
+import logging
+import statistics
+import sys
+import time
+import unittest.mock
+
+import aiohttp.client
+import aiohttp.web
+import msgpack
+
+import swift_browser_ui.upload.cryptupload as cryptupload
+
+BATCH_SIZE = 16
+
+
+async def swift_put(request: aiohttp.web.Request) -> aiohttp.web.Response:
+    """Receive an object, sharing the bandwidth with the other connections."""
+    state = request.app["state"]
+    state["open"] += 1
+    state["peak"] = max(state["peak"], state["open"])
+    try:
+        async for data in request.content.iter_any():
+            state["received"] += len(data)
+            ahead = state["received"] / state["rate"] - (
+                time.perf_counter() - state["start"]
+            )
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+    finally:
+        state["open"] -= 1
+    return aiohttp.web.Response(status=201)
+
+
+async def swift_head(_: aiohttp.web.Request) -> aiohttp.web.Response:
+    """Answer a container HEAD."""
+    return aiohttp.web.Response(status=204)
+
+
+class BenchSocket:
+    """Websocket stand-in streaming a file when the runner starts it."""
+
+    def __init__(self, start: float) -> None:
+        """."""
+        self.closed = False
+        self.start = start
+        self.uploads: dict = {}
+        self.feeders: list = []
+        self.finished: list = []
+
+    async def send_bytes(self, data: bytes) -> None:
+        """Handle a message from the runner."""
+        msg = msgpack.unpackb(data)
+        if msg["command"] == "start_upload":
+            upload = self.uploads[msg["object"]]
+            self.feeders.append(asyncio.create_task(self.feed(upload)))
+
+    async def feed(self, upload: cryptupload.FileUpload) -> None:
+        """Stream the chunks of a file and finish it."""
+        chunk = b"x" * cryptupload.CHUNK_SIZE
+        for start in range(0, upload.total_chunks, BATCH_SIZE):
+            for order in range(start, min(start + BATCH_SIZE, upload.total_chunks)):
+                await upload.add_to_chunks(order, chunk)
+            await upload.wait_for_cache()
+        await upload.finish_upload()
+        self.finished.append(time.perf_counter() - self.start)
+
+
+async def run_folder(
+    client: aiohttp.client.ClientSession,
+    endpoint: str,
+    state: dict,
+    files: int,
+    total: int,
+    scheduler: cryptupload.UploadScheduler,
+) -> BenchSocket:
+    """Upload all files of a folder through a single scheduler."""
+    state.update({"received": 0, "open": 0, "peak": 0, "start": time.perf_counter()})
+    socket = BenchSocket(state["start"])
+    budget = cryptupload.UploadBudget()
+    containers = cryptupload.ContainerCache()
+    for i in range(0, files):
+        upload = cryptupload.FileUpload(
+            client,
+            unittest.mock.AsyncMock(),
+            {"endpoint": endpoint, "token": "bench"},
+            socket,  # type: ignore
+            "bench",
+            "bench-container",
+            "bench",
+            f"bench-{i}.c4gh",
+            total,
+            budget=budget,
+            segment_size=16 * 1024 * 1024,
+            containers=containers,
+            scheduler=scheduler,
+        )
+        socket.uploads[upload.path] = upload
+        # The browser sends the headers of all files right away
+        await upload.add_header(b"header")
+    while len(socket.finished) < files:
+        await asyncio.gather(*socket.feeders)
+    return socket
+
+
+async def main(files: int, size_mib: int, rate_mib: int) -> None:
+    """Run the benchmark."""
+    cryptupload.LOGGER.setLevel(logging.WARNING)
+    app = aiohttp.web.Application(client_max_size=0)
+    state = {"rate": rate_mib * 1024 * 1024}
+    app["state"] = state
+    app.add_routes(
+        [
+            aiohttp.web.head("/v1/{account}/{container}", swift_head),
+            aiohttp.web.put("/v1/{account}/{container}", swift_head),
+            aiohttp.web.put("/v1/{account}/{container}/{object:.*}", swift_put),
+        ]
+    )
+    runner = aiohttp.web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = aiohttp.web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+    endpoint = f"http://127.0.0.1:{port}/v1/AUTH_bench"
+
+    print(f"{files} files of {size_mib} MiB, Swift bandwidth {rate_mib} MiB/s")
+    print(
+        f"{'scheduling':>12} {'time':>8} {'throughput':>12} "
+        f"{'first done':>11} {'median done':>12} {'peak PUTs':>10}"
+    )
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.client.ClientSession(connector=connector) as client:
+        for label, scheduler in (
+            ("all files", cryptupload.UploadScheduler(files, files * 3)),
+            ("scheduled", cryptupload.UploadScheduler()),
+        ):
+            socket = await run_folder(
+                client, endpoint, state, files, size_mib * 1024 * 1024, scheduler
+            )
+            duration = max(socket.finished)
+            print(
+                f"{label:>12} {duration:>7.2f}s {files * size_mib / duration:>7.1f} MiB/s "
+                f"{min(socket.finished):>10.2f}s "
+                f"{statistics.median(socket.finished):>11.2f}s {state['peak']:>10}"
+            )
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 64,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 32,
+            int(sys.argv[3]) if len(sys.argv) > 3 else 400,
+        )
+    )
@@ -0,0 +1,128 @@
+"""Compare encrypted upload throughput with different segment settings.
+
+Uploads a single file through ``FileUpload`` into a local Swift stand-in
+that limits the bandwidth of each PUT connection, like a single Swift
+proxy connection does. Chunks are fed in order as fast as the upload
+window allows, and the file is uploaded with one 5 GiB segment, and with
+smaller segments streamed concurrently.
+
+Usage: python tests/performance/upload_segment_bench.py [MiB] [MiB/s per connection]
+"""
+
+import asyncio
+import logging
+import sys
+import time
+import types
+import unittest.mock
+
+import aiohttp.client
+import aiohttp.web
+
+import swift_browser_ui.upload.cryptupload as cryptupload
+
+BATCH_SIZE = 16
+
+
+async def swift_put(request: aiohttp.web.Request) -> aiohttp.web.Response:
+    """Receive an object, limiting the rate of the connection."""
+    rate = request.app["rate"]
+    received = 0
+    start = time.perf_counter()
+    async for data in request.content.iter_any():
+        received += len(data)
+        ahead = received / rate - (time.perf_counter() - start)
+        if ahead > 0:
+            await asyncio.sleep(ahead)
+    request.app["received"] += received
+    return aiohttp.web.Response(status=201)
+
+
+async def swift_head(_: aiohttp.web.Request) -> aiohttp.web.Response:
+    """Answer a container HEAD."""
+    return aiohttp.web.Response(status=204)
+
+
+async def run_upload(
+    client: aiohttp.client.ClientSession,
+    endpoint: str,
+    total: int,
+    segment_size: int,
+    concurrency: int,
+) -> float:
+    """Upload a file and return the time it took."""
+    cryptupload.CRYPTUPLOAD_SEGMENT_CONCURRENCY = concurrency
+    upload = cryptupload.FileUpload(
+        client,
+        unittest.mock.AsyncMock(),
+        {"endpoint": endpoint, "token": "bench"},
+        types.SimpleNamespace(closed=True),  # type: ignore
+        "bench",
+        "bench-container",
+        "bench",
+        "bench-object.c4gh",
+        total,
+        segment_size=segment_size,
+    )
+    chunk = b"x" * cryptupload.CHUNK_SIZE
+
+    async def feed() -> None:
+        for start in range(0, upload.total_chunks, BATCH_SIZE):
+            for order in range(start, min(start + BATCH_SIZE, upload.total_chunks)):
+                await upload.add_to_chunks(order, chunk)
+            await upload.wait_for_cache()
+
+    start = time.perf_counter()
+    await upload.add_header(b"header")
+    await asyncio.gather(feed(), upload.finish_upload())
+    return time.perf_counter() - start
+
+
+async def main(size_mib: int, rate_mib: int) -> None:
+    """Run the benchmark."""
+    cryptupload.LOGGER.setLevel(logging.WARNING)
+    app = aiohttp.web.Application(client_max_size=0)
+    app["rate"] = rate_mib * 1024 * 1024
+    app["received"] = 0
+    app.add_routes(
+        [
+            aiohttp.web.head("/v1/{account}/{container}", swift_head),
+            aiohttp.web.put("/v1/{account}/{container}", swift_head),
+            aiohttp.web.put("/v1/{account}/{container}/{object:.*}", swift_put),
+        ]
+    )
+    runner = aiohttp.web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = aiohttp.web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+    endpoint = f"http://127.0.0.1:{port}/v1/AUTH_bench"
+
+    total = size_mib * 1024 * 1024
+    print(f"file size {size_mib} MiB, Swift connection limit {rate_mib} MiB/s")
+    print(f"{'segment size':>14} {'concurrency':>12} {'time':>8} {'throughput':>12}")
+    async with aiohttp.client.ClientSession() as client:
+        for segment_mib, concurrency in (
+            (5 * 1024, 1),
+            (64, 1),
+            (64, 2),
+            (64, 4),
+            (32, 8),
+        ):
+            duration = await run_upload(
+                client, endpoint, total, segment_mib * 1024 * 1024, concurrency
+            )
+            print(
+                f"{segment_mib:>10} MiB {concurrency:>12} {duration:>7.2f}s "
+                f"{size_mib / duration:>7.1f} MiB/s"
+            )
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 512,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+        )
+    )
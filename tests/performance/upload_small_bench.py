@@ -0,0 +1,124 @@
+"""Compare encrypted upload of many small files with and without segments.
+
+Uploads small files through ``FileUpload`` into a local Swift stand-in that
+answers every request after a fixed latency, like a remote Swift proxy, and
+reports the amount of requests and the time taken with segmented uploads,
+with direct single object uploads, and with direct uploads sharing a
+container cache like the uploads of a single upload session do.
+
+Usage: python tests/performance/upload_small_bench.py [files] [KiB per file] [ms latency]
+"""
+
+import asyncio
+import logging
+import sys
+import time
+import types
+import unittest.mock
+
+import aiohttp.client
+import aiohttp.web
+
+import swift_browser_ui.upload.cryptupload as cryptupload
+
+# Files uploaded at the same time, like the browser upload queue does
+PARALLEL_FILES = 4
+
+
+async def swift_request(request: aiohttp.web.Request) -> aiohttp.web.Response:
+    """Answer any Swift request after the configured latency."""
+    await request.read()
+    await asyncio.sleep(request.app["latency"])
+    request.app["requests"][request.method] += 1
+    return aiohttp.web.Response(status=204 if request.method == "HEAD" else 201)
+
+
+async def run_upload(
+    client: aiohttp.client.ClientSession,
+    endpoint: str,
+    total: int,
+    name: str,
+    containers: cryptupload.ContainerCache | None,
+) -> None:
+    """Upload a single file."""
+    upload = cryptupload.FileUpload(
+        client,
+        unittest.mock.AsyncMock(),
+        {"endpoint": endpoint, "token": "bench"},
+        types.SimpleNamespace(closed=True),  # type: ignore
+        "bench",
+        "bench-container",
+        "bench",
+        name,
+        total,
+        containers=containers,
+    )
+    chunk = b"x" * cryptupload.CHUNK_SIZE
+    await upload.add_header(b"header")
+    for order in range(0, upload.total_chunks):
+        await upload.add_to_chunks(order, chunk[: total - order * len(chunk)])
+    await upload.finish_upload()
+
+
+async def run_files(
+    client: aiohttp.client.ClientSession,
+    endpoint: str,
+    files: int,
+    total: int,
+    containers: cryptupload.ContainerCache | None,
+) -> None:
+    """Upload all files, a few at a time."""
+    queue = list(range(0, files))
+
+    async def worker() -> None:
+        while queue:
+            await run_upload(
+                client, endpoint, total, f"bench-{queue.pop()}.c4gh", containers
+            )
+
+    await asyncio.gather(*[worker() for _ in range(0, PARALLEL_FILES)])
+
+
+async def main(files: int, size_kib: int, latency_ms: int) -> None:
+    """Run the benchmark."""
+    cryptupload.LOGGER.setLevel(logging.WARNING)
+    app = aiohttp.web.Application()
+    app["latency"] = latency_ms / 1000
+    app["requests"] = {}
+    app.router.add_route("*", "/{path:.*}", swift_request)
+    runner = aiohttp.web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = aiohttp.web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+    endpoint = f"http://127.0.0.1:{port}/v1/AUTH_bench"
+
+    print(f"{files} files of {size_kib} KiB, {latency_ms} ms per request")
+    print(f"{'upload':>10} {'HEAD':>6} {'PUT':>6} {'time':>8} {'files/s':>9}")
+    async with aiohttp.client.ClientSession() as client:
+        for label, direct_max, cached in (
+            ("segmented", 0, False),
+            ("direct", size_kib * 1024, False),
+            ("cached", size_kib * 1024, True),
+        ):
+            cryptupload.CRYPTUPLOAD_DIRECT_MAX = direct_max
+            app["requests"].update({"HEAD": 0, "PUT": 0})
+            containers = cryptupload.ContainerCache() if cached else None
+            start = time.perf_counter()
+            await run_files(client, endpoint, files, size_kib * 1024, containers)
+            duration = time.perf_counter() - start
+            print(
+                f"{label:>10} {app['requests']['HEAD']:>6} {app['requests']['PUT']:>6} "
+                f"{duration:>7.2f}s {files / duration:>9.1f}"
+            )
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 16,
+            int(sys.argv[3]) if len(sys.argv) > 3 else 10,
+        )
+    )
@@ -0,0 +1,234 @@
+"""Module for testing ``swift_browser_ui.ui.replicate``."""
+
+import asyncio
+import unittest
+import unittest.mock
+
+from swift_browser_ui.common.vault_client import VaultClient
+from swift_browser_ui.ui.replicate import (
+    DEFAULT_PART_SIZE,
+    MAX_PART_COUNT,
+    ObjectReplicator,
+    get_part_size,
+)
+
+MIB = 1024 * 1024
+
+
+class MockPaginator:
+    """Paginator stand-in returning the given pages."""
+
+    def __init__(self, pages):
+        """."""
+        self.pages = pages
+        self.params = {}
+
+    async def _iterate(self):
+        for page in self.pages:
+            yield page
+
+    def paginate(self, **params):
+        """Return the pages."""
+        self.params = params
+        return self._iterate()
+
+
+class ObjectReplicatorTestClass(unittest.IsolatedAsyncioTestCase):
+    """Test replicating buckets with S3."""
+
+    def setUp(self):
+        """Set up mocks."""
+        self.keys = [f"test-object-{i:02d}.c4gh" for i in range(0, 20)]
+        self.paginator = MockPaginator(
+            [
+                {"Contents": [{"Key": key, "Size": 10} for key in self.keys[:10]]},
+                {"Contents": [{"Key": key, "Size": 10} for key in self.keys[10:]]},
+            ]
+        )
+        self.s3client = unittest.mock.Mock()
+        self.s3client.get_paginator = unittest.mock.Mock(return_value=self.paginator)
+        self.vault = unittest.mock.AsyncMock(VaultClient)
+        self.vault.get_public_key.return_value = "dGVzdC1rZXk="
+        self.vault.get_header.return_value = "test-header"
+        self.replicator = ObjectReplicator(
+            self.s3client,
+            self.vault,
+            "test-project",
+            "test-bucket",
+            "test-source-project",
+            "test-source-bucket",
+            "test-project-name",
+            concurrency=4,
+        )
+
+    async def test_replicate_objects(self):
+        """Test copying objects concurrently and collecting the failures."""
+        copying = set()
+        peak = 0
+
+        async def copy_object(Key, **_):
+            nonlocal peak
+            copying.add(Key)
+            peak = max(peak, len(copying))
+            await asyncio.sleep(0.01)
+            copying.discard(Key)
+            if Key == "test-object-03.c4gh":
+                raise ValueError("test-error")
+
+        self.s3client.copy_object = unittest.mock.AsyncMock(side_effect=copy_object)
+
+        await self.replicator.replicate_objects("test-object")
+
+        self.assertEqual(self.paginator.params["StartAfter"], "test-object")
+        self.assertEqual(peak, 4)
+        self.assertEqual(self.s3client.copy_object.await_count, 20)
+        # Headers are only copied for the objects that got copied
+        self.assertEqual(self.vault.put_header.await_count, 19)
+        self.assertEqual(
+            self.replicator.get_progress(),
+            {
+                "marker": "test-object-19.c4gh",
+                "copied": 19,
+                "bytes": 190,
+                "failures": {"test-object-03.c4gh": "test-error"},
+            },
+        )
+        self.vault.remove_whitelist_key.assert_awaited_once()
+
+    async def test_replicate_objects_marker(self):
+        """Test checkpointing only the objects handled in listing order."""
+        release = asyncio.Event()
+        markers = []
+
+        async def copy_object(Key, **_):
+            if Key == "test-object-00.c4gh":
+                await release.wait()
+            markers.append(self.replicator.marker)
+            if Key == "test-object-03.c4gh":
+                release.set()
+
+        self.s3client.copy_object = unittest.mock.AsyncMock(side_effect=copy_object)
+
+        await self.replicator.replicate_objects()
+
+        # Objects finishing before the first one don't move the marker
+        self.assertEqual(markers[:4], ["", "", "", ""])
+        self.assertEqual(self.replicator.marker, "test-object-19.c4gh")
+        self.assertFalse(self.replicator.pending)
+
+    async def test_replicate_objects_slow_object(self):
+        """Test keeping only the unhandled objects behind a slow object."""
+        others = asyncio.Event()
+        copied = 0
+        pending = []
+
+        async def copy_object(Key, **_):
+            nonlocal copied
+            if Key == "test-object-00.c4gh":
+                await others.wait()
+                pending.extend(self.replicator.pending)
+                return
+            copied += 1
+            if copied == 19:
+                others.set()
+
+        self.s3client.copy_object = unittest.mock.AsyncMock(side_effect=copy_object)
+
+        await self.replicator.replicate_objects()
+
+        self.assertEqual(pending, ["test-object-00.c4gh"])
+        self.assertEqual(self.replicator.marker, "test-object-19.c4gh")
+
+    def test_get_part_size(self):
+        """Test choosing the part size from the object size."""
+        self.assertEqual(get_part_size(120 * MIB), DEFAULT_PART_SIZE)
+        # A terabyte is copied in about a thousand parts
+        self.assertEqual(get_part_size(1024 * 1024 * MIB), 1049 * MIB)
+        huge = 5 * 1024 * 1024 * 1024 * MIB
+        self.assertLessEqual(huge / get_part_size(huge), MAX_PART_COUNT)
+
+    async def test_multipart_copy(self):
+        """Test copying parts concurrently and completing them in order."""
+        self.replicator.part_concurrency = 2
+        self.s3client.create_multipart_upload = unittest.mock.AsyncMock(
+            return_value={"UploadId": "test-upload"}
+        )
+        self.s3client.complete_multipart_upload = unittest.mock.AsyncMock()
+        copying = set()
+        peak = 0
+
+        async def upload_part_copy(PartNumber, **_):
+            nonlocal peak
+            copying.add(PartNumber)
+            peak = max(peak, len(copying))
+            # Later parts finish first
+            await asyncio.sleep(0.01 * (4 - PartNumber))
+            copying.discard(PartNumber)
+            return {"CopyPartResult": {"ETag": f"etag-{PartNumber}"}}
+
+        self.s3client.upload_part_copy = unittest.mock.AsyncMock(
+            side_effect=upload_part_copy
+        )
+
+        await self.replicator._multipart_copy({"Key": "test-object", "Size": 120 * MIB})
+
+        self.assertEqual(peak, 2)
+        self.assertEqual(
+            [
+                c.kwargs["CopySourceRange"]
+                for c in self.s3client.upload_part_copy.call_args_list
+            ],
+            [
+                f"bytes=0-{50 * MIB - 1}",
+                f"bytes={50 * MIB}-{100 * MIB - 1}",
+                f"bytes={100 * MIB}-{120 * MIB - 1}",
+            ],
+        )
+        self.s3client.complete_multipart_upload.assert_awaited_once_with(
+            Bucket="test-bucket",
+            Key="test-object",
+            UploadId="test-upload",
+            MultipartUpload={
+                "Parts": [
+                    {"ETag": "etag-1", "PartNumber": 1},
+                    {"ETag": "etag-2", "PartNumber": 2},
+                    {"ETag": "etag-3", "PartNumber": 3},
+                ]
+            },
+        )
+
+    async def test_multipart_copy_failure(self):
+        """Test aborting the upload when a part fails to copy."""
+        self.replicator.part_concurrency = 2
+        self.s3client.create_multipart_upload = unittest.mock.AsyncMock(
+            return_value={"UploadId": "test-upload"}
+        )
+        self.s3client.complete_multipart_upload = unittest.mock.AsyncMock()
+        self.s3client.abort_multipart_upload = unittest.mock.AsyncMock()
+        cancelled = asyncio.Event()
+
+        async def upload_part_copy(PartNumber, **_):
+            if PartNumber == 1:
+                raise ValueError("test-error")
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        self.s3client.upload_part_copy = unittest.mock.AsyncMock(
+            side_effect=upload_part_copy
+        )
+
+        with self.assertRaises(ValueError):
+            await self.replicator._multipart_copy(
+                {"Key": "test-object", "Size": 120 * MIB}
+            )
+
+        # The part copy still running is cancelled and the third never starts
+        self.assertTrue(cancelled.is_set())
+        self.assertEqual(self.s3client.upload_part_copy.await_count, 2)
+        self.s3client.complete_multipart_upload.assert_not_awaited()
+        self.s3client.abort_multipart_upload.assert_awaited_once_with(
+            Bucket="test-bucket", Key="test-object", UploadId="test-upload"
+        )
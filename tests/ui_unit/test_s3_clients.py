@@ -0,0 +1,148 @@
+"""Module for testing ``swift_browser_ui.ui.s3_clients``."""
+
+import asyncio
+import contextlib
+import unittest
+import unittest.mock
+
+from swift_browser_ui.ui.s3_clients import PooledS3Client, S3ClientPool
+
+
+class MockClientContext:
+    """Client context stand-in recording whether it was closed."""
+
+    def __init__(self, access):
+        """."""
+        self.client = unittest.mock.Mock(access=access)
+        self.closed = False
+
+    async def __aenter__(self):
+        """Return the client."""
+        await asyncio.sleep(0)
+        return self.client
+
+    async def __aexit__(self, *_):
+        """Close the client."""
+        self.closed = True
+
+
+class S3ClientPoolTestClass(unittest.IsolatedAsyncioTestCase):
+    """Test pooling S3 clients."""
+
+    def setUp(self):
+        """Set up mocks."""
+        self.pool = S3ClientPool(size=2, idle_timeout=60)
+        self.contexts = []
+
+        def client(_, aws_access_key_id, **__):
+            self.contexts.append(MockClientContext(aws_access_key_id))
+            return self.contexts[-1]
+
+        self.pool.session = unittest.mock.Mock()
+        self.pool.session.client = unittest.mock.Mock(side_effect=client)
+
+    async def test_reuse_client(self):
+        """Test reusing the client opened with the same credentials."""
+        async with self.pool.client("access-1", "secret-1") as client:
+            first = client
+        async with self.pool.client("access-1", "secret-1") as client:
+            self.assertIs(client, first)
+        async with self.pool.client("access-1", "secret-2") as client:
+            self.assertIsNot(client, first)
+
+        self.assertEqual(self.pool.get_stats(), {"clients": 2, "hits": 1, "misses": 2})
+        self.assertFalse(any(context.closed for context in self.contexts))
+
+        await self.pool.a_close()
+        self.assertTrue(all(context.closed for context in self.contexts))
+        self.assertFalse(self.pool.clients)
+
+    async def test_concurrent_open(self):
+        """Test keeping a single client when requests open one at the same time."""
+
+        async def use():
+            async with self.pool.client("access-1", "secret-1") as client:
+                return client
+
+        first, second = await asyncio.gather(use(), use())
+
+        self.assertIs(first, second)
+        self.assertEqual(len(self.pool.clients), 1)
+        self.assertEqual([context.closed for context in self.contexts], [False, True])
+
+    async def test_keep_client_picked_while_closing_duplicate(self):
+        """Test not evicting a client picked by a request still closing its own."""
+        self.pool.size = 1
+        opening = asyncio.Event()
+        closing = asyncio.Event()
+        opened = []
+
+        async def open_client(access, _):
+            stack = contextlib.AsyncExitStack()
+            closed = unittest.mock.AsyncMock()
+            stack.push_async_callback(closed)
+            if not opened:
+                # The first client is closed as a duplicate after a delay
+                stack.push_async_callback(closing.wait)
+                opened.append(closed)
+                await opening.wait()
+            else:
+                opened.append(closed)
+            return PooledS3Client(unittest.mock.Mock(access=access), stack)
+
+        self.pool.a_open_client = open_client
+        acquiring = asyncio.create_task(self.pool.a_acquire("access-1", "secret"))
+        await asyncio.sleep(0)
+        async with self.pool.client("access-1", "secret"):
+            pass
+        opening.set()
+        await asyncio.sleep(0)
+
+        # Evicting while the duplicate is being closed keeps the picked client
+        await self.pool.a_evict()
+        closing.set()
+        pooled = await acquiring
+
+        opened[1].assert_not_awaited()
+        self.assertIs(self.pool.clients["access-1", "secret"], pooled)
+        self.assertEqual(pooled.users, 1)
+
+    async def test_evict_least_recently_used(self):
+        """Test closing the least recently used client over the size."""
+        for access in ("access-1", "access-2", "access-1", "access-3"):
+            async with self.pool.client(access, "secret"):
+                pass
+
+        self.assertEqual(
+            list(self.pool.clients), [("access-1", "secret"), ("access-3", "secret")]
+        )
+        self.assertEqual(
+            [context.closed for context in self.contexts], [False, True, False]
+        )
+
+    async def test_keep_clients_in_use(self):
+        """Test never closing a client that is still in use."""
+        async with self.pool.client("access-1", "secret"):
+            async with self.pool.client("access-2", "secret"):
+                async with self.pool.client("access-3", "secret"):
+                    self.assertEqual(len(self.pool.clients), 3)
+                    self.assertFalse(any(context.closed for context in self.contexts))
+        async with self.pool.client("access-4", "secret"):
+            pass
+
+        self.assertEqual(len(self.pool.clients), 2)
+        self.assertEqual(
+            [context.closed for context in self.contexts], [True, True, False, False]
+        )
+
+    async def test_evict_idle(self):
+        """Test closing the clients unused for longer than the idle timeout."""
+        async with self.pool.client("access-1", "secret"):
+            pass
+        self.pool.clients["access-1", "secret"].used -= 61
+        # Opening another client closes the idle ones
+        async with self.pool.client("access-2", "secret"):
+            pass
+
+        self.assertEqual(list(self.pool.clients), [("access-2", "secret")])
+        self.assertTrue(self.contexts[0].closed)
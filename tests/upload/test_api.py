@@ -1,13 +1,31 @@
 """Unit tests for swift_browser_ui.upload.api module."""
 
+import asyncio
 import json
+import time
 import types
 import unittest
 
 import aiohttp.web
+import msgpack
 
 import swift_browser_ui.upload.api
-from swift_browser_ui.upload.common import VAULT_CLIENT
+from swift_browser_ui.common.replication_jobs import (
+    ReplicationJobs,
+    ReplicationJobStore,
+)
+from swift_browser_ui.upload.common import (
+    REPLICATION_JOBS,
+    SESSION_REAPER,
+    SESSION_STORE,
+    UPLOAD_BUDGET,
+    UPLOAD_METRICS,
+    UPLOAD_SESSIONS,
+    VAULT_CLIENT,
+)
+from swift_browser_ui.upload.cryptupload import UploadBudget, UploadMetrics
+from swift_browser_ui.upload.replicate import REPLICATE_CONCURRENCY
+from swift_browser_ui.upload.sessions import SessionReaper, SessionStore
 
 import tests.common.mockups
 
@@ -24,6 +42,15 @@ class APITestClass(tests.common.mockups.APITestBase):
         self.p_get_sess = unittest.mock.patch(
             "swift_browser_ui.upload.api.get_session_id", self.mock_get_session_id
         )
+        self.session_store = SessionStore()
+        self.session_store.sessions["test-id"] = {
+            "project": "test-project",
+            "token": "test-token",
+            "endpoint": "http://test-endpoint",
+        }
+        self.mock_request.app[SESSION_STORE] = self.session_store
+        self.jobs = ReplicationJobs(ReplicationJobStore())
+        self.mock_request.app[REPLICATION_JOBS] = self.jobs
 
         self.mock_upload_instance = types.SimpleNamespace(
             **{
@@ -67,11 +94,6 @@ class APITestClass(tests.common.mockups.APITestBase):
         self.mock_request.match_info["container"] = "test-container"
         self.mock_request.match_info["object_name"] = "test-object"
 
-        self.mock_request.app["test-id"] = {
-            "token": "test-token",
-            "endpoint": "http://test-endpoint",
-        }
-
         self.mock_client_response.headers["Content-Type"] = "binary/octet-stream"
         self.mock_client_response.headers["Content-Length"] = 123456
 
@@ -94,6 +116,15 @@ class APITestClass(tests.common.mockups.APITestBase):
             **{
                 "a_copy_from_container": mock_copy_from_container,
                 "a_ensure_container": mock_ensure_container,
+                "incremental": False,
+                "get_progress": unittest.mock.Mock(
+                    return_value={
+                        "marker": "object-2",
+                        "copied": 2,
+                        "bytes": 20,
+                        "failures": {},
+                    }
+                ),
             }
         )
         mock_init_replicator = unittest.mock.Mock(return_value=mock_replicator)
@@ -116,8 +147,9 @@ class APITestClass(tests.common.mockups.APITestBase):
 
         self.assertIsInstance(resp, aiohttp.web.Response)
         self.assertEqual(resp.status, 202)
+        job_id = json.loads(resp.text)["job"]
         mock_init_replicator.assert_called_once_with(
-            "placeholder",
+            self.session_store.sessions["test-id"],
             self.mock_client,
             mock_vault_client,
             "test-project",
@@ -126,9 +158,106 @@ class APITestClass(tests.common.mockups.APITestBase):
             "source-container",
             "",
             "",
+            REPLICATE_CONCURRENCY,
+            incremental=False,
+        )
+        mock_ensure_container.assert_has_awaits(
+            [
+                unittest.mock.call(exist_ok=False),
+                unittest.mock.call(segmented=True, exist_ok=False),
+            ]
         )
-        mock_copy_from_container.assert_called_once()
-        mock_ensure_container.assert_called()
+
+        # A running job is reported instead of starting another one
+        mock_init_replicator.reset_mock()
+        mock_ensure_container.reset_mock()
+        self.mock_request.query["concurrency"] = "16"
+        with self.p_get_sess, patch_replicator:
+            resp = await swift_browser_ui.upload.api.handle_replicate_container(
+                self.mock_request,
+            )
+        self.assertEqual(json.loads(resp.text)["job"], job_id)
+        self.assertEqual(mock_init_replicator.call_args.args[-1], 16)
+        mock_ensure_container.assert_not_called()
+
+        await asyncio.gather(*self.jobs.tasks.values())
+        mock_copy_from_container.assert_awaited_once_with("")
+        job = await self.jobs.a_get_job(job_id)
+        self.assertEqual(job["status"], "finished")
+        self.assertEqual(job["copied"], 2)
+
+        # An interrupted job continues from its marker in the existing container
+        job["status"] = "running"
+        await self.jobs.store.a_put_job(job)
+        with self.p_get_sess, patch_replicator:
+            resp = await swift_browser_ui.upload.api.handle_replicate_container(
+                self.mock_request,
+            )
+        self.assertEqual(json.loads(resp.text)["job"], job_id)
+        await asyncio.gather(*self.jobs.tasks.values())
+        mock_copy_from_container.assert_awaited_with("object-2")
+        mock_ensure_container.assert_not_called()
+        job = await self.jobs.a_get_job(job_id)
+        self.assertEqual((job["copied"], job["resumed"]), (4, 1))
+
+        # An incremental copy of a finished job updates the existing container
+        mock_replicator.incremental = True
+        self.mock_request.query["incremental"] = ""
+        with self.p_get_sess, patch_replicator:
+            resp = await swift_browser_ui.upload.api.handle_replicate_container(
+                self.mock_request,
+            )
+        self.assertNotEqual(json.loads(resp.text)["job"], job_id)
+        self.assertTrue(mock_init_replicator.call_args.kwargs["incremental"])
+        mock_ensure_container.assert_awaited_with(segmented=True, exist_ok=True)
+        await asyncio.gather(*self.jobs.tasks.values())
+        del self.mock_request.query["incremental"]
+
+        self.mock_request.query["concurrency"] = "many"
+        with self.p_get_sess, patch_replicator:
+            with self.assertRaises(aiohttp.web.HTTPBadRequest):
+                await swift_browser_ui.upload.api.handle_replicate_container(
+                    self.mock_request,
+                )
+
+    async def test_handle_get_replication_job(self):
+        """Test swift_browser_ui.upload.api.handle_get_replication_job."""
+        updated = time.time()
+        await self.jobs.store.a_put_job(
+            {
+                "id": "test-job",
+                "key": "test-key",
+                "project": "test-project",
+                "status": "finished",
+                "updated": updated,
+            }
+        )
+        self.mock_request.match_info["job"] = "test-job"
+        with self.p_get_sess:
+            resp = await swift_browser_ui.upload.api.handle_get_replication_job(
+                self.mock_request,
+            )
+        self.assertEqual(
+            json.loads(resp.text),
+            {
+                "id": "test-job",
+                "project": "test-project",
+                "status": "finished",
+                "updated": updated,
+            },
+        )
+
+        self.session_store.sessions["test-id"]["project"] = "other-project"
+        with self.p_get_sess, self.assertRaises(aiohttp.web.HTTPForbidden):
+            await swift_browser_ui.upload.api.handle_get_replication_job(
+                self.mock_request,
+            )
+
+        self.mock_request.match_info["job"] = "missing-job"
+        with self.p_get_sess, self.assertRaises(aiohttp.web.HTTPNotFound):
+            await swift_browser_ui.upload.api.handle_get_replication_job(
+                self.mock_request,
+            )
 
     async def test_handle_replicate_object(self):
         """Test swift_brwser_ui.upload.api.handle_replicate_object."""
@@ -162,7 +291,7 @@ class APITestClass(tests.common.mockups.APITestBase):
         self.assertIsInstance(resp, aiohttp.web.Response)
         self.assertEqual(resp.status, 202)
         mock_init_replicator.assert_called_once_with(
-            "placeholder",
+            self.session_store.sessions["test-id"],
             self.mock_client,
             mock_vault_client,
             "test-project",
@@ -228,6 +357,70 @@ class APITestClass(tests.common.mockups.APITestBase):
         resp_json = json.loads(resp.body)
         self.assertEqual(resp_json["vault-instance"]["status"], "Ok")
 
+    async def test_handle_get_upload_budget(self):
+        """Test swift_browser_ui.upload.api.handle_get_upload_budget."""
+        self.mock_request.app[UPLOAD_BUDGET] = UploadBudget(1024)
+
+        resp = await swift_browser_ui.upload.api.handle_get_upload_budget(
+            self.mock_request
+        )
+        self.assertEqual(resp.status, 200)
+        resp_json = json.loads(resp.body)
+        self.assertEqual(resp_json["limit"], 1024)
+        self.assertEqual(resp_json["used"], 0)
+        self.assertEqual(resp_json["uploads"], 0)
+
+    async def test_handle_get_upload_sessions(self):
+        """Test swift_browser_ui.upload.api.handle_get_upload_sessions."""
+        self.mock_request.app[SESSION_REAPER] = SessionReaper(self.mock_request.app)
+        self.mock_request.app[UPLOAD_SESSIONS] = {
+            "test-id-0123456789": {
+                "test-project": unittest.mock.Mock(
+                    get_stats=unittest.mock.Mock(
+                        return_value={"project": "test-project", "buffered": 10}
+                    )
+                )
+            }
+        }
+
+        resp = await swift_browser_ui.upload.api.handle_get_upload_sessions(
+            self.mock_request
+        )
+        self.assertEqual(resp.status, 200)
+        resp_json = json.loads(resp.body)
+        self.assertEqual(
+            resp_json["sessions"],
+            [{"session": "test-id-", "project": "test-project", "buffered": 10}],
+        )
+        self.assertEqual(resp_json["buffered"], 10)
+        self.assertEqual(resp_json["reaper"]["reclaimed_bytes"], 0)
+
+    async def test_handle_get_upload_metrics(self):
+        """Test swift_browser_ui.upload.api.handle_get_upload_metrics."""
+        metrics = UploadMetrics()
+        session_metrics = UploadMetrics(metrics)
+        session_metrics.add_received(100)
+        session_metrics.observe_latency(0.002)
+        self.mock_request.app[UPLOAD_METRICS] = metrics
+        self.mock_request.app[UPLOAD_SESSIONS] = {
+            "test-id-0123456789": {
+                "test-project": unittest.mock.Mock(
+                    project="test-project", metrics=session_metrics
+                )
+            }
+        }
+
+        resp = await swift_browser_ui.upload.api.handle_get_upload_metrics(
+            self.mock_request
+        )
+        self.assertEqual(resp.status, 200)
+        resp_json = json.loads(resp.body)
+        self.assertEqual(resp_json["bytes_received"], 100)
+        self.assertEqual(resp_json["latency"]["buckets"]["0.005"], 1)
+        self.assertEqual(resp_json["sessions"][0]["session"], "test-id-")
+        self.assertEqual(resp_json["sessions"][0]["project"], "test-project")
+        self.assertEqual(resp_json["sessions"][0]["bytes_received"], 100)
+
     async def test_handle_project_key(self):
         """Test swift_browser_ui.upload.api.handle_project_key."""
         mock_vault_client = unittest.mock.Mock()
@@ -434,3 +627,61 @@ class APITestClass(tests.common.mockups.APITestBase):
         )
         self.assertIsInstance(resp, aiohttp.web.Response)
         self.assertEqual(resp.text, "{}")
+
+    async def test_handle_upload_ws_disconnect(self):
+        """Test keeping uploads only for clients able to resume them."""
+        self.mock_request.url = types.SimpleNamespace(path="/cryptic/test-project")
+        cases = (
+            (aiohttp.web.WSMsgType.CLOSED, "swift-upload.v2", True),
+            (aiohttp.web.WSMsgType.CLOSED, None, False),
+            (aiohttp.web.WSMsgType.CLOSE, "swift-upload.v2", False),
+        )
+        for msg_type, protocol, resume in cases:
+            upload_session = unittest.mock.AsyncMock()
+            mock_ws = unittest.mock.AsyncMock(ws_protocol=protocol, closed=True)
+            mock_ws.receive.return_value = aiohttp.WSMessage(msg_type, None, None)
+            with (
+                unittest.mock.patch(
+                    "swift_browser_ui.upload.api.cryptupload.get_encrypted_upload_session",
+                    unittest.mock.AsyncMock(return_value=upload_session),
+                ),
+                unittest.mock.patch(
+                    "swift_browser_ui.upload.api.aiohttp.web.WebSocketResponse",
+                    unittest.mock.Mock(return_value=mock_ws),
+                ),
+            ):
+                await swift_browser_ui.upload.api.handle_upload_ws(self.mock_request)
+
+            upload_session.handle_disconnect.assert_awaited_once_with(
+                mock_ws, resume=resume
+            )
+
+    async def test_handle_upload_ws_unknown_upload(self):
+        """Test continuing after a message for an unknown upload."""
+        self.mock_request.url = types.SimpleNamespace(path="/cryptic/test-project")
+        upload_session = unittest.mock.AsyncMock()
+        upload_session.uses_chunk_frames = unittest.mock.Mock(return_value=False)
+        upload_session.handle_upload_chunk.side_effect = KeyError("test-container")
+        mock_ws = unittest.mock.AsyncMock(ws_protocol=None, closed=True)
+        mock_ws.receive.side_effect = [
+            aiohttp.WSMessage(
+                aiohttp.web.WSMsgType.BINARY,
+                msgpack.packb({"command": "add_chunk", "container": "test-container"}),
+                None,
+            ),
+            aiohttp.WSMessage(aiohttp.web.WSMsgType.CLOSED, None, None),
+        ]
+        with (
+            unittest.mock.patch(
+                "swift_browser_ui.upload.api.cryptupload.get_encrypted_upload_session",
+                unittest.mock.AsyncMock(return_value=upload_session),
+            ),
+            unittest.mock.patch(
+                "swift_browser_ui.upload.api.aiohttp.web.WebSocketResponse",
+                unittest.mock.Mock(return_value=mock_ws),
+            ),
+        ):
+            await swift_browser_ui.upload.api.handle_upload_ws(self.mock_request)
+
+        upload_session.handle_upload_chunk.assert_awaited_once()
+        upload_session.handle_disconnect.assert_awaited_once_with(mock_ws, resume=False)
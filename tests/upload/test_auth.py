@@ -5,6 +5,8 @@ import unittest
 import aiohttp.web
 
 import swift_browser_ui.upload.auth
+from swift_browser_ui.upload.common import SESSION_STORE, UPLOAD_SESSIONS
+from swift_browser_ui.upload.sessions import SessionStore
 import tests.common.mockups
 
 
@@ -14,6 +16,8 @@ class AuthTestClass(tests.common.mockups.APITestBase):
     def setUp(self):
         """."""
         super().setUp()
+        self.session_store = SessionStore()
+        self.mock_request.app[SESSION_STORE] = self.session_store
 
     async def test_handle_login(self):
         """Test swift_browser_ui.upload.auth.handle_login."""
@@ -70,4 +74,28 @@ class AuthTestClass(tests.common.mockups.APITestBase):
         self.assertIsNotNone(resp.cookies["RUNNER_SESSION_ID"])
         self.assertEqual(resp.status, 200)
         session_key = resp.cookies["RUNNER_SESSION_ID"].value
-        self.assertIsNotNone(self.mock_request.app[session_key])
+        session = await self.session_store.a_get_session(session_key)
+        self.assertEqual(session["token"], "test-token")
+        self.assertEqual(
+            session["endpoint"], "https://test-swift:443/swift/v1/AUTH_test-id-0"
+        )
+        self.assertEqual(session["project"], "test-id-0")
+
+    async def test_handle_logout(self):
+        """Test swift_browser_ui.upload.auth.handle_logout."""
+        mock_upload_session = unittest.mock.AsyncMock()
+        self.session_store.sessions["test-session"] = {"token": "test-token"}
+        self.mock_request.app[UPLOAD_SESSIONS] = {
+            "test-session": {"test-id-0": mock_upload_session}
+        }
+        self.mock_request.cookies["RUNNER_SESSION_ID"] = "test-session"
+
+        resp = await swift_browser_ui.upload.auth.handle_logout(self.mock_request)
+        self.assertEqual(resp.status, 204)
+        self.assertEqual(self.session_store.sessions, {})
+        self.assertEqual(self.mock_request.app[UPLOAD_SESSIONS], {})
+        mock_upload_session.handle_close.assert_awaited_once()
+
+        # Logging out again doesn't fail
+        resp = await swift_browser_ui.upload.auth.handle_logout(self.mock_request)
+        self.assertEqual(resp.status, 204)
@@ -1,14 +1,171 @@
 """Unit tests for swift_browser_ui.upload.cryptupload module."""
 
-import aiohttp.web
+import asyncio
+import hashlib
+import json
+import tempfile
+import unittest
 import unittest.mock
 
-from swift_browser_ui.upload.cryptupload import FileUpload, UploadSession
+import aiohttp.web
+import msgpack
+
+from swift_browser_ui.upload.common import UPLOAD_BUDGET, UPLOAD_METRICS
+from swift_browser_ui.upload.cryptupload import (
+    CHUNK_SIZE,
+    ChunkSpillFile,
+    ContainerCache,
+    FileUpload,
+    LatencyHistogram,
+    UploadBudget,
+    UploadMetrics,
+    UploadScheduler,
+    UploadSession,
+    UPLOAD_PROTOCOL_V2,
+    get_segment_chunks,
+    is_chunk_frame,
+    pack_chunk_frame,
+    unpack_chunk_frame,
+    unpack_message,
+)
 
 from swift_browser_ui.common.vault_client import VaultClient
 import tests.common.mockups
 
 
+class UnpackMessageTestClass(unittest.TestCase):
+    """Test unpacking upload websocket messages."""
+
+    def test_unpack_message_small(self):
+        """Test that small messages are unpacked with msgpack."""
+        frame = msgpack.packb({"command": "add_chunk", "order": 1, "data": b"data"})
+        msg = unpack_message(frame)
+        self.assertEqual(msg["data"], b"data")
+        self.assertIsInstance(msg["data"], bytes)
+
+    def test_unpack_message_views(self):
+        """Test that large messages are unpacked to views of the frame."""
+        msg = {
+            "command": "add_chunks",
+            "container": "test-container",
+            "object": "ä" * 40,
+            "chunks": [
+                {"order": order, "data": bytes([order % 256]) * 65564}
+                for order in (0, 1, 2, 3, 4, 127, 128, 255, 65536, 2**33)
+            ]
+            + [{"order": -1, "data": b"x" * 300}, {"order": -200, "data": b""}],
+            "misc": [None, True, False, 1.5, -(2**40), {"nested": list(range(20))}],
+            "big": {str(i): i for i in range(20)},
+        }
+        frame = msgpack.packb(msg)
+        msg = unpack_message(frame)
+        self.assertEqual(msg, msgpack.unpackb(frame))
+        self.assertIsInstance(msg["chunks"][0]["data"], memoryview)
+        self.assertIs(msg["chunks"][0]["data"].obj, frame)
+
+    def test_unpack_message_errors(self):
+        """Test that malformed large messages raise msgpack errors."""
+        frame = msgpack.packb({"data": b"x" * 600000})
+        with self.assertRaises(msgpack.exceptions.ExtraData):
+            unpack_message(frame + b"\x00")
+        with self.assertRaises(msgpack.exceptions.FormatError):
+            unpack_message(frame[:-10])
+        with self.assertRaises(msgpack.exceptions.FormatError):
+            unpack_message(b"\x81\x90" + frame)
+
+
+class ChunkFrameTestClass(unittest.TestCase):
+    """Test packing and unpacking v2 chunk frames."""
+
+    def test_chunk_frame(self):
+        """Test a chunk frame round trip."""
+        frame = pack_chunk_frame(7, [(0, b"first"), (2**40, b""), (3, b"x" * 70000)])
+        self.assertTrue(is_chunk_frame(frame))
+        self.assertFalse(is_chunk_frame(msgpack.packb({"command": "finish"})))
+        self.assertFalse(is_chunk_frame(b""))
+
+        handle, chunks = unpack_chunk_frame(frame)
+        self.assertEqual(handle, 7)
+        self.assertEqual(
+            [(order, bytes(data)) for order, data in chunks],
+            [(0, b"first"), (2**40, b""), (3, b"x" * 70000)],
+        )
+        self.assertIs(chunks[0][1].obj, frame)
+
+    def test_chunk_frame_malformed(self):
+        """Test that malformed chunk frames raise msgpack errors."""
+        frame = pack_chunk_frame(1, [(0, b"first"), (1, b"second")])
+        with self.assertRaises(msgpack.exceptions.FormatError):
+            unpack_chunk_frame(frame[:-1])
+        with self.assertRaises(msgpack.exceptions.FormatError):
+            unpack_chunk_frame(frame[:12])
+        with self.assertRaises(msgpack.exceptions.FormatError):
+            unpack_chunk_frame(frame + b"x")
+
+
+class UploadSchedulerTestClass(unittest.IsolatedAsyncioTestCase):
+    """Test scheduling the files and segments of an upload session."""
+
+    def upload(self):
+        """Create a mock upload."""
+        return unittest.mock.Mock(priority=0, begin_upload=unittest.mock.AsyncMock())
+
+    async def test_admit_files(self):
+        """Test that only a few files are started at a time."""
+        scheduler = UploadScheduler(max_files=2)
+        uploads = [self.upload() for _ in range(0, 4)]
+        for upload in uploads:
+            await scheduler.a_submit(upload)
+
+        uploads[0].begin_upload.assert_awaited_once()
+        uploads[1].begin_upload.assert_awaited_once()
+        uploads[2].begin_upload.assert_not_awaited()
+        self.assertEqual(scheduler.get_stats()["queued_files"], 2)
+
+        # A queued upload is dropped, a finished one makes room for the next
+        await scheduler.a_release(uploads[2])
+        await scheduler.a_release(uploads[0])
+        uploads[2].begin_upload.assert_not_awaited()
+        uploads[3].begin_upload.assert_awaited_once()
+        self.assertEqual([u.priority for u in uploads], [1, 2, 0, 3])
+
+        await scheduler.a_submit(self.upload())
+        scheduler.clear()
+        self.assertEqual(scheduler.get_stats()["queued_files"], 0)
+
+    async def test_segment_slots(self):
+        """Test that segment slots are handed to the earliest started file."""
+        scheduler = UploadScheduler(max_segments=1)
+        first, second = self.upload(), self.upload()
+        scheduler.activate(first)
+        scheduler.activate(second)
+        started = []
+        release = asyncio.Event()
+
+        async def segment(upload, order):
+            async with scheduler.segment_slot(upload, order):
+                started.append((upload.priority, order))
+                await release.wait()
+
+        holder = asyncio.create_task(segment(second, 0))
+        await asyncio.sleep(0)
+        waiting = [
+            asyncio.create_task(segment(second, 1)),
+            asyncio.create_task(segment(first, 2)),
+            asyncio.create_task(segment(first, 1)),
+        ]
+        await asyncio.sleep(0)
+        self.assertEqual(started, [(2, 0)])
+        self.assertEqual(scheduler.get_stats()["queued_segments"], 3)
+
+        # A cancelled waiter doesn't take the slot
+        waiting[2].cancel()
+        release.set()
+        await asyncio.gather(holder, *waiting, return_exceptions=True)
+        self.assertEqual(started, [(2, 0), (1, 2), (2, 1)])
+        self.assertEqual(scheduler.segments, 0)
+
+
 class CryptTestClass(tests.common.mockups.APITestBase):
     """Test class for swift_browser_ui.upload.download functions."""
 
@@ -23,19 +180,28 @@ class CryptTestClass(tests.common.mockups.APITestBase):
         self.mock_socket = unittest.mock.AsyncMock(aiohttp.web.WebSocketResponse)
         self.mock_socket.closed = False
         self.mock_vault = unittest.mock.AsyncMock(VaultClient)
-        self.file_uploader = FileUpload(
-            self.mock_client,
-            self.mock_vault,
-            self.mock_session,
-            self.mock_socket,
-            "test-project",
-            "test-container",
-            "test-name",
-            "test-path",
-            100000,
-            "",
-            "",
-        )
+        self.budget = UploadBudget(1024)
+        self.mock_request.app[UPLOAD_BUDGET] = self.budget
+        self.metrics = UploadMetrics()
+        self.mock_request.app[UPLOAD_METRICS] = self.metrics
+        # Use segments even though the test file is small
+        with unittest.mock.patch(
+            "swift_browser_ui.upload.cryptupload.CRYPTUPLOAD_DIRECT_MAX", 0
+        ):
+            self.file_uploader = FileUpload(
+                self.mock_client,
+                self.mock_vault,
+                self.mock_session,
+                self.mock_socket,
+                "test-project",
+                "test-container",
+                "test-name",
+                "test-path",
+                100000,
+                "",
+                "",
+                self.budget,
+            )
         self.upload_session = UploadSession(self.mock_request, self.mock_session)
         self.upload_session.set_ws(self.mock_socket)
         self.msg = {
@@ -52,6 +218,25 @@ class CryptTestClass(tests.common.mockups.APITestBase):
             "test-object": self.file_uploader
         }
 
+    def mock_consuming_put(self):
+        """Mock PUT requests that consume the streamed data and return its MD5."""
+        response = self.mock_client_response
+
+        class ConsumingHandler:
+            def __init__(self, *_, data=b"", **__):
+                self.data = data
+
+            async def __aenter__(self):
+                if not isinstance(self.data, (bytes, bytearray, str)):
+                    body = b"".join([bytes(chunk) async for chunk in self.data])
+                    response.headers = {"ETag": f'"{hashlib.md5(body).hexdigest()}"'}
+                return response
+
+            async def __aexit__(self, *_):
+                return
+
+        self.mock_client.put = unittest.mock.Mock(side_effect=ConsumingHandler)
+
     async def test_add_headers(self):
         """Test adding header for the upload file."""
 
@@ -105,6 +290,301 @@ class CryptTestClass(tests.common.mockups.APITestBase):
             ret.append(chunk)
         self.assertEqual(len(ret), 81885)
 
+    async def test_slice_segment_wakes_on_chunk(self):
+        """Test that the slicer consumes a chunk as soon as it's added."""
+        self.file_uploader.total_chunks = 2
+        self.file_uploader.total_segments = 1
+        ret = []
+
+        async def consume():
+            async for chunk in self.file_uploader.slice_segment(0):
+                ret.append(chunk)
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0)
+        await self.file_uploader.add_to_chunks(1, b"second")
+        await asyncio.sleep(0)
+        self.assertEqual(ret, [])
+        await self.file_uploader.add_to_chunks(0, b"first")
+        await asyncio.wait_for(task, 1)
+        self.assertEqual(ret, [b"first", b"second"])
+        self.assertEqual(self.file_uploader.chunk_waiters, {})
+
+    async def test_slice_segment_retries_chunk(self):
+        """Test that a missing chunk is requested again after a timeout."""
+        self.file_uploader.total_chunks = 1
+        self.file_uploader.total_segments = 1
+        self.file_uploader.retry_chunk = unittest.mock.AsyncMock()
+
+        async def consume():
+            return [chunk async for chunk in self.file_uploader.slice_segment(0)]
+
+        with unittest.mock.patch(
+            "swift_browser_ui.upload.cryptupload.CHUNK_RETRY_TIMEOUT", 0.01
+        ):
+            task = asyncio.create_task(consume())
+            await asyncio.sleep(0.05)
+            self.file_uploader.retry_chunk.assert_awaited_with(0)
+            await self.file_uploader.add_to_chunks(0, b"data")
+            self.assertEqual(await asyncio.wait_for(task, 1), [b"data"])
+        self.assertGreater(self.file_uploader.metrics.chunk_wait, 0)
+        self.assertEqual(self.file_uploader.metrics.latency.count, 1)
+
+    async def test_wait_for_chunk_aborted(self):
+        """Test that waiting for a chunk ends when the upload is aborted."""
+        task = asyncio.create_task(self.file_uploader.wait_for_chunk(0))
+        await asyncio.sleep(0)
+        self.file_uploader.aborted = True
+        self.file_uploader.wake_waiters()
+        self.assertFalse(await asyncio.wait_for(task, 1))
+
+    async def test_wait_for_cache(self):
+        """Test that waiting for cache space ends when a chunk is consumed."""
+        with unittest.mock.patch(
+            "swift_browser_ui.upload.cryptupload.CRYPTUPLOAD_Q_DEPTH", 1
+        ):
+            await self.file_uploader.add_to_chunks(0, b"first")
+            await self.file_uploader.add_to_chunks(1, b"second")
+            task = asyncio.create_task(self.file_uploader.wait_for_cache())
+            await asyncio.sleep(0)
+            self.assertFalse(task.done())
+            slicer = self.file_uploader.slice_segment(0)
+            await slicer.__anext__()
+            self.assertTrue(await asyncio.wait_for(task, 1))
+
+    async def test_budget_accounting(self):
+        """Test that cached chunks are accounted in the shared budget."""
+        self.budget.register(self.file_uploader)
+        await self.file_uploader.add_to_chunks(0, b"data")
+        await self.file_uploader.add_to_chunks(1, b"more data")
+        self.assertEqual(self.budget.used, 13)
+        self.assertEqual(self.budget.uploads[self.file_uploader], 13)
+
+        slicer = self.file_uploader.slice_segment(0)
+        await slicer.__anext__()
+        self.assertEqual(self.budget.used, 9)
+
+        self.mock_client.delete = unittest.mock.AsyncMock(
+            return_value=self.mock_client_response
+        )
+        await self.file_uploader.abort_upload()
+        self.assertEqual(self.budget.used, 0)
+        self.assertNotIn(self.file_uploader, self.budget.uploads)
+        self.assertEqual(self.file_uploader.chunk_cache, {})
+
+    async def test_budget_accounting_frames(self):
+        """Test that chunks received as views are accounted by their frame."""
+        self.budget.register(self.file_uploader)
+        _, chunks = unpack_chunk_frame(
+            pack_chunk_frame(1, [(0, b"x" * 100), (1, b"y" * 100)])
+        )
+        frame_size = len(chunks[0][1].obj)
+        for order, data in chunks:
+            await self.file_uploader.add_to_chunks(order, data)
+        await self.file_uploader.add_to_chunks(2, b"copied")
+        self.assertEqual(self.budget.used, frame_size + 6)
+
+        # The frame is in memory until its last chunk is consumed
+        slicer = self.file_uploader.slice_segment(0)
+        await slicer.__anext__()
+        self.assertEqual(self.budget.used, frame_size + 6)
+        await slicer.__anext__()
+        self.assertEqual(self.budget.used, 6)
+        self.assertEqual(self.file_uploader.frames, {})
+
+    async def test_wait_for_cache_budget(self):
+        """Test that the next batch waits for the upload's share of the budget."""
+        other = FileUpload(
+            self.mock_client,
+            self.mock_vault,
+            self.mock_session,
+            self.mock_socket,
+            "test-project",
+            "test-container",
+            "test-name",
+            "other-path",
+            100000,
+            budget=self.budget,
+        )
+        # Uploads get a share only once they are started
+        self.assertEqual(self.budget.fair_share(), 1024)
+        self.budget.register(self.file_uploader)
+        self.budget.register(other)
+        self.assertEqual(self.budget.fair_share(), 512)
+
+        await self.file_uploader.add_to_chunks(0, b"x" * 600)
+        self.assertFalse(self.budget.has_room(self.file_uploader))
+        self.assertTrue(self.budget.has_room(other))
+        self.assertTrue(await other.wait_for_cache())
+
+        task = asyncio.create_task(self.file_uploader.wait_for_cache())
+        await asyncio.sleep(0)
+        self.assertFalse(task.done())
+
+        # Finishing the other upload gives the whole budget back
+        self.budget.unregister(other)
+        self.assertTrue(await asyncio.wait_for(task, 1))
+        self.assertEqual(self.budget.get_stats()["largest"], 600)
+
+    async def test_chunk_spill_file(self):
+        """Test writing chunks to and reading chunks from a spill file."""
+        spill = ChunkSpillFile(65564 * 2)
+        self.assertTrue(spill.fits(b"first"))
+        self.assertFalse(spill.fits(b"x" * 65565))
+        spill.put(3, b"first")
+        spill.put(5, b"second")
+        self.assertIn(3, spill)
+        self.assertEqual(len(spill), 2)
+        self.assertTrue(spill.full())
+        self.assertFalse(spill.fits(b"third"))
+
+        chunk = spill.pop(5)
+        self.assertEqual(chunk, b"second")
+        self.assertNotIn(5, spill)
+        self.assertFalse(spill.full())
+
+        # Reusing the slot doesn't change a chunk still being sent
+        spill.put(7, b"overwritten")
+        self.assertEqual(chunk, b"second")
+        self.assertEqual(spill.pop(7), b"overwritten")
+
+        spill.close()
+        self.assertTrue(spill.file.closed)
+
+    async def test_add_to_chunks_spill(self):
+        """Test that chunks over the memory watermark are spilled to disk."""
+        self.file_uploader.total_segments = 1
+        self.file_uploader.total_chunks = 3
+        with (
+            unittest.mock.patch(
+                "swift_browser_ui.upload.cryptupload.CRYPTUPLOAD_SPILL_DIR",
+                tempfile.gettempdir(),
+            ),
+            unittest.mock.patch(
+                "swift_browser_ui.upload.cryptupload.CRYPTUPLOAD_SPILL_WATERMARK", 8
+            ),
+            unittest.mock.patch(
+                "swift_browser_ui.upload.cryptupload.CRYPTUPLOAD_SPILL_SIZE", 65564
+            ),
+        ):
+            await self.file_uploader.add_to_chunks(0, b"in memory")
+            await self.file_uploader.add_to_chunks(2, b"on disk")
+            self.assertEqual(self.file_uploader.chunk_cache, {0: b"in memory"})
+            self.assertIn(2, self.file_uploader.spill)
+            self.assertTrue(self.file_uploader.cache_full())
+            self.assertTrue(await self.file_uploader.wait_for_chunk(2))
+
+            # The spill file is full, so the chunk is kept in memory
+            await self.file_uploader.add_to_chunks(1, b"overflow")
+            self.assertEqual(self.file_uploader.chunk_cache[1], b"overflow")
+
+            ret = [bytes(chunk) async for chunk in self.file_uploader.slice_segment(0)]
+            self.assertEqual(ret, [b"in memory", b"overflow", b"on disk"])
+            self.assertFalse(self.file_uploader.cache_full())
+            self.assertEqual(self.file_uploader.cache_size, 0)
+
+            self.mock_client.delete = unittest.mock.AsyncMock(
+                return_value=self.mock_client_response
+            )
+            await self.file_uploader.abort_upload()
+            self.assertIsNone(self.file_uploader.spill)
+
+    async def test_get_segment_chunks(self):
+        """Test rounding the segment size to whole chunks."""
+        self.assertEqual(get_segment_chunks(), 81885)
+        self.assertEqual(get_segment_chunks(65564 * 16 + 100), 16)
+        self.assertEqual(get_segment_chunks(100), 1)
+        self.assertEqual(get_segment_chunks(10 * 1024**3), 81885)
+        with unittest.mock.patch(
+            "swift_browser_ui.upload.cryptupload.CRYPTUPLOAD_SEGMENT_SIZE", 65564 * 4
+        ):
+            self.assertEqual(get_segment_chunks(0), 4)
+
+    async def test_segment_size(self):
+        """Test slicing an upload into segments of the requested size."""
+        with (
+            unittest.mock.patch(
+                "swift_browser_ui.upload.cryptupload.CRYPTUPLOAD_SEGMENT_CONCURRENCY", 3
+            ),
+            unittest.mock.patch(
+                "swift_browser_ui.upload.cryptupload.CRYPTUPLOAD_DIRECT_MAX", 0
+            ),
+        ):
+            upload = FileUpload(
+                self.mock_client,
+                self.mock_vault,
+                self.mock_session,
+                self.mock_socket,
+                "test-project",
+                "test-container",
+                "test-name",
+                "test-path",
+                65564 * 9 + 10,
+                budget=self.budget,
+                segment_size=65564 * 4,
+            )
+        self.assertEqual(upload.segment_chunks, 4)
+        self.assertEqual(upload.total_segments, 3)
+        self.assertEqual(upload.total_chunks, 10)
+        # Two whole segments can be buffered ahead of the draining one
+        self.assertEqual(upload.get_window(), 8 + 160)
+
+        for i in range(0, 10):
+            upload.chunk_cache[i] = bytes([i])
+        segments = [
+            [chunk async for chunk in upload.slice_segment(segment)]
+            for segment in range(0, 3)
+        ]
+        self.assertEqual(
+            segments,
+            [
+                [b"\x00", b"\x01", b"\x02", b"\x03"],
+                [b"\x04", b"\x05", b"\x06", b"\x07"],
+                [b"\x08", b"\x09"],
+            ],
+        )
+
+    async def test_segment_size_slo(self):
+        """Test keeping static manifests within the segment limit of Swift."""
+
+        def upload(total):
+            return FileUpload(
+                self.mock_client,
+                self.mock_vault,
+                self.mock_session,
+                self.mock_socket,
+                "test-project",
+                "test-container",
+                "test-name",
+                "test-path",
+                total,
+                budget=self.budget,
+                segment_size=65564 * 4,
+            )
+
+        with (
+            unittest.mock.patch("swift_browser_ui.upload.common.USE_SLO", True),
+            unittest.mock.patch("swift_browser_ui.upload.common.SLO_MAX_SEGMENTS", 2),
+            unittest.mock.patch(
+                "swift_browser_ui.upload.cryptupload.CRYPTUPLOAD_DIRECT_MAX", 0
+            ),
+        ):
+            at_limit = upload(65564 * 8)
+            over_limit = upload(65564 * 8 + 1)
+            with unittest.mock.patch(
+                "swift_browser_ui.upload.cryptupload.SEGMENT_CHUNKS", 4
+            ):
+                too_large = upload(65564 * 8 + 1)
+
+        self.assertTrue(at_limit.slo)
+        self.assertEqual((at_limit.segment_chunks, at_limit.total_segments), (4, 2))
+        # The segments are made larger to fit in the limit
+        self.assertTrue(over_limit.slo)
+        self.assertEqual((over_limit.segment_chunks, over_limit.total_segments), (5, 2))
+        # Segments that can't grow are listed in a dynamic manifest instead
+        self.assertFalse(too_large.slo)
+        self.assertEqual((too_large.segment_chunks, too_large.total_segments), (4, 3))
+
     async def test_upload_segment(self):
         """Test uploading segment with given ordering number."""
         self.file_uploader.total_segments = 2
@@ -118,13 +598,376 @@ class CryptTestClass(tests.common.mockups.APITestBase):
         for i in range(0, 81885 * 2):
             self.file_uploader.chunk_cache[i] = b""
 
-        resp = await self.file_uploader.upload_segment(0)
+        # The file is finished only once every segment is stored
+        resp = await self.file_uploader.upload_segment(1)
         self.mock_socket.send_bytes.assert_not_awaited()
+        self.assertFalse(self.file_uploader.finished)
         self.assertEqual(resp, 201)
 
-        resp = await self.file_uploader.upload_segment(1)
+        resp = await self.file_uploader.upload_segment(0)
         self.mock_socket.send_bytes.assert_awaited_once()
+        self.assertEqual(
+            msgpack.unpackb(self.mock_socket.send_bytes.call_args.args[0])["command"],
+            "success",
+        )
+        self.assertTrue(self.file_uploader.finished)
+        self.assertNotIn(self.file_uploader, self.budget.uploads)
+        self.assertEqual(resp, 201)
+
+    async def test_direct_upload(self):
+        """Test uploading a small file as a single object."""
+        upload = FileUpload(
+            self.mock_client,
+            self.mock_vault,
+            self.mock_session,
+            self.mock_socket,
+            "test-project",
+            "test-container",
+            "test-name",
+            "test-path",
+            65564 * 2 + 10,
+            budget=self.budget,
+        )
+        self.assertTrue(upload.direct)
+        self.assertEqual(upload.total_segments, 1)
+        self.assertEqual(upload.segment_chunks, 3)
+
+        self.mock_client_response.status = 201
+        self.mock_client.put = unittest.mock.Mock(
+            return_value=self.MockHandler(
+                self.mock_client_response,
+            )
+        )
+        for i in range(0, 3):
+            await upload.add_to_chunks(i, bytes([i]) * 2)
+
+        resp = await upload.upload_segment(0)
         self.assertEqual(resp, 201)
+        self.mock_client.put.assert_called_once()
+        args, kwargs = self.mock_client.put.call_args
+        self.assertEqual(
+            args[0],
+            "https://test-endpoint-0/v1/AUTH_test-project/test-container/test-path",
+        )
+        self.assertEqual(kwargs["data"], b"\x00\x00\x01\x01\x02\x02")
+        self.assertNotIn("Content-Type", kwargs["headers"])
+        self.assertEqual(
+            kwargs["headers"]["ETag"],
+            hashlib.md5(b"\x00\x00\x01\x01\x02\x02").hexdigest(),
+        )
+        self.mock_socket.send_bytes.assert_awaited_once()
+
+        # No manifest is needed for the object
+        upload.tasks = [asyncio.create_task(asyncio.sleep(0, 201))]
+        resp = await upload.finish_upload()
+        self.assertEqual(resp.status, 201)
+        self.mock_client.put.assert_called_once()
+
+    async def test_direct_upload_container(self):
+        """Test that a small file doesn't need a segments container."""
+        upload = FileUpload(
+            self.mock_client,
+            self.mock_vault,
+            self.mock_session,
+            self.mock_socket,
+            "test-project",
+            "test-container",
+            "test-name",
+            "test-path",
+            100,
+            budget=self.budget,
+        )
+        self.mock_client_response.status = 204
+        self.mock_client.head = unittest.mock.Mock(
+            return_value=self.MockHandler(
+                self.mock_client_response,
+            )
+        )
+        self.assertTrue(await upload.a_create_container())
+        self.mock_client.head.assert_called_once()
+
+        self.mock_client.head.reset_mock()
+        self.assertTrue(await self.file_uploader.a_create_container())
+        self.assertEqual(self.mock_client.head.call_count, 2)
+
+    async def test_container_cache(self):
+        """Test that uploads of a session check a container only once."""
+        containers = ContainerCache(60)
+        uploads = [
+            FileUpload(
+                self.mock_client,
+                self.mock_vault,
+                self.mock_session,
+                self.mock_socket,
+                "test-project",
+                "test-container",
+                "test-name",
+                f"test-path-{i}",
+                100,
+                budget=self.budget,
+                containers=containers,
+            )
+            for i in range(0, 10)
+        ]
+        self.mock_client_response.status = 204
+        self.mock_client.head = unittest.mock.Mock(
+            return_value=self.MockHandler(self.mock_client_response)
+        )
+
+        results = await asyncio.gather(
+            *[upload.a_create_container() for upload in uploads]
+        )
+        self.assertEqual(results, [True] * 10)
+        self.mock_client.head.assert_called_once()
+        self.assertTrue(await uploads[0].a_create_container())
+        self.mock_client.head.assert_called_once()
+
+        # Expired and removed containers are checked again
+        containers.expiries = {
+            url: expiry - 60 for url, expiry in containers.expiries.items()
+        }
+        self.assertTrue(await uploads[0].a_create_container())
+        self.assertEqual(self.mock_client.head.call_count, 2)
+        containers.invalidate(f"{uploads[0].host}/test-container")
+        self.assertTrue(await uploads[0].a_create_container())
+        self.assertEqual(self.mock_client.head.call_count, 3)
+
+    async def test_container_cache_failure(self):
+        """Test that a failed container creation isn't remembered."""
+        containers = ContainerCache(60)
+        create = unittest.mock.AsyncMock(side_effect=[False, True])
+        self.assertFalse(await containers.a_ensure("test-url", create))
+        self.assertTrue(await containers.a_ensure("test-url", create))
+        self.assertTrue(await containers.a_ensure("test-url", create))
+        self.assertEqual(create.await_count, 2)
+        self.assertEqual(containers.checks, {})
+
+    async def test_finish_upload_slo(self):
+        """Test finalizing the upload with a static large object manifest."""
+        with (
+            unittest.mock.patch("swift_browser_ui.upload.common.USE_SLO", True),
+            unittest.mock.patch(
+                "swift_browser_ui.upload.cryptupload.CRYPTUPLOAD_DIRECT_MAX", 0
+            ),
+        ):
+            upload = FileUpload(
+                self.mock_client,
+                self.mock_vault,
+                self.mock_session,
+                self.mock_socket,
+                "test-project",
+                "test-container",
+                "test-name",
+                "test-path",
+                65564 * 3,
+                budget=self.budget,
+                segment_size=65564 * 2,
+            )
+        self.mock_client_response.status = 201
+
+        self.mock_consuming_put()
+        for i in range(0, 3):
+            await upload.add_to_chunks(i, b"x" * (i + 1))
+        upload.tasks = [
+            asyncio.create_task(upload.upload_segment(i)) for i in range(0, 2)
+        ]
+
+        resp = await upload.finish_upload()
+        self.assertEqual(resp.status, 201)
+        args, kwargs = self.mock_client.put.call_args
+        self.assertEqual(
+            args[0],
+            "https://test-endpoint-0/v1/AUTH_test-project/test-container/test-path",
+        )
+        self.assertEqual(kwargs["params"], {"multipart-manifest": "put"})
+        prefix = f"/test-container_segments/test-path/{upload.segment_id}"
+        self.assertEqual(
+            json.loads(kwargs["data"]),
+            [
+                {
+                    "path": f"{prefix}/00000001",
+                    "etag": hashlib.md5(b"x" + b"xx").hexdigest(),
+                    "size_bytes": 3,
+                },
+                {
+                    "path": f"{prefix}/00000002",
+                    "etag": hashlib.md5(b"xxx").hexdigest(),
+                    "size_bytes": 3,
+                },
+            ],
+        )
+
+    def mock_failing_put(self, results):
+        """Mock PUT requests answering with the given statuses and ETags."""
+        bodies = []
+
+        class FailingHandler:
+            def __init__(self, *_, data=b"", **__):
+                self.data = data
+
+            async def __aenter__(self):
+                body = b"".join([bytes(chunk) async for chunk in self.data])
+                bodies.append(body)
+                status, etag = results.pop(0)
+                return unittest.mock.Mock(
+                    status=status,
+                    headers={"ETag": etag or hashlib.md5(body).hexdigest()},
+                )
+
+            async def __aexit__(self, *_):
+                return
+
+        self.mock_client.put = unittest.mock.Mock(side_effect=FailingHandler)
+        return bodies
+
+    def small_segment_upload(self):
+        """Create an upload with segments small enough for retrying."""
+        with unittest.mock.patch(
+            "swift_browser_ui.upload.cryptupload.CRYPTUPLOAD_DIRECT_MAX", 0
+        ):
+            return FileUpload(
+                self.mock_client,
+                self.mock_vault,
+                self.mock_session,
+                self.mock_socket,
+                "test-project",
+                "test-container",
+                "test-name",
+                "test-path",
+                65564 * 3,
+                budget=self.budget,
+                segment_size=65564 * 2,
+            )
+
+    async def test_upload_segment_retry(self):
+        """Test uploading a corrupted segment again from the kept chunks."""
+        upload = self.small_segment_upload()
+        bodies = self.mock_failing_put([(201, "corrupted"), (503, None), (201, None)])
+        for i in range(0, 2):
+            await upload.add_to_chunks(i, bytes([i]) * 10)
+
+        self.assertEqual(await upload.upload_segment(0), 201)
+        self.assertEqual(bodies, [b"\x00" * 10 + b"\x01" * 10] * 3)
+        self.assertEqual(upload.done_segments, {0})
+        self.assertEqual(upload.segment_buffers, {})
+        self.assertEqual(upload.kept_size, 0)
+
+    async def test_upload_segment_retry_budget(self):
+        """Test accounting the kept chunks in the budget, up to the upload's share."""
+        upload = self.small_segment_upload()
+        self.budget.register(upload)
+        upload.segment_buffers[0] = []
+        await upload.add_to_chunks(0, b"x" * 1000)
+        await upload.add_to_chunks(1, b"y" * 10)
+
+        slicer = upload.slice_segment(0)
+        await slicer.__anext__()
+        self.assertEqual(upload.kept_size, 1000)
+        self.assertEqual(self.budget.used, 1010)
+
+        # The next chunk doesn't fit, so the segment is no longer kept
+        self.budget.register(self.file_uploader)
+        await slicer.__anext__()
+        self.assertEqual(upload.segment_buffers, {})
+        self.assertEqual(upload.kept_size, 0)
+        self.assertEqual(self.budget.used, 0)
+        self.assertFalse(upload.can_retry(0, 503))
+
+        # A segment that isn't kept fails on the first error
+        upload = self.small_segment_upload()
+        self.budget.register(upload)
+        self.mock_failing_put([(503, None)])
+        await upload.add_to_chunks(0, b"x" * 1000)
+        await upload.add_to_chunks(1, b"y" * 10)
+        self.assertEqual(await upload.upload_segment(0), 503)
+        self.assertEqual(self.mock_client.put.call_count, 1)
+        self.assertEqual(self.budget.uploads[upload], 0)
+
+    async def test_upload_metrics(self):
+        """Test counting the bytes and retries of an upload and its session."""
+        session_metrics = UploadMetrics(self.metrics)
+        upload = self.small_segment_upload()
+        upload.metrics.parent = session_metrics
+        self.mock_failing_put([(503, None), (201, None)])
+        for i in range(0, 2):
+            await upload.add_to_chunks(i, bytes([i]) * 10)
+
+        self.assertEqual(await upload.upload_segment(0), 201)
+        for metrics in (upload.metrics, session_metrics, self.metrics):
+            stats = metrics.get_stats()
+            self.assertEqual(stats["bytes_received"], 20)
+            self.assertEqual(stats["bytes_acknowledged"], 20)
+            self.assertEqual(stats["segment_retries"], 1)
+            self.assertEqual(stats["chunk_retries"], 0)
+            # Chunks replayed for the retry were already counted
+            self.assertEqual(stats["latency"]["count"], 2)
+        self.assertEqual(upload.chunk_arrivals, {})
+        self.assertNotIn("latency", upload.get_stats())
+        self.assertEqual(upload.get_stats()["bytes_acknowledged"], 20)
+
+    def test_latency_histogram(self):
+        """Test counting latencies in cumulative buckets."""
+        histogram = LatencyHistogram()
+        for latency in (0.0005, 0.001, 0.3, 120.0):
+            histogram.observe(latency)
+        stats = histogram.get_stats()
+        self.assertEqual(stats["buckets"]["0.001"], 2)
+        self.assertEqual(stats["buckets"]["0.5"], 3)
+        self.assertEqual(stats["buckets"]["60.0"], 3)
+        self.assertEqual(stats["buckets"]["+Inf"], 4)
+        self.assertEqual(stats["count"], 4)
+        self.assertAlmostEqual(stats["sum"], 120.3015)
+
+    async def test_push_metrics(self):
+        """Test pushing the session metrics to the client when enabled."""
+        await self.upload_session.push_metrics(self.mock_socket)
+        self.mock_socket.send_bytes.assert_not_awaited()
+
+        self.upload_session.metrics.add_received(10)
+        with unittest.mock.patch(
+            "swift_browser_ui.upload.cryptupload.CRYPTUPLOAD_METRICS_INTERVAL", 0.01
+        ):
+            task = asyncio.create_task(self.upload_session.push_metrics(self.mock_socket))
+            while not self.mock_socket.send_bytes.await_count:
+                await asyncio.sleep(0.01)
+            self.mock_socket.closed = True
+            await asyncio.wait_for(task, 1)
+        msg = msgpack.unpackb(self.mock_socket.send_bytes.call_args.args[0])
+        self.assertEqual(msg["command"], "metrics")
+        self.assertEqual(msg["bytes_received"], 10)
+        self.assertEqual(msg["uploads"][0]["object"], "test-path")
+        self.assertNotIn("latency", msg)
+
+    async def test_upload_segment_failed(self):
+        """Test that a segment failing every retry fails the file."""
+        upload = self.small_segment_upload()
+        self.mock_failing_put([(503, None)] * 6)
+        for i in range(0, 3):
+            await upload.add_to_chunks(i, b"x")
+        upload.tasks = [
+            asyncio.create_task(upload.upload_segment(i)) for i in range(0, 2)
+        ]
+
+        resp = await upload.finish_upload()
+        self.assertEqual(resp.status, 503)
+        # No manifest is written for the segments
+        self.assertEqual(self.mock_client.put.call_count, 6)
+        # The client is told once that the file failed, instead of finished
+        self.mock_socket.send_bytes.assert_awaited_once()
+        msg = msgpack.unpackb(self.mock_socket.send_bytes.call_args.args[0])
+        self.assertEqual(msg["command"], "abort")
+        self.assertTrue(upload.failed)
+        self.assertFalse(upload.finished)
+
+        # Segments too large to keep are not retried
+        with unittest.mock.patch(
+            "swift_browser_ui.upload.cryptupload.CRYPTUPLOAD_RETRY_BUFFER", 0
+        ):
+            upload = self.small_segment_upload()
+        self.mock_failing_put([(503, None)])
+        await upload.add_to_chunks(0, b"x")
+        await upload.add_to_chunks(1, b"x")
+        self.assertEqual(await upload.upload_segment(0), 503)
 
     async def test_finish_upload(self):
         """Test finalizing the upload."""
@@ -137,6 +980,168 @@ class CryptTestClass(tests.common.mockups.APITestBase):
         resp = await self.file_uploader.finish_upload()
         self.assertEqual(resp.status, 201)
 
+    async def test_suspend_resume_upload(self):
+        """Test keeping finished segments when an upload is resumed."""
+        with unittest.mock.patch(
+            "swift_browser_ui.upload.cryptupload.CRYPTUPLOAD_DIRECT_MAX", 0
+        ):
+            upload = FileUpload(
+                self.mock_client,
+                self.mock_vault,
+                self.mock_session,
+                self.mock_socket,
+                "test-project",
+                "test-container",
+                "test-name",
+                "test-path",
+                65564 * 6,
+                budget=self.budget,
+                segment_size=65564 * 2,
+            )
+        self.mock_client_response.status = 201
+        self.mock_consuming_put()
+        upload.tasks = [
+            asyncio.create_task(upload.upload_segment(i)) for i in range(0, 3)
+        ]
+        for i in range(0, 3):
+            await upload.add_to_chunks(i, bytes([i]))
+        while 0 not in upload.done_segments:
+            await asyncio.sleep(0)
+
+        await upload.suspend_upload()
+        self.assertTrue(upload.suspended)
+        self.assertEqual(len(upload.tasks), 1)
+        self.assertEqual(upload.get_resume_chunk(), 2)
+        self.assertEqual(upload.done_chunks, {0, 1})
+        self.assertEqual(upload.chunk_cache, {})
+        self.assertNotIn(upload, self.budget.uploads)
+        state = upload.get_resume_state()
+        self.assertEqual(state["segments"], [0])
+        self.assertEqual(state["chunk"], 2)
+        self.assertEqual(state["segment_id"], upload.segment_id)
+
+        mock_socket = unittest.mock.AsyncMock(aiohttp.web.WebSocketResponse)
+        mock_socket.closed = False
+        # A resumed upload waits for its turn like a new one
+        other = unittest.mock.Mock()
+        upload.scheduler.active.add(other)
+        await upload.resume_upload(mock_socket)
+        self.assertFalse(upload.suspended)
+        self.assertIs(upload.socket, mock_socket)
+        self.assertEqual(len(upload.tasks), 1)
+        self.assertNotIn(upload, self.budget.uploads)
+        mock_socket.send_bytes.assert_not_awaited()
+
+        await upload.scheduler.a_release(other)
+        self.assertIn(upload, upload.scheduler.active)
+        self.assertIn(upload, self.budget.uploads)
+        self.assertEqual(len(upload.tasks), 3)
+        for i in range(0, 6):
+            await upload.add_to_chunks(i, bytes([i]))
+        await asyncio.gather(*upload.tasks)
+        self.assertEqual(upload.done_segments, {0, 1, 2})
+        self.assertEqual(upload.get_resume_chunk(), 6)
+        # The first segment was only uploaded once
+        self.assertEqual(self.mock_client.put.call_count, 4)
+        self.assertEqual(
+            [
+                msgpack.unpackb(call.args[0])["command"]
+                for call in mock_socket.send_bytes.call_args_list
+            ],
+            ["start_upload", "success"],
+        )
+
+    async def test_resume_finished_upload(self):
+        """Test finishing a resumed upload that had all its segments stored."""
+        self.file_uploader.done_segments = {0}
+        await self.file_uploader.resume_upload(self.mock_socket)
+        self.assertEqual(self.file_uploader.tasks, [])
+        self.assertNotIn(self.file_uploader, self.budget.uploads)
+        self.assertNotIn(self.file_uploader, self.file_uploader.scheduler.active)
+        self.assertEqual(
+            msgpack.unpackb(self.mock_socket.send_bytes.call_args.args[0])["command"],
+            "success",
+        )
+
+    async def test_handle_resume_upload(self):
+        """Test resuming an upload from a reconnected websocket."""
+        await self.upload_session.handle_resume_upload(
+            {"container": "test-container", "object": "test-other"}
+        )
+        self.assertEqual(
+            msgpack.unpackb(self.mock_socket.send_bytes.call_args.args[0])["command"],
+            "abort",
+        )
+
+        self.file_uploader.suspended = True
+        self.file_uploader.resume_upload = unittest.mock.AsyncMock()
+        await self.upload_session.handle_resume_upload(self.msg)
+        self.file_uploader.resume_upload.assert_awaited_once_with(self.mock_socket)
+        msg = msgpack.unpackb(self.mock_socket.send_bytes.call_args.args[0])
+        self.assertEqual(msg["command"], "resume")
+        self.assertEqual(msg["segment_id"], self.file_uploader.segment_id)
+        self.assertEqual(msg["chunk"], 0)
+
+    async def test_handle_disconnect(self):
+        """Test suspending uploads on disconnect and expiring them."""
+        self.upload_session.ws = self.mock_socket
+        self.upload_session.uploads = {
+            "test-container": {"test-path": self.file_uploader}
+        }
+        self.file_uploader.abort_upload = unittest.mock.AsyncMock()
+
+        await self.upload_session.handle_disconnect(unittest.mock.Mock())
+        self.assertFalse(self.file_uploader.suspended)
+
+        with unittest.mock.patch(
+            "swift_browser_ui.upload.cryptupload.CRYPTUPLOAD_RESUME_TIMEOUT", 0
+        ):
+            await self.upload_session.handle_disconnect(self.mock_socket)
+            self.assertTrue(self.file_uploader.suspended)
+            await asyncio.gather(*self.upload_session.expiries)
+        self.file_uploader.abort_upload.assert_awaited_once()
+        self.assertEqual(self.upload_session.uploads["test-container"], {})
+
+    async def test_handle_disconnect_abort(self):
+        """Test aborting uploads on disconnect when they won't be resumed."""
+        self.upload_session.ws = self.mock_socket
+        self.upload_session.uploads = {
+            "test-container": {"test-path": self.file_uploader}
+        }
+        self.file_uploader.abort_upload = unittest.mock.AsyncMock()
+
+        await self.upload_session.handle_disconnect(self.mock_socket, resume=False)
+
+        self.file_uploader.abort_upload.assert_awaited_once()
+        self.assertFalse(self.file_uploader.suspended)
+        self.assertEqual(self.upload_session.uploads, {})
+        self.assertFalse(self.upload_session.expiries)
+
+    async def test_upload_session_stats(self):
+        """Test reporting idleness and buffered bytes of the session."""
+        self.upload_session.uploads = {
+            "test-container": {"test-path": self.file_uploader}
+        }
+        self.file_uploader.cache_size = 100
+        self.file_uploader.spill = ChunkSpillFile(CHUNK_SIZE * 2, tempfile.gettempdir())
+        self.file_uploader.spill.put(1, b"x" * 10)
+
+        self.assertEqual(self.file_uploader.get_buffered_size(), 110)
+        self.assertEqual(self.upload_session.get_upload_count(), 1)
+        stats = self.upload_session.get_stats()
+        self.assertEqual(stats["buffered"], 110)
+        self.assertEqual(stats["uploads"][0]["object"], "test-path")
+        self.assertEqual(stats["uploads"][0]["cached"], 100)
+        self.assertEqual(stats["metrics"]["bytes_received"], 0)
+        self.file_uploader.close_spill()
+
+        self.upload_session.ws = self.mock_socket
+        self.mock_socket.closed = False
+        self.assertFalse(self.upload_session.is_idle(0))
+        self.mock_socket.closed = True
+        self.assertTrue(self.upload_session.is_idle(0))
+        self.assertFalse(self.upload_session.is_idle(3600))
+
     async def test_abort_upload(self):
         """Test aborting the upload."""
         self.mock_client_response.status = 204
@@ -146,6 +1151,79 @@ class CryptTestClass(tests.common.mockups.APITestBase):
         await self.file_uploader.abort_upload()
         self.mock_socket.send_bytes.assert_awaited_once()
 
+    def bulk_response(self, status, text):
+        """Create a response to a bulk delete request."""
+        return self.MockHandler(
+            unittest.mock.Mock(
+                status=status, text=unittest.mock.AsyncMock(return_value=text)
+            )
+        )
+
+    async def test_abort_upload_bulk_delete(self):
+        """Test deleting only the started segments in bulk."""
+        self.file_uploader.started_segments = {0, 2}
+        self.mock_client.post = unittest.mock.Mock(
+            return_value=self.bulk_response(
+                200,
+                json.dumps({"Number Deleted": 2, "Number Not Found": 0, "Errors": []}),
+            )
+        )
+        self.mock_client.delete = unittest.mock.Mock()
+
+        await self.file_uploader.abort_upload()
+
+        self.mock_client.post.assert_called_once()
+        kwargs = self.mock_client.post.call_args.kwargs
+        self.assertEqual(kwargs["params"], {"bulk-delete": "true"})
+        segment_id = self.file_uploader.segment_id
+        self.assertEqual(
+            kwargs["data"].decode().split("\n"),
+            [
+                f"/test-container_segments/test-path/{segment_id}/00000001",
+                f"/test-container_segments/test-path/{segment_id}/00000003",
+            ],
+        )
+        self.mock_client.delete.assert_not_called()
+
+    async def test_abort_upload_delete_fallback(self):
+        """Test deleting segments one by one without bulk delete."""
+        self.file_uploader.started_segments = {0, 1, 2}
+        self.mock_client_response.status = 204
+        self.mock_client.post = unittest.mock.Mock(
+            return_value=self.bulk_response(204, "")
+        )
+        self.mock_client.delete = unittest.mock.Mock(
+            return_value=self.MockHandler(self.mock_client_response)
+        )
+
+        with unittest.mock.patch(
+            "swift_browser_ui.upload.cryptupload.CRYPTUPLOAD_BULK_DELETE_SIZE", 2
+        ):
+            await self.file_uploader.abort_upload()
+
+        self.mock_client.post.assert_called_once()
+        self.assertEqual(self.mock_client.delete.call_count, 3)
+        segment_id = self.file_uploader.segment_id
+        self.assertTrue(
+            self.mock_client.delete.call_args_list[2]
+            .args[0]
+            .endswith(f"/test-container_segments/test-path/{segment_id}/00000003")
+        )
+
+    async def test_delete_segments_batches(self):
+        """Test splitting bulk deletes into batches."""
+        self.mock_client.post = unittest.mock.Mock(
+            side_effect=[
+                self.bulk_response(200, json.dumps({"Number Deleted": 2})),
+                self.bulk_response(200, json.dumps({"Number Deleted": 1})),
+            ]
+        )
+        with unittest.mock.patch(
+            "swift_browser_ui.upload.cryptupload.CRYPTUPLOAD_BULK_DELETE_SIZE", 2
+        ):
+            await self.file_uploader.a_delete_segments([0, 1, 2])
+        self.assertEqual(self.mock_client.post.call_count, 2)
+
     async def test_handle_begin_upload(self):
         """Test upload start handling."""
         self.file_uploader = unittest.mock.AsyncMock()
@@ -171,6 +1249,20 @@ class CryptTestClass(tests.common.mockups.APITestBase):
             self.upload_session.uploads = {}
             await self.upload_session.handle_begin_upload(self.msg)
             add_header_mock.assert_awaited_once_with(b"")
+            self.assertEqual(FileUploadMock.call_args.args[-4], 0)
+            self.assertIs(
+                FileUploadMock.call_args.args[-3], self.upload_session.containers
+            )
+            self.assertIs(
+                FileUploadMock.call_args.args[-2], self.upload_session.scheduler
+            )
+            self.assertIs(FileUploadMock.call_args.args[-1], self.upload_session.metrics)
+
+            self.upload_session.uploads = {}
+            await self.upload_session.handle_begin_upload(
+                dict(self.msg, segment_size=1048576)
+            )
+            self.assertEqual(FileUploadMock.call_args.args[-4], 1048576)
 
     async def test_handle_upload_chunk(self):
         """Test addition of a new chunk."""
@@ -180,6 +1272,62 @@ class CryptTestClass(tests.common.mockups.APITestBase):
             {1: b""},
         )
 
+    async def test_handle_upload_frame(self):
+        """Test addition of chunks from a v2 chunk frame."""
+        self.mock_socket.ws_protocol = UPLOAD_PROTOCOL_V2
+        self.assertTrue(self.upload_session.uses_chunk_frames())
+        self.file_uploader.path = "test-object"
+        self.file_uploader.handle = 3
+        self.upload_session.handles[3] = self.file_uploader
+
+        await self.upload_session.handle_upload_frame(
+            pack_chunk_frame(3, [(0, b"first"), (1, b"second")])
+        )
+        self.assertEqual(self.file_uploader.chunk_cache, {0: b"first", 1: b"second"})
+        self.mock_socket.send_bytes.assert_awaited_once_with(
+            msgpack.packb(
+                {
+                    "command": "next",
+                    "container": "test-container",
+                    "object": "test-object",
+                }
+            )
+        )
+
+        await self.upload_session.handle_finish_upload(self.msg)
+        self.assertEqual(self.upload_session.handles, {})
+
+        # Frames for an unknown upload are dropped
+        self.mock_socket.send_bytes.reset_mock()
+        await self.upload_session.handle_upload_frame(pack_chunk_frame(3, [(2, b"x")]))
+        self.mock_socket.send_bytes.assert_not_awaited()
+        self.assertNotIn(2, self.file_uploader.chunk_cache)
+
+    async def test_handle_begin_upload_handle(self):
+        """Test that uploads get a handle when using v2 chunk frames."""
+        self.mock_socket.ws_protocol = UPLOAD_PROTOCOL_V2
+        self.upload_session.uploads = {}
+        FileUploadMock = unittest.mock.MagicMock()
+        FileUploadMock.return_value.add_header = unittest.mock.AsyncMock()
+        with unittest.mock.patch(
+            "swift_browser_ui.upload.cryptupload.FileUpload", FileUploadMock
+        ):
+            await self.upload_session.handle_begin_upload(self.msg)
+        self.assertEqual(FileUploadMock.return_value.handle, 1)
+        self.assertIs(self.upload_session.handles[1], FileUploadMock.return_value)
+
+    async def test_start_upload_handle(self):
+        """Test that the upload handle is sent to the client."""
+        await self.file_uploader.start_upload()
+        self.assertNotIn(
+            "handle", msgpack.unpackb(self.mock_socket.send_bytes.await_args.args[0])
+        )
+        self.file_uploader.handle = 2
+        await self.file_uploader.start_upload()
+        self.assertEqual(
+            msgpack.unpackb(self.mock_socket.send_bytes.await_args.args[0])["handle"], 2
+        )
+
     async def test_handle_finish_upload(self):
         """Test handling the end of upload."""
         await self.upload_session.handle_finish_upload(self.msg)
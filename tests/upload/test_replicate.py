@@ -0,0 +1,603 @@
+"""Unit tests for swift_browser_ui.upload.replicate module."""
+
+import asyncio
+import json
+import types
+import unittest
+import unittest.mock
+
+import aiohttp.web
+
+from swift_browser_ui.common.vault_client import VaultClient
+from swift_browser_ui.upload.replicate import EMPTY_ETAG, ObjectReplicationProxy
+
+import tests.common.mockups
+
+
+class ReplicateTestClass(tests.common.mockups.APITestBase):
+    """Test class for swift_browser_ui.upload.replicate functions."""
+
+    def setUp(self):
+        """Set up mocks."""
+        super().setUp()
+        self.mock_vault = unittest.mock.AsyncMock(VaultClient)
+        self.replicator = ObjectReplicationProxy(
+            {
+                "endpoint": "https://test-endpoint-0/v1/AUTH_test-project",
+                "token": "test-token",
+            },
+            self.mock_client,
+            self.mock_vault,
+            "test-project",
+            "test-container",
+            "test-source-project",
+            "test-source-container",
+        )
+        # Objects are streamed unless a test copies them inside Swift
+        self.replicator.server_copy = False
+        self.put_status = 201
+        self.mock_client.put = unittest.mock.Mock(side_effect=self.put_response)
+
+    def response(self, status=200, headers=None, text=""):
+        """Create a mock Swift response handler."""
+        return self.MockHandler(
+            types.SimpleNamespace(
+                status=status,
+                headers=headers if headers is not None else {},
+                text=unittest.mock.AsyncMock(return_value=text),
+                content=self.mock_client_response.content,
+            )
+        )
+
+    def put_response(self, *_, **__):
+        """Create a response to a PUT."""
+        return self.response(self.put_status)
+
+    def segment_response(self, length, etag):
+        """Create a response to a segment GET."""
+        return self.response(
+            headers={
+                "Content-Length": str(length),
+                "Content-Type": "application/swiftclient-segment",
+                "ETag": etag,
+            }
+        )
+
+    async def test_copy_segment(self):
+        """Test copying a segment and returning its manifest entry."""
+        self.mock_client.get = unittest.mock.Mock(
+            return_value=self.segment_response(10, '"test-etag"')
+        )
+        entry = await self.replicator.a_copy_segment(
+            "test-source-container_segments", "test-object/1/00000001"
+        )
+        self.assertEqual(
+            entry,
+            {
+                "path": "/test-container_segments/test-object/1/00000001",
+                "etag": "test-etag",
+                "size_bytes": 10,
+            },
+        )
+        self.mock_client.put.assert_called_once()
+        self.assertEqual(
+            self.mock_client.put.call_args.args[0],
+            "https://test-endpoint-0/v1/AUTH_test-project/"
+            "test-container_segments/test-object/1/00000001",
+        )
+
+    async def test_copy_object_slo(self):
+        """Test copying a static large object without listing segments."""
+        manifest = [
+            {"name": "/test-source-container_segments/test-object/1/00000001"},
+            {"name": "/test-source-container_segments/test-object/1/00000002"},
+        ]
+        self.mock_client.head = unittest.mock.Mock(
+            return_value=self.response(
+                headers={
+                    "Content-Length": "15",
+                    "X-Static-Large-Object": "True",
+                }
+            )
+        )
+        self.mock_client.get = unittest.mock.Mock(
+            side_effect=[
+                self.response(text=json.dumps(manifest)),
+                self.segment_response(10, "test-etag-1"),
+                self.segment_response(5, "test-etag-2"),
+            ]
+        )
+
+        await self.replicator.a_copy_object("test-object")
+
+        self.assertEqual(
+            self.mock_client.get.call_args_list[0].kwargs["params"],
+            {"multipart-manifest": "get"},
+        )
+        self.assertEqual(self.mock_client.put.call_count, 3)
+        args, kwargs = self.mock_client.put.call_args
+        self.assertEqual(
+            args[0],
+            "https://test-endpoint-0/v1/AUTH_test-project/test-container/test-object",
+        )
+        self.assertEqual(kwargs["params"], {"multipart-manifest": "put"})
+        self.assertEqual(
+            json.loads(kwargs["data"]),
+            [
+                {
+                    "path": "/test-container_segments/test-object/1/00000001",
+                    "etag": "test-etag-1",
+                    "size_bytes": 10,
+                },
+                {
+                    "path": "/test-container_segments/test-object/1/00000002",
+                    "etag": "test-etag-2",
+                    "size_bytes": 5,
+                },
+            ],
+        )
+
+    async def test_copy_object_dlo(self):
+        """Test copying a dynamic large object with and without static manifests."""
+        # Static manifests are used only up to the segment limit of Swift
+        for use_slo, max_segments, static in (
+            (False, 1000, False),
+            (True, 1, True),
+            (True, 0, False),
+        ):
+            self.mock_client.put.reset_mock()
+            self.mock_client.head = unittest.mock.Mock(
+                return_value=self.response(
+                    headers={
+                        "Content-Length": "10",
+                        "X-Object-Manifest": "test-source-container_segments/"
+                        "test-object/1/",
+                    }
+                )
+            )
+            self.mock_client.get = unittest.mock.Mock(
+                side_effect=[
+                    self.response(text="test-object/1/00000001\nother/1/00000001\n"),
+                    self.segment_response(10, "test-etag"),
+                ]
+            )
+            with (
+                unittest.mock.patch("swift_browser_ui.upload.common.USE_SLO", use_slo),
+                unittest.mock.patch(
+                    "swift_browser_ui.upload.common.SLO_MAX_SEGMENTS", max_segments
+                ),
+            ):
+                await self.replicator.a_copy_object("test-object")
+
+            self.assertEqual(self.mock_client.put.call_count, 2)
+            kwargs = self.mock_client.put.call_args.kwargs
+            if static:
+                self.assertEqual(kwargs["params"], {"multipart-manifest": "put"})
+                self.assertNotIn("X-Object-Manifest", kwargs["headers"])
+            else:
+                self.assertNotIn("params", kwargs)
+                self.assertEqual(
+                    kwargs["headers"]["X-Object-Manifest"],
+                    "test-container_segments/test-object/1/",
+                )
+
+    async def test_copy_object_slo_failed(self):
+        """Test static manifest creation failure."""
+        self.mock_client.head = unittest.mock.Mock(
+            return_value=self.response(
+                headers={"Content-Length": "10", "X-Static-Large-Object": "True"}
+            )
+        )
+        self.mock_client.get = unittest.mock.Mock(
+            side_effect=[
+                self.response(
+                    text=json.dumps([{"name": "/test-segments/test-object/1"}])
+                ),
+                self.segment_response(10, "test-etag"),
+            ]
+        )
+        self.mock_client.put = unittest.mock.Mock(
+            side_effect=[self.response(201), self.response(400)]
+        )
+        with self.assertRaises(aiohttp.web.HTTPInternalServerError):
+            await self.replicator.a_copy_object("test-object")
+
+    async def test_copy_from_container(self):
+        """Test copying objects concurrently and collecting the failures."""
+        objects = [f"test-object-{i}" for i in range(0, 20)]
+        entries = [{"name": name, "bytes": 10} for name in objects]
+        self.replicator.a_get_container_page = unittest.mock.AsyncMock(
+            side_effect=[entries[:10], entries[10:], []]
+        )
+        self.replicator.concurrency = 4
+        copying = set()
+        peak = 0
+
+        async def copy_object(object_name):
+            nonlocal peak
+            copying.add(object_name)
+            peak = max(peak, len(copying))
+            await asyncio.sleep(0.01)
+            copying.discard(object_name)
+            if object_name == "test-object-3":
+                raise aiohttp.web.HTTPBadRequest(reason="Source object fetch failed")
+            if object_name == "test-object-7":
+                raise ValueError("test-error")
+
+        self.replicator.a_copy_object = unittest.mock.AsyncMock(side_effect=copy_object)
+
+        failures = await self.replicator.a_copy_from_container()
+
+        self.assertEqual(
+            failures,
+            {
+                "test-object-3": "Source object fetch failed",
+                "test-object-7": "test-error",
+            },
+        )
+        self.assertEqual(self.replicator.copied, 18)
+        self.assertEqual(self.replicator.listed_bytes, 200)
+        self.assertEqual(
+            self.replicator.a_get_container_page.call_args_list[1].args,
+            ("test-object-9",),
+        )
+        self.assertEqual(
+            sorted(c.args[0] for c in self.replicator.a_copy_object.call_args_list),
+            sorted(objects),
+        )
+        self.assertEqual(peak, 4)
+        self.assertEqual(
+            self.replicator.get_progress(),
+            {
+                "marker": "test-object-19",
+                "copied": 18,
+                "bytes": 180,
+                "skipped": 0,
+                "failures": failures,
+            },
+        )
+
+    async def test_copy_from_container_marker(self):
+        """Test checkpointing only the objects handled in listing order."""
+        self.replicator.a_get_container_page = unittest.mock.AsyncMock(
+            side_effect=[[{"name": "b"}, {"name": "c"}, {"name": "d"}], []]
+        )
+        self.replicator.concurrency = 3
+        release = asyncio.Event()
+        markers = []
+
+        async def copy_object(object_name):
+            if object_name == "c":
+                await release.wait()
+            markers.append(self.replicator.marker)
+            if object_name == "d":
+                release.set()
+
+        self.replicator.a_copy_object = unittest.mock.AsyncMock(side_effect=copy_object)
+
+        await self.replicator.a_copy_from_container("a")
+
+        self.replicator.a_get_container_page.assert_any_await("a")
+        # "d" finishing before "c" doesn't move the marker past "c"
+        self.assertEqual(markers, ["", "b", "b"])
+        self.assertEqual(self.replicator.marker, "d")
+        self.assertFalse(self.replicator.pending)
+
+    async def test_copy_from_container_slow_object(self):
+        """Test keeping only the unhandled objects behind a slow object."""
+        entries = [{"name": f"test-object-{i:02d}"} for i in range(0, 20)]
+        self.replicator.a_get_container_page = unittest.mock.AsyncMock(
+            side_effect=[entries, []]
+        )
+        self.replicator.concurrency = 4
+        others = asyncio.Event()
+        copied = 0
+        pending = []
+
+        async def copy_object(object_name):
+            nonlocal copied
+            if object_name == "test-object-00":
+                await others.wait()
+                pending.extend(self.replicator.pending)
+                return
+            copied += 1
+            if copied == 19:
+                others.set()
+
+        self.replicator.a_copy_object = unittest.mock.AsyncMock(side_effect=copy_object)
+
+        await self.replicator.a_copy_from_container()
+
+        self.assertEqual(pending, ["test-object-00"])
+        self.assertEqual(self.replicator.marker, "test-object-19")
+
+    async def test_copy_from_container_incremental(self):
+        """Test only copying the objects missing from or changed in the copy."""
+        source = [
+            {"name": "changed", "bytes": 10, "hash": "new-etag"},
+            {"name": "manifest", "bytes": 0, "hash": EMPTY_ETAG},
+            {"name": "new", "bytes": 10, "hash": "test-etag"},
+            {"name": "unchanged", "bytes": 10, "hash": "test-etag"},
+        ]
+        destination = [
+            {"name": "changed", "bytes": 10, "hash": "old-etag"},
+            {"name": "deleted", "bytes": 10, "hash": "test-etag"},
+            {"name": "manifest", "bytes": 0, "hash": EMPTY_ETAG},
+            {"name": "unchanged", "bytes": 10, "hash": "test-etag"},
+        ]
+
+        async def get_page(marker="", destination=False):
+            listing = destination_pages if destination else source_pages
+            return listing.pop(0)
+
+        source_pages = [source[:2], source[2:], []]
+        destination_pages = [destination[:3], destination[3:], []]
+        self.replicator.a_get_container_page = unittest.mock.AsyncMock(
+            side_effect=get_page
+        )
+        # The segments of the dynamic manifest differ between the containers
+        self.mock_client.head = unittest.mock.Mock(
+            side_effect=[
+                self.response(headers={"Content-Length": "20", "ETag": '"a"'}),
+                self.response(headers={"Content-Length": "20", "ETag": '"b"'}),
+            ]
+        )
+        self.replicator.a_copy_object = unittest.mock.AsyncMock()
+        self.replicator.incremental = True
+
+        await self.replicator.a_copy_from_container()
+
+        self.assertEqual(
+            sorted(c.args[0] for c in self.replicator.a_copy_object.call_args_list),
+            ["changed", "manifest", "new"],
+        )
+        self.assertEqual((self.replicator.copied, self.replicator.skipped), (3, 1))
+        self.assertEqual(self.replicator.marker, "unchanged")
+
+        self.mock_client.head = unittest.mock.Mock(
+            return_value=self.response(headers={"Content-Length": "20", "ETag": '"a"'})
+        )
+        self.assertTrue(
+            await self.replicator.a_is_unchanged(
+                {**source[1], "existing": destination[2]}
+            )
+        )
+
+    async def test_get_container_page(self):
+        """Test getting a page of the JSON container listing."""
+        page = [{"name": "test-object", "bytes": 10, "hash": "test-etag"}]
+        self.mock_client.get = unittest.mock.Mock(
+            side_effect=[
+                self.response(text=json.dumps(page)),
+                self.response(204),
+                self.response(403),
+            ]
+        )
+        self.assertEqual(await self.replicator.a_get_container_page("marker"), page)
+        self.assertEqual(
+            self.mock_client.get.call_args.kwargs["params"],
+            {"format": "json", "marker": "marker"},
+        )
+        self.assertEqual(await self.replicator.a_get_container_page(), [])
+        self.assertEqual(
+            self.mock_client.get.call_args.kwargs["params"], {"format": "json"}
+        )
+        with self.assertRaises(aiohttp.web.HTTPBadRequest):
+            await self.replicator.a_get_container_page()
+
+    async def test_copy_from_container_streams_listing(self):
+        """Test copying objects before the whole container is listed."""
+        copied = asyncio.Event()
+        listing_failed = aiohttp.web.HTTPBadRequest(
+            reason="Could not fetch source container."
+        )
+
+        async def get_page(marker=""):
+            if not marker:
+                return [{"name": "test-object"}]
+            # The next page is only listed after the first object got copied
+            await copied.wait()
+            raise listing_failed
+
+        async def copy_object(_):
+            copied.set()
+
+        self.replicator.a_get_container_page = unittest.mock.AsyncMock(
+            side_effect=get_page
+        )
+        self.replicator.a_copy_object = unittest.mock.AsyncMock(side_effect=copy_object)
+        self.replicator.remove_public_key = unittest.mock.AsyncMock()
+
+        with self.assertRaises(aiohttp.web.HTTPBadRequest):
+            await asyncio.wait_for(self.replicator.a_copy_from_container(), 1)
+        self.assertEqual(self.replicator.copied, 1)
+        self.replicator.remove_public_key.assert_awaited_once()
+
+    async def test_copy_segment_mismatch(self):
+        """Test that a segment stored with another checksum fails the copy."""
+        self.mock_client.get = unittest.mock.Mock(
+            return_value=self.segment_response(10, '"test-etag"')
+        )
+        self.put_status = 422
+        with self.assertRaises(aiohttp.web.HTTPUnprocessableEntity):
+            await self.replicator.a_copy_segment(
+                "test-source-container_segments", "test-object/1/00000001"
+            )
+
+    async def test_copy_segments(self):
+        """Test copying segments concurrently in manifest order."""
+        self.replicator.segment_concurrency = 2
+        copying = set()
+        peak = 0
+
+        async def copy_segment(container, segment):
+            nonlocal peak
+            copying.add(segment)
+            peak = max(peak, len(copying))
+            # Later segments finish first
+            await asyncio.sleep(0.01 * (5 - int(segment)))
+            copying.discard(segment)
+            return {"path": f"/{container}/{segment}"}
+
+        self.replicator.a_copy_segment = unittest.mock.AsyncMock(side_effect=copy_segment)
+        entries = await self.replicator.a_copy_segments(
+            [("test-segments", str(i)) for i in range(0, 5)]
+        )
+        self.assertEqual(entries, [{"path": f"/test-segments/{i}"} for i in range(0, 5)])
+        self.assertEqual(peak, 2)
+
+    async def test_copy_object_segment_failed(self):
+        """Test that no manifest is written when a segment fails to copy."""
+        manifest = [
+            {"name": f"/test-source-container_segments/test-object/1/{i:08d}"}
+            for i in range(1, 4)
+        ]
+        self.mock_client.head = unittest.mock.Mock(
+            return_value=self.response(
+                headers={"Content-Length": "30", "X-Static-Large-Object": "True"}
+            )
+        )
+        self.mock_client.get = unittest.mock.Mock(
+            return_value=self.response(text=json.dumps(manifest))
+        )
+        blocked = asyncio.Event()
+
+        async def copy_segment(_, segment):
+            if segment.endswith("2"):
+                raise aiohttp.web.HTTPUnprocessableEntity(
+                    reason="Segment checksum mismatch"
+                )
+            await blocked.wait()
+
+        self.replicator.a_copy_segment = unittest.mock.AsyncMock(side_effect=copy_segment)
+        self.replicator.a_put_slo_manifest = unittest.mock.AsyncMock()
+
+        with self.assertRaises(aiohttp.web.HTTPUnprocessableEntity):
+            await asyncio.wait_for(self.replicator.a_copy_object("test-object"), 1)
+        self.replicator.a_put_slo_manifest.assert_not_awaited()
+
+    async def test_server_copy_segment(self):
+        """Test copying a segment inside Swift."""
+        self.replicator.server_copy = True
+        self.mock_client.head = unittest.mock.Mock(
+            return_value=self.segment_response(10, '"test-etag"')
+        )
+        self.mock_client.put = unittest.mock.Mock(
+            return_value=self.response(201, {"ETag": '"test-etag"'})
+        )
+        self.mock_client.get = unittest.mock.Mock()
+
+        entry = await self.replicator.a_copy_segment(
+            "test-source-container_segments", "test-object/1/00000001"
+        )
+        self.assertEqual(
+            entry,
+            {
+                "path": "/test-container_segments/test-object/1/00000001",
+                "etag": "test-etag",
+                "size_bytes": 10,
+            },
+        )
+        self.mock_client.get.assert_not_called()
+        args, kwargs = self.mock_client.put.call_args
+        self.assertEqual(
+            args[0],
+            "https://test-endpoint-0/v1/AUTH_test-project/"
+            "test-container_segments/test-object/1/00000001",
+        )
+        self.assertEqual(
+            kwargs["headers"]["X-Copy-From"],
+            "/test-source-container_segments/test-object/1/00000001",
+        )
+        self.assertEqual(
+            kwargs["headers"]["X-Copy-From-Account"], "AUTH_test-source-project"
+        )
+        self.assertEqual(self.replicator.server_copies, 1)
+
+        self.mock_client.put = unittest.mock.Mock(
+            return_value=self.response(201, {"ETag": '"other-etag"'})
+        )
+        with self.assertRaises(aiohttp.web.HTTPUnprocessableEntity):
+            await self.replicator.a_copy_segment(
+                "test-source-container_segments", "test-object/1/00000001"
+            )
+
+    async def test_server_copy_fallback(self):
+        """Test streaming objects once Swift refuses to copy them itself."""
+        self.replicator.server_copy = True
+        self.mock_client.head = unittest.mock.Mock(
+            return_value=self.segment_response(10, '"test-etag"')
+        )
+        self.mock_client.get = unittest.mock.Mock(
+            return_value=self.segment_response(10, '"test-etag"')
+        )
+        self.mock_client.put = unittest.mock.Mock(
+            side_effect=[self.response(403), self.response(201)]
+        )
+
+        entry = await self.replicator.a_copy_segment(
+            "test-source-container_segments", "test-object/1/00000001"
+        )
+        self.assertEqual(entry["size_bytes"], 10)
+        self.assertFalse(self.replicator.server_copy)
+        self.assertEqual(self.mock_client.put.call_count, 2)
+        self.assertNotIn("X-Copy-From", self.mock_client.put.call_args.kwargs["headers"])
+        self.mock_client.get.assert_called_once()
+
+    async def test_server_copy_object(self):
+        """Test copying an encrypted object and its header inside Swift."""
+        self.replicator.server_copy = True
+        self.replicator.project_name = "test-project-name"
+        self.mock_client.head = unittest.mock.Mock(
+            return_value=self.response(
+                headers={
+                    "Content-Length": "10",
+                    "Content-Type": "application/octet-stream",
+                    "ETag": '"test-etag"',
+                }
+            )
+        )
+        self.mock_client.get = unittest.mock.Mock()
+        self.mock_client.put = unittest.mock.Mock(
+            return_value=self.response(201, {"ETag": "test-etag"})
+        )
+
+        await self.replicator.a_copy_object("test-object.c4gh")
+
+        # The object body is never fetched
+        self.mock_client.get.assert_not_called()
+        self.mock_client.put.assert_called_once()
+        self.assertEqual(
+            self.mock_client.put.call_args.kwargs["headers"]["X-Copy-From"],
+            "/test-source-container/test-object.c4gh",
+        )
+        self.mock_vault.put_header.assert_awaited_once()
+
+    async def test_stream_object(self):
+        """Test fetching the object body only when streaming it."""
+        self.replicator.server_copy = True
+        headers = {
+            "Content-Length": "10",
+            "Content-Type": "application/octet-stream",
+            "ETag": '"test-etag"',
+            "X-Object-Meta-Usertags": "test-tag",
+        }
+        self.mock_client.head = unittest.mock.Mock(
+            return_value=self.response(headers=headers)
+        )
+        self.mock_client.get = unittest.mock.Mock(
+            return_value=self.response(headers=headers)
+        )
+        self.mock_client.put = unittest.mock.Mock(
+            side_effect=[self.response(403), self.response(201)]
+        )
+
+        await self.replicator.a_copy_object("test-object")
+
+        self.mock_client.get.assert_called_once()
+        self.assertEqual(self.mock_client.put.call_count, 2)
+        put_headers = self.mock_client.put.call_args.kwargs["headers"]
+        self.assertNotIn("X-Copy-From", put_headers)
+        self.assertEqual(put_headers["ETag"], '"test-etag"')
+        self.assertEqual(put_headers["Content-Length"], "10")
+        self.assertEqual(put_headers["X-Object-Meta-Usertags"], "test-tag")
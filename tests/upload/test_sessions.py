@@ -0,0 +1,176 @@
+"""Unit tests for swift_browser_ui.upload.sessions module."""
+
+import asyncio
+import json
+import unittest
+import unittest.mock
+
+import aiohttp.web
+
+from swift_browser_ui.upload.common import SESSION_STORE, UPLOAD_SESSIONS
+from swift_browser_ui.upload.sessions import (
+    SESSION_PREFIX,
+    RedisSessionStore,
+    SessionReaper,
+    SessionStore,
+    get_session_store,
+)
+
+
+class SessionStoreTestClass(unittest.IsolatedAsyncioTestCase):
+    """Test class for swift_browser_ui.upload.sessions functions."""
+
+    async def test_session_store(self):
+        """Test storing sessions in process memory."""
+        store = SessionStore()
+        await store.a_put_session("test-session", {"token": "test-token"})
+        self.assertEqual(
+            await store.a_get_session("test-session"), {"token": "test-token"}
+        )
+
+        await store.a_delete_session("test-session")
+        await store.a_delete_session("test-session")
+        with self.assertRaises(aiohttp.web.HTTPUnauthorized):
+            await store.a_get_session("test-session")
+
+    async def test_session_store_expiry(self):
+        """Test expiring the least recently used sessions."""
+        store = SessionStore(60)
+        for key in ("first", "second", "third"):
+            await store.a_put_session(key, {})
+        store.accessed["first"] -= 120
+        store.accessed["second"] -= 120
+        # Using a session moves it to the end of the expiry order
+        await store.a_get_session("first")
+
+        self.assertEqual(await store.a_expire_sessions(), ["second"])
+        self.assertEqual(list(store.sessions), ["third", "first"])
+        self.assertTrue(await store.a_has_session("first"))
+        self.assertFalse(await store.a_has_session("second"))
+
+    async def test_redis_session_store(self):
+        """Test storing sessions in Redis."""
+        mock_redis = unittest.mock.AsyncMock()
+        store = RedisSessionStore(mock_redis, 60)
+        session = {"token": "test-token", "endpoint": "https://test-endpoint"}
+
+        await store.a_put_session("test-session", session)
+        mock_redis.set.assert_awaited_once_with(
+            f"{SESSION_PREFIX}test-session", json.dumps(session), ex=60
+        )
+
+        mock_redis.getex.return_value = json.dumps(session).encode()
+        self.assertEqual(await store.a_get_session("test-session"), session)
+        mock_redis.getex.assert_awaited_once_with(f"{SESSION_PREFIX}test-session", ex=60)
+        mock_redis.getex.return_value = None
+        with self.assertRaises(aiohttp.web.HTTPUnauthorized):
+            await store.a_get_session("test-session")
+
+        mock_redis.exists.return_value = 0
+        self.assertFalse(await store.a_has_session("test-session"))
+        self.assertEqual(await store.a_expire_sessions(), [])
+
+        await store.a_delete_session("test-session")
+        mock_redis.delete.assert_awaited_once_with(f"{SESSION_PREFIX}test-session")
+        await store.a_close()
+        mock_redis.aclose.assert_awaited_once()
+
+    async def test_get_session_store(self):
+        """Test choosing the session store backend."""
+        self.assertIsInstance(await get_session_store(), SessionStore)
+
+        mock_get_redis_client = unittest.mock.AsyncMock()
+        with (
+            unittest.mock.patch(
+                "swift_browser_ui.upload.sessions.SESSION_STORE_BACKEND", "redis"
+            ),
+            unittest.mock.patch(
+                "swift_browser_ui.upload.sessions.get_redis_client", mock_get_redis_client
+            ),
+        ):
+            store = await get_session_store()
+        self.assertIsInstance(store, RedisSessionStore)
+        mock_get_redis_client.assert_awaited_once()
+
+
+class SessionReaperTestClass(unittest.IsolatedAsyncioTestCase):
+    """Test class for swift_browser_ui.upload.sessions.SessionReaper."""
+
+    def setUp(self):
+        """Set up mocks."""
+        self.store = SessionStore(60)
+        self.app = {SESSION_STORE: self.store, UPLOAD_SESSIONS: {}}
+        self.reaper = SessionReaper(self.app, idle_timeout=60, interval=60)
+
+    def upload_session(self, idle, buffered=0, uploads=0, connected=False):
+        """Create a mock upload session."""
+        return unittest.mock.Mock(
+            is_connected=unittest.mock.Mock(return_value=connected),
+            is_idle=unittest.mock.Mock(return_value=idle),
+            get_buffered_size=unittest.mock.Mock(return_value=buffered),
+            get_upload_count=unittest.mock.Mock(return_value=uploads),
+            handle_close=unittest.mock.AsyncMock(),
+        )
+
+    async def test_reap(self):
+        """Test reaping idle and orphaned upload sessions."""
+        await self.store.a_put_session("expired", {})
+        await self.store.a_put_session("live", {})
+        self.store.accessed["expired"] -= 120
+        live = self.upload_session(False)
+        idle = self.upload_session(True, 100, 1)
+        expired = self.upload_session(False, 50, 2)
+        orphaned = self.upload_session(False)
+        self.app[UPLOAD_SESSIONS].update(
+            {
+                "live": {"project-1": live, "project-2": idle},
+                "expired": {"project-1": expired},
+                "logged-out": {"project-1": orphaned},
+            }
+        )
+
+        await self.reaper.reap()
+
+        self.assertEqual(self.app[UPLOAD_SESSIONS], {"live": {"project-1": live}})
+        live.handle_close.assert_not_awaited()
+        for upload_session in (idle, expired, orphaned):
+            upload_session.handle_close.assert_awaited_once()
+        self.assertFalse(await self.store.a_has_session("expired"))
+        self.assertEqual(
+            self.reaper.get_stats(),
+            {"reaped_sessions": 3, "aborted_uploads": 3, "reclaimed_bytes": 150},
+        )
+
+    async def test_reap_connected(self):
+        """Test keeping connected upload sessions and their runner sessions."""
+        await self.store.a_put_session("expired", {})
+        self.store.accessed["expired"] -= 120
+        connected = self.upload_session(False, connected=True)
+        orphaned = self.upload_session(False, connected=True)
+        self.app[UPLOAD_SESSIONS].update(
+            {"expired": {"project-1": connected}, "logged-out": {"project-1": orphaned}}
+        )
+
+        await self.reaper.reap()
+
+        # The runner session is refreshed while the websocket is open
+        self.assertTrue(await self.store.a_has_session("expired"))
+        self.assertEqual(len(self.app[UPLOAD_SESSIONS]), 2)
+        connected.handle_close.assert_not_awaited()
+        orphaned.handle_close.assert_not_awaited()
+
+        # Once disconnected, the session without a runner session is reaped
+        orphaned.is_connected.return_value = False
+        await self.reaper.reap()
+        orphaned.handle_close.assert_awaited_once()
+        self.assertEqual(self.app[UPLOAD_SESSIONS], {"expired": {"project-1": connected}})
+
+    async def test_start_stop(self):
+        """Test running the reaper in the background."""
+        self.reaper.interval = 0
+        self.reaper.reap = unittest.mock.AsyncMock(side_effect=[Exception, None])
+        self.reaper.start()
+        while self.reaper.reap.await_count < 2:
+            await asyncio.sleep(0)
+        await self.reaper.stop()
+        self.assertIsNone(self.reaper.task)